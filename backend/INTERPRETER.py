@@ -1,9 +1,29 @@
 # Imports
 import ctypes
-from typing import Any, Never, Callable
-from middle_end.AST import VarAssign
-from runtime.number import RuntimeNumber
-from middle_end.ERRORS import RTError, RTResult, VarSizeError, ReassigningConstError
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Never, Callable, Self
+from middle_end.AST import (
+  ArrayAssign, ArrayLength,
+  ArrayLiteral, IndexAccess,
+  IndexAssign, MappedFile,
+  RangeBuiltin, TempStore,
+  VarAssign,
+)
+from middle_end.TRANSFORMER import iter_children
+from runtime.batch import BATCH_SIZE, accumulate, evaluate
+from runtime.buffer import TypedArray, array_of, filled_array, map_file, narrowest_type
+from runtime.checkpoint import FOR, IF, WHILE, Checkpointer, Frame
+from runtime.kernels import DECIMAL_TYPES, to_type
+from runtime.number import BINARY_OPS, UNARY_OPS, RuntimeNumber, update_value
+from runtime.profile import BranchProfile
+from runtime.ranges import RANGE_BUILTINS, reduce_range, trip_count
+from runtime.typemap import type_map
+from middle_end.ERRORS import (
+  Error, RTError,
+  RTException, RTResult,
+  ReassigningConstError, VarSizeError,
+)
 from frontend.TOKENS import TT
 from backend.TYPECASTER import TypeCaster
 from typechecking.TYPECHECKER import TypeChecker
@@ -11,29 +31,152 @@ from typechecking.TYPECHECKER import TypeChecker
 # NOTE: Type checker, helps in type promotiong and checking if 2 things have the same type
 tpchecker: TypeChecker = TypeChecker()
 tpcaster: TypeCaster = TypeCaster()
+# NOTE: A value a reduction variable had in a par loop chunk,
+# with the start and the end of the update that gave it and its operation
+Extreme = tuple[int | float, Any, Any, str]
+# NOTE: Start, end and step of a for loop
+LoopRange = tuple[RuntimeNumber, RuntimeNumber, RuntimeNumber]
 
 """
 Symbol table class: Keeps track of variable names and their values
+  - Every name gets a slot the first time the resolver sees it,
+    values and const flags are lists indexed by the slot
+  - A slot holds None until the variable is assigned,
+    so a name can have a slot and still not be defined
+  - The resolver gives every variable node a (depth, slot) address,
+    depth is how many parents up its table is
+Tables can be layered, a frozen table like the builtins is the base
+and every run gets a fork of it:
+  - A fork shares the lists of the table it came from until it is written to,
+    then it copies them once
+  - Numbers don't change, so the copy only copies references,
+    it costs as much as the number of names
+  - A fork can be committed back to the table it came from, or discarded by dropping it
 """
 class SymbolTable:
   def __init__(self) -> None:
-    self.symbols: dict = {}
+    self.slots: dict[str, int] = {}
+    self.values: list[Any] = []
+    #NOTE: This keeps track of if a variable is const or mut, next to its value
+    self.consts: list[bool] = []
     self.parent: SymbolTable | None = None
-    
-    #NOTE: This is a dictionary that keeps track of if a variable is const or mut
-    self.var_states: dict[str, bool] = {} 
+    # NOTE: Where the value in every slot was last assigned,
+    # numbers don't keep positions
+    self.declared_at: list[tuple[Any, Any]] = []
+    self.frozen: bool = False
+    # NOTE: True while the lists are still the ones of forked_from
+    self.shared: bool = False
+    self.forked_from: SymbolTable | None = None
+    self.forked_version: int = 0
+    self.version: int = 0  # NOTE: Goes up on every commit into this table
+
+  def freeze(self) -> Self:
+    self.frozen = True
+    return self
+
+  def fork(self) -> "SymbolTable":
+    table: SymbolTable = SymbolTable()
+    table.slots, table.values = self.slots, self.values
+    table.consts, table.declared_at = self.consts, self.declared_at
+    table.parent = self.parent
+    # NOTE: Both sides copy before their first write,
+    # so neither sees what the other writes
+    table.shared = self.shared = True
+    table.forked_from, table.forked_version = self, self.version
+    return table
+
+  # NOTE: Called before anything writes to the table,
+  # a fork copies the lists it shares the first time
+  def own(self) -> None:
+    if self.frozen:
+      raise Exception(
+          "Can't write to a frozen symbol table, run programs in a fork of it")
+    if self.shared:
+      self.slots, self.values = dict(self.slots), list(self.values)
+      self.consts, self.declared_at = list(self.consts), list(self.declared_at)
+      self.shared = False
+
+  # NOTE: The table this was forked from takes over its variables,
+  # after that both share the same lists again
+  def commit(self) -> None:
+    target: SymbolTable | None = self.forked_from
+    if target is None:
+      raise Exception("Only a fork can be committed")
+    if target.version != self.forked_version:
+      raise Exception("The symbol table was committed to since this fork was made")
+    if target.frozen:
+      raise Exception("Can't commit to a frozen symbol table")
+    target.slots, target.values = self.slots, self.values
+    target.consts, target.declared_at = self.consts, self.declared_at
+    target.version += 1
+    target.shared = self.shared = True
+    self.forked_version = target.version
+
+  # NOTE: Slot of name in this table, a new one is made for a name it doesn't have yet
+  def slot_of(self, name: str) -> int:
+    slot: int | None = self.slots.get(name)
+    if slot is None:
+      self.own()
+      slot = self.slots[name] = len(self.values)
+      self.values.append(None)
+      self.consts.append(False)
+      self.declared_at.append((None, None))
+    return slot
+
+  # NOTE: Address of the closest table that has name,
+  # a name no table has gets a slot in this one
+  def address_of(self, name: str) -> tuple[int, int]:
+    table: SymbolTable | None = self
+    depth: int = 0
+    while table is not None:
+      if name in table.slots:
+        return depth, table.slots[name]
+      table, depth = table.parent, depth + 1
+    return 0, self.slot_of(name)
+
+  def frame(self, depth: int) -> "SymbolTable":
+    table: SymbolTable = self
+    for _ in range(depth):
+      table = table.parent
+    return table
 
   def get(self, name: str) -> Any:
-    value = self.symbols.get(name, None)
+    slot: int | None = self.slots.get(name)
+    value = self.values[slot] if slot is not None else None
     if value is None and self.parent:
       return self.parent.get(name)
     return value
 
   def set(self, name: str, value: Any) -> None:
-    self.symbols[name] = value
+    slot: int = self.slot_of(name)
+    self.own()
+    self.values[slot] = value
 
+  def is_const(self, name: str) -> bool:
+    slot: int | None = self.slots.get(name)
+    return slot is not None and self.consts[slot]
+
+  # NOTE: The slot stays so nodes resolved before still point at the right place
   def remove(self, name: str) -> None:
-    del self.symbols[name]
+    slot: int = self.slots[name]
+    self.own()
+    self.values[slot] = None
+    self.consts[slot] = False
+
+  # NOTE: A table with a copy of the variables and nothing else,
+  # small enough to send to another process
+  def snapshot(self) -> "SymbolTable":
+    table: SymbolTable = SymbolTable()
+    table.slots, table.values = dict(self.slots), list(self.values)
+    table.consts, table.declared_at = list(self.consts), list(self.declared_at)
+    return table
+
+  # NOTE: name -> value of every defined variable
+  @property
+  def symbols(self) -> dict[str, Any]:
+    return {name: self.values[slot] for name, slot in self.slots.items()
+            if self.values[slot] is not None}
+
   def __repr__(self) -> str:
     return f"SymbolTable, {self.parent}, symbols={self.symbols}"
 
@@ -52,19 +195,107 @@ class Context:
     self.symbol_table: SymbolTable = SymbolTable()
 
 
+# NOTE: Every TempStore in the program,
+# in the same order every time the same program is compiled
+def find_temp_stores(node, stores: list[TempStore]) -> list[TempStore]:
+  if isinstance(node, TempStore):
+    stores.append(node)
+  for child in iter_children(node):
+    find_temp_stores(child, stores)
+  return stores
+
+
+# NOTE: A par loop is cut in chunks of at least PAR_MIN_CHUNK iterations,
+# and in at most PAR_CHUNKS chunks
+# How a loop is cut only depends on its trip count,
+# so the sums are the same however many workers there are
+PAR_MIN_CHUNK: int = 1024
+PAR_CHUNKS: int = 64
+
+
+# NOTE: (first iteration, number of iterations) of every chunk
+def par_chunks(trips: int) -> list[tuple[int, int]]:
+  size: int = max(PAR_MIN_CHUNK, -(-trips // PAR_CHUNKS))
+  return [(first, min(size, trips - first)) for first in range(0, trips, size)]
+
+
+# NOTE: Runs one chunk of a par loop in table, in a worker process or in this one
+# The reduction variables start at 0, what they hold at the end is what the chunk adds
+# The sum of a chunk can be negative or larger than the variable's type,
+# so it is kept in an i64 or f64
+# With the sums come the smallest and largest sums, see run_parallel_loop
+def run_chunk(
+    loop, table: SymbolTable, parent: Context, start: int, step: int, trips: int,
+) -> tuple[list[RuntimeNumber], list[list[Extreme]], Error | None]:
+  for name in loop.reductions:
+    type_: Any = ctypes.c_longlong
+    if table.get(name).type_ in DECIMAL_TYPES:
+      type_ = ctypes.c_double
+    table.set(name, RuntimeNumber.of(to_type(type_, 0), type_))
+  context: Context = Context("<par for>", parent, loop.pos_start)
+  context.symbol_table = table
+  interpreter: Interpreter = Interpreter()
+  interpreter.extremes = {name: [] for name in loop.reductions}
+  try:
+    interpreter.run_counted_loop(loop, context, start, step, trips)
+  except RTException as exception:
+    return [], [], exception.error
+  sums: list[RuntimeNumber] = [table.get(name) for name in loop.reductions]
+  return sums, [interpreter.extremes[name] for name in loop.reductions], None
+
+
 class Interpreter:
-  # NOTE: Visits node and its children
-  def visit(self, node, context: Context) -> RTResult:
+  # NOTE: With a profile, how often every if condition
+  # and `&&`/`||` operand was true is recorded
+  # With a checkpointer, blocks keep a Frame each and for loops write checkpoints,
+  # see runtime/checkpoint.py
+  # workers is how many processes run the chunks of par loops,
+  # with 1 they run in this process
+  def __init__(self, profile: BranchProfile | None = None,
+               checkpointer: Checkpointer | None = None,
+               workers: int = 1) -> None:
+    self.profile = profile
+    self.checkpointer = checkpointer
+    self.workers = workers
+    # NOTE: Started by the first par loop that needs it, shut down when the run ends
+    self.pool: Executor | None = None
+    self.frames: list[Frame] = []
+    self.temp_stores: list[TempStore] = []
+    # NOTE: The checkpoint that is being resumed,
+    # None again once the program is back where it was taken
+    self.resume = checkpointer.resume if checkpointer is not None else None
+    # NOTE: Only in par loop chunks, the smallest and largest value of each reduction
+    self.extremes: dict[str, list[Extreme]] | None = None
+
+  # NOTE: Runs a program, the visit methods raise RTException
+  # and this turns it back into an RTResult for the shell
+  def run(self, node, context: Context) -> RTResult:
+    res: RTResult = RTResult()
+    # NOTE: Visits write straight into the lists,
+    # so a fork gets its own copy before the program starts
+    context.symbol_table.own()
+    if self.checkpointer is not None:
+      self.frames = []
+      self.temp_stores = find_temp_stores(node, [])
+      if self.resume is not None:
+        self.restore(context)
+    try:
+      return res.success(self.visit(node, context))
+    except RTException as exception:
+      return res.failure(exception.error)
+    finally:
+      if self.pool is not None:
+        self.pool.shutdown()
+        self.pool = None
+
+  # NOTE: Visits node and its children,
+  # gives the value and raises RTException on a runtime error
+  def visit(self, node, context: Context) -> Any:
     # Case 1: program / statements list
-    res = RTResult()
     if isinstance(node, list):
-      results = []
-      for stmt in node:
-        value = res.register(self.visit(stmt, context))
-        if res.error:
-          return res
-        results.append(value)
-      return res.success(results)
+      if self.checkpointer is not None:
+        return self.visit_tracked_block(node, context)
+      return [self.visit(stmt, context) for stmt in node]
 
     # Case 2: single AST node
     method_name = f"visit_{type(node).__name__}"
@@ -75,262 +306,801 @@ class Interpreter:
   def no_visit_method(self, node, context: Context) -> Never:
     raise Exception(f"No visit_{type(node).__name__} method defined")
 
+  # NOTE: Puts back the variables and kept values of the checkpoint,
+  # the blocks find their place while they run
+  def restore(self, context: Context) -> None:
+    table: SymbolTable = context.symbol_table
+    for name, is_const, value in self.resume.variables:
+      slot: int = table.slot_of(name)
+      table.values[slot] = value
+      table.consts[slot] = is_const
+    if len(self.resume.temps) != len(self.temp_stores):
+      raise Exception("The checkpoint is for a different program")
+    for store, value in zip(self.temp_stores, self.resume.temps):
+      store.value = value
+
+  # NOTE: A resumed block starts at the statement of its frame in the checkpoint,
+  # with the values from before it
+  def visit_tracked_block(self, block: list, context: Context) -> list:
+    frame: Frame = Frame()
+    if self.resume is not None:
+      frame = self.resume.frames[len(self.frames)]
+    self.frames.append(frame)
+    for index in range(frame.index, len(block)):
+      frame.index = index
+      frame.results.append(self.visit(block[index], context))
+      frame.state = None
+    self.frames.pop()
+    return frame.results
+
+  # NOTE: State of the statement that is being resumed,
+  # resuming is over when it is the last frame of the checkpoint
+  def resumed_state(self, kind: int) -> tuple:
+    state: tuple | None = self.frames[-1].state
+    if state is None or state[0] != kind:
+      raise Exception("The checkpoint is for a different program")
+    if len(self.frames) == len(self.resume.frames):
+      self.resume = None
+    return state
+
+  def save_checkpoint(self, context: Context) -> None:
+    temps: list[Any] = [store.value for store in self.temp_stores]
+    self.checkpointer.save(context.symbol_table, self.frames, temps)
+
   # Defining visit method for each node
-  def visit_Number(self, node, context: Context) -> RTResult:
-    res = RTResult()
+  def visit_Number(self, node, context: Context) -> RuntimeNumber:
     if not tpchecker.is_size_of_value_valid(type_=node.type_, value=node.token.value, object=node):
-      return res.failure(VarSizeError(node.pos_start, node.pos_end))
+      raise RTException(VarSizeError(node.pos_start, node.pos_end))
     node.token.value = tpcaster.cast_type(casting_type=node.type_, object_value=node.token.value,object=node)
-    return res.success(
-        RuntimeNumber(node.token.value).set_context(context).set_pos(
-            node.pos_start, node.pos_end))
+    return RuntimeNumber.of(node.token.value, node.type_)
 
-  def visit_ForExpr(self, node, context: Context):
-    res: RTResult = RTResult()
-    start_value = res.register(self.visit(node.range.start, context))
-    if res.error: return res
+  # NOTE: Forgets the loop invariant values from the last time the loop ran
+  def reset_hoisted(self, node) -> None:
+    for hoisted in node.hoisted:
+      hoisted.value = None
+
+  def visit_Hoisted(self, node, context: Context) -> Any:
+    if node.value is None:
+      node.value = self.visit(node.node, context)
+    return node.value
+
+  def visit_TempStore(self, node, context: Context) -> Any:
+    node.value = self.visit(node.node, context)
+    return node.value
+
+  def visit_TempLoad(self, node, context: Context) -> Any:
+    return node.store.value
 
-    end_value = res.register(self.visit(node.range.end, context))
-    if res.error: return res
+  def loop_range(self, node, context: Context) -> LoopRange:
+    start_value = self.visit(node.range.start, context)
+    end_value = self.visit(node.range.end, context)
 
     if node.range.step:
-      step_value = res.register(self.visit(node.range.step, context))
-      if res.error: return res
+      step_value = self.visit(node.range.step, context)
     else:
-      step_value = RuntimeNumber(ctypes.c_ubyte(1))
+      step_value = RuntimeNumber.of(1, ctypes.c_ubyte)
+    return start_value, end_value, step_value
+
+  def visit_ForExpr(self, node, context: Context) -> None:
+    self.reset_hoisted(node)
+    if node.parallel:
+      return self.run_parallel_loop(node, context)
+    if self.checkpointer is not None:
+      return self.run_checkpointed_loop(node, context)
+    start_value, end_value, step_value = self.loop_range(node, context)
+
+    i = start_value.value
+    # NOTE: In a par loop chunk every update of a reduction variable is recorded,
+    # so the loop can't skip them
+    fast: bool = self.extremes is None
+    if (fast and node.affine_updates is not None
+        and self.run_affine_loop(node, context, i, end_value.value, step_value.value)):
+      return None
+
+    if node.var_slot is None:
+      node.var_slot = context.symbol_table.slot_of(node.var_name.value)
+    whole: bool = all(type(value) is int
+                      for value in (i, end_value.value, step_value.value))
+    if whole:
+      trips: int | None = trip_count(i, end_value.value, step_value.value)
+      if trips is not None:
+        if fast and node.reduction is not None:
+          done: int = self.run_reduction_batches(
+              node, context, i, step_value.value, trips)
+          i, trips = i + done * step_value.value, trips - done
+        self.run_counted_loop(node, context, i, step_value.value, trips)
+        return None
 
-    i = start_value.value.value
-    if step_value.value.value >= 0:
-      condition: Callable[[], bool] = lambda: i < end_value.value.value
+    if step_value.value >= 0:
+      condition: Callable[[], bool] = lambda: i < end_value.value
       # NOTE: If step is positive, we want to loop and end when i is not less than the end value
     else:
-      condition: Callable[[], bool] = lambda: i > end_value.value.value
+      condition: Callable[[], bool] = lambda: i > end_value.value
       # NOTE: If step is negative, we want to loop and end when i is not greater than the end value
 
-
+    values: list[Any] = context.symbol_table.values
     while condition():
-      i += step_value.value.value
-      context.symbol_table.set(node.var_name.value, RuntimeNumber(ctypes.c_longlong(i)))
-      res.register(self.visit(node.block, context))
-      if res.error:
-        return res
-
-    return res.success(None)
-    
-  def visit_WhileStmt(self, node, context):
-    res = RTResult()
-    while True:
-      condition = res.register(self.visit(node.condition, context))
-      if res.error:
-        return res
+      i += step_value.value
+      values[node.var_slot] = RuntimeNumber.of(
+          to_type(ctypes.c_longlong, i), ctypes.c_longlong)
+      self.visit(node.block, context)
 
-      if not condition.is_true():
-        break
-      res.register(self.visit(node.block, context))
-      if res.error:
-        return res
+    return None
 
-    return res.success(None)
+  # NOTE: Whole number start, end and step,
+  # the counter takes the values of a range and the number of trips is known
+  # The counter is a plain int,
+  # every iteration only writes its number into the slot and runs the statements
+  # Statements are looked up once for the whole loop and their values are dropped,
+  # a loop gives None
+  def run_counted_loop(self, node, context: Context, start: int, step: int,
+                       trips: int) -> None:
+    if trips == 0:
+      # NOTE: A step of 0 only gets here when the loop never runs, range() can't take it
+      return None
+    values: list[Any] = context.symbol_table.values
+    slot: int = node.var_slot
+    of: Callable[[int, Any], RuntimeNumber] = RuntimeNumber.of
+    i64: Any = ctypes.c_longlong
+    body: list[tuple[Callable, Any]] = self.bind_block(node.block)
+    if len(body) == 1:
+      visit, stmt = body[0]
+      for i in range(start + step, start + step * (trips + 1), step):
+        values[slot] = of(i, i64)
+        visit(stmt, context)
+      return None
+    for i in range(start + step, start + step * (trips + 1), step):
+      values[slot] = of(i, i64)
+      for visit, stmt in body:
+        visit(stmt, context)
+    return None
 
-  def visit_Increment(self, node, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    value = self.visit_VarAccess(node.value, context)
-    if node.value.is_const:
-      return self.breaking_const_rule(node, msg="Cannot perform increment operation on a constant variable", res=res)
-    if node.postfix:
-      old_value = value.value.value
-      incremented_value: Any = ctypes.c_longlong(old_value.value + 1)
-      context.symbol_table.set(node.value.var_name_token.value, RuntimeNumber(incremented_value))
-      return res.success(RuntimeNumber(old_value))
+  # NOTE: Cuts a par loop in chunks that each run in a snapshot of the variables,
+  # see run_chunk
+  # The sums of the chunks are added to the reduction variables in order,
+  # the variable keeps its type like with `incr`
+  # Nothing the chunks declare is kept,
+  # the loop variable ends at its last value like in a normal loop
+  def run_parallel_loop(self, node, context: Context) -> None:
+    start_value, end_value, step_value = self.loop_range(node, context)
+    start, end, step = start_value.value, end_value.value, step_value.value
+    if not all(type(value) is int for value in (start, end, step)):
+      raise RTException(RTError(
+          node.pos_start, node.pos_end,
+          "A par loop needs a whole number range", context))
+    trips: int | None = trip_count(start, end, step)
+    if trips is None:
+      raise RTException(RTError(
+          node.pos_start, node.pos_end, "A par loop can't have a step of 0", context))
+    table: SymbolTable = context.symbol_table
+    for name in node.reductions:
+      if table.get(name) is None:
+        raise RTException(RTError(
+            node.pos_start, node.pos_end, f"`{name}` is not defined", context))
+      if not isinstance(table.get(name), RuntimeNumber):
+        raise RTException(RTError(
+            node.pos_start, node.pos_end,
+            f"`{name}` is an array, a par loop can only add to numbers", context))
+      if table.is_const(name):
+        raise RTException(ReassigningConstError(
+            details=f"Cannot reduce into the constant variable `{name}`",
+            pos_start=node.pos_start, pos_end=node.pos_end))
+    if trips == 0:
+      return None
+
+    if node.var_slot is None:
+      node.var_slot = table.slot_of(node.var_name.value)
+    # NOTE: Errors in a chunk show the loop in the context that runs it
+    parent: Context = Context(
+        context.display_name, context.parent, context.parent_entry_pos)
+    tasks: list[tuple] = [
+        (node, table.snapshot(), parent, start + step * first, step, count)
+        for first, count in par_chunks(trips)]
+    if self.workers > 1 and len(tasks) > 1:
+      if self.pool is None:
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+      # NOTE: Tasks sent together are pickled together,
+      # so the loop's nodes are only sent once per batch
+      chunksize: int = -(-len(tasks) // self.workers)
+      results = list(self.pool.map(run_chunk, *zip(*tasks), chunksize=chunksize))
     else:
-      new_value = value.value.value.value + 1
-      incremented_value: Any = ctypes.c_longlong(new_value)
-      context.symbol_table.set(node.value.var_name_token.value, RuntimeNumber(incremented_value))
-      return res.success(RuntimeNumber(incremented_value))
-      
-  def visit_IncrementBy(self, node: DecrementBy, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    node.value: VarAccess  # It is a variable
-    node.amount: Number
-    variable= self.visit_VarAccess(node.value, context)
-    variable_value: int | float = variable.value.value.value #NOTE: This is the variables c_types value or the raw value
-    
-    if node.value.is_const:
-      return self.breaking_const_rule(node, msg="Cannot perform increment by operation on a constant variable", res=res)
-      
-    new_value = variable_value + node.amount.token.value
-    variable_name = node.value.var_name_token.value
-    context.symbol_table.set(variable_name, value=RuntimeNumber(variable.value.type_(new_value)))
-    return res.success(None)
-  def breaking_const_rule(self, node: VarAccess, msg: str, res: RTResult) -> RTResult:
-      return res.failure(ReassigningConstError(details=msg, pos_start=node.pos_start, pos_end=node.pos_end))
-      
-  def visit_DecrementBy(self, node: DecrementBy, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    node.value: VarAccess  # It is a variable
-    node.amount: Number
-    
-    variable= self.visit_VarAccess(node.value, context)
-    variable_value: int | float = variable.value.value.value #NOTE: This is the variables c_types value or the raw value
-    
-    if node.value.is_const:
-      return self.breaking_const_rule(node, msg="Cannot perform decrement by operation on a constant variable", res=res)
-      
-    new_value = variable_value - node.amount.token.value
-    variable_name = node.value.var_name_token.value
-    context.symbol_table.set(variable_name, value=RuntimeNumber(variable.value.type_(new_value)))
-    return res.success(None)
-    
-  def visit_MultiplyBy(self, node: MultiplyBy, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    node.value: VarAccess  # It is a variable
-    node.amount: Number
-    variable= self.visit_VarAccess(node.value, context)
-    variable_value: int | float = variable.value.value.value #NOTE: This is the variables c_types value or the raw value
-    
-    if node.value.is_const:
-      return self.breaking_const_rule(node, msg="Cannot perform multiplication by operation on a constant variable", res=res)
-      
-    new_value = variable_value * node.amount.token.value
-    variable_name = node.value.var_name_token.value
-    context.symbol_table.set(variable_name, value=RuntimeNumber(variable.value.type_(new_value)))
-    return res.success(None)
-    
-  def visit_DivideBy(self, node: DivideBy, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    node.value: VarAccess  # It is a variable
-    node.amount: Number
-    variable= self.visit_VarAccess(node.value, context)
-    variable_value: int | float = variable.value.value.value #NOTE: This is the variables c_types value or the raw value
-    
-    if variable.value.is_const:
-      return self.breaking_const_rule(node, msg="Cannot perform division by operation on a constant variable", res=res)
-      
-    if node.amount.token.value == 0:
-      return res.failure(RuntimeError("Division by zero", node.amount.pos_start, node.amount.pos_end))
-    new_value = variable_value / node.amount.token.value 
-    variable_name = node.value.var_name_token.value
-    context.symbol_table.set(variable_name, value=RuntimeNumber(variable.value.type_(new_value)))
-    return res.success(None)
-
-  def visit_Decrement(self, node, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    value = self.visit_VarAccess(node.value, context)
-    if node.value.is_const:
-      return self.breaking_const_rule(node, msg="Cannot perform decrement operation on a constant variable", res=res)
-    if node.postfix:
-      old_value = value.value.value
-      decremented_value: Any = old_value.value - 1
-      decremented_value: Any = ctypes.c_longlong(decremented_value)
-      context.symbol_table.set(node.value.var_name_token.value, RuntimeNumber(decremented_value))
-      return res.success(RuntimeNumber(old_value))
+      results = [run_chunk(*task) for task in tasks]
+
+    for _, _, error in results:
+      if error:
+        raise RTException(error)
+    # NOTE: A normal loop checks every update, here the variable would have gone through
+    # its value plus every sum of a chunk, the smallest and largest of them are checked
+    for index, name in enumerate(node.reductions):
+      type_: Any = table.get(name).type_
+      total: int | float = table.get(name).value
+      for sums, extremes, _ in results:
+        for value, pos_start, pos_end, operation in extremes[index]:
+          reached: int | float = update_value(type_, total, value, "+")
+          if not tpchecker.is_value_in_range(type_, reached):
+            raise RTException(VarSizeError(
+                pos_start, pos_end,
+                f"Result of `{operation}` does not fit in {type_map.get(type_)}"))
+        total = to_type(type_, update_value(type_, total, sums[index].value, "+"))
+      table.set(name, RuntimeNumber.of(total, type_))
+    table.values[node.var_slot] = RuntimeNumber.of(
+        start + step * trips, ctypes.c_longlong)
+    return None
+
+  # NOTE: Runs a reduction loop (see middle_end/REDUCTION.py)
+  # a batch of iterations at a time, gives how many it ran
+  # A batch is only kept when every step of it fits,
+  # the first batch that doesn't is left to run_counted_loop
+  def run_reduction_batches(self, node, context: Context, start: int, step: int,
+                            trips: int) -> int:
+    table: SymbolTable = context.symbol_table
+    read: Callable[[Any], RuntimeNumber] = lambda leaf: self.visit(leaf, context)
+    done: int = 0
+    while done < trips:
+      count: int = min(BATCH_SIZE, trips - done)
+      first: int = start + step * (done + 1)
+      try:
+        indices: array = array("q", range(first, first + step * count, step))
+      except OverflowError:
+        return done  # NOTE: The counter doesn't fit an i64
+      new_values: dict[str, RuntimeNumber] = {}
+      for name, operation, amount in node.reduction:
+        variable = table.get(name)
+        if not isinstance(variable, RuntimeNumber) or table.is_const(name):
+          return done
+        try:
+          amounts = evaluate(amount, indices, read)
+        except RTException:
+          return done
+        if amounts is None:
+          return done
+        value: int | float | None = accumulate(
+            variable.type_, variable.value, amounts[0], amounts[1], operation, count)
+        if value is None:
+          return done
+        new_values[name] = RuntimeNumber.of(value, variable.type_)
+      for name, number in new_values.items():
+        table.set(name, number)
+      table.values[node.var_slot] = RuntimeNumber.of(indices[-1], ctypes.c_longlong)
+      done += count
+    return done
+
+  # NOTE: The visit method of every statement in a block,
+  # looked up once for a block that runs many times
+  def bind_block(self, block: list) -> list[tuple[Callable, Any]]:
+    bound: list[tuple[Callable, Any]] = []
+    for stmt in block:
+      method: str = f"visit_{type(stmt).__name__}"
+      visit: Callable = getattr(self, method, self.no_visit_method)
+      bound.append((self.visit if isinstance(stmt, list) else visit, stmt))
+    return bound
+
+  # NOTE: The same loop, a checkpoint can be taken before every iteration
+  # The frame of the block the loop is in keeps the counter from before the iteration,
+  # resuming starts from it
+  def run_checkpointed_loop(self, node, context: Context) -> None:
+    frame: Frame = self.frames[-1]
+    if self.resume is not None:
+      _, i, end_value, step_value = self.resumed_state(FOR)
     else:
-      new_value = value.value.value.value - 1
-      decremented_value: Any = ctypes.c_longlong(new_value)
-      context.symbol_table.set(node.value.var_name_token.value, RuntimeNumber(decremented_value))
-      return res.success(RuntimeNumber(decremented_value))
+      start_value, end_value, step_value = self.loop_range(node, context)
+      i = start_value.value
+      if node.affine_updates is not None and self.run_affine_loop(
+          node, context, i, end_value.value, step_value.value):
+        return None
 
-  def visit_VarAccess(self, node: VarAccess, context: Context) -> RTResult:
-    res = RTResult()
-    var_name = node.var_name_token.value
-    value = context.symbol_table.get(var_name)
-    is_const = context.symbol_table.var_states.get(var_name)
-    node.is_const = is_const
-    if not value:
-      return res.failure(
+    if node.var_slot is None:
+      node.var_slot = context.symbol_table.slot_of(node.var_name.value)
+    ascending: bool = step_value.value >= 0
+    while i < end_value.value if ascending else i > end_value.value:
+      frame.state = (FOR, i, end_value, step_value)
+      if self.checkpointer.due():
+        self.save_checkpoint(context)
+      i += step_value.value
+      context.symbol_table.values[node.var_slot] = RuntimeNumber.of(
+          to_type(ctypes.c_longlong, i), ctypes.c_longlong)
+      self.visit(node.block, context)
+    return None
+
+  # NOTE: Runs a loop the optimizer found to only have constant updates in O(1)
+  # Returns False when the normal loop has to run,
+  # it then raises the same errors it always did
+  def run_affine_loop(self, node, context: Context, start, end, step) -> bool:
+    if not all(type(value) is int for value in (start, end, step)):
+      return False
+    trips: int | None = trip_count(start, end, step)
+    if trips is None:
+      return False
+    if trips == 0:
+      return True
+
+    steps: dict[str, list[int]] = {}
+    for name, amount in node.affine_updates:
+      steps.setdefault(name, []).append(amount)
+
+    new_values: dict[str, RuntimeNumber] = {}
+    for name, amounts in steps.items():
+      variable = context.symbol_table.get(name)
+      if not isinstance(variable, RuntimeNumber) or context.symbol_table.is_const(name):
+        return False
+      if variable.type_ in DECIMAL_TYPES:
+        return False  # NOTE: Rounding happens on every step, so there is no closed form
+      value: int = variable.value
+      per_iteration: int = sum(amounts)
+      # NOTE: Values inside one iteration move linearly between iterations,
+      # so checking the first and last is enough
+      moved: int = 0
+      for amount in amounts:
+        moved += amount
+        for iteration in (0, trips - 1):
+          reached: int = value + iteration * per_iteration + moved
+          if not tpchecker.is_value_in_range(variable.type_, reached):
+            return False
+      new_values[name] = RuntimeNumber.of(value + trips * per_iteration, variable.type_)
+
+    for name, number in new_values.items():
+      context.symbol_table.set(name, number)
+    context.symbol_table.set(
+        node.var_name.value, RuntimeNumber.of(start + trips * step, ctypes.c_longlong))
+    return True
+
+  # NOTE: Gives what a loop over the range would leave in an i64
+  # and raises where its update would, see runtime/ranges.py
+  def visit_RangeBuiltin(self, node: RangeBuiltin, context: Context) -> RuntimeNumber:
+    start_value, end_value, step_value = self.loop_range(node, context)
+    start, end, step = start_value.value, end_value.value, step_value.value
+    name: str = node.name_token.value
+    trips: int | None = trip_count(start, end, step)
+    if trips is None:
+      raise RTException(RTError(
+          node.pos_start, node.pos_end,
+          f"The range of `{name}` has a step of 0, it never ends", context))
+    if trips == 0 and name in ("min", "max"):
+      raise RTException(RTError(
+          node.pos_start, node.pos_end,
+          f"The range of `{name}` is empty, it has no {name}imum", context))
+    value: int | None = reduce_range(name, start, end, step, trips)
+    if value is None:
+      raise RTException(VarSizeError(
+          node.pos_start, node.pos_end,
+          f"Result of `{RANGE_BUILTINS[name] or name}` does not fit in i64"))
+    return RuntimeNumber.of(value, ctypes.c_longlong)
+
+  def visit_WhileStmt(self, node, context) -> None:
+    self.reset_hoisted(node)
+    # NOTE: A resumed loop was in its block when the checkpoint was taken,
+    # its condition was already true
+    resumed: bool = False
+    if self.checkpointer is not None:
+      resumed = self.resume is not None
+      if resumed:
+        self.resumed_state(WHILE)
+      self.frames[-1].state = (WHILE,)
+    while True:
+      if not resumed:
+        condition = self.visit(node.condition, context)
+        if not condition.is_true():
+          break
+      resumed = False
+      self.visit(node.block, context)
+
+    return None
+
+  # NOTE: Shared by the increment and decrement statements,
+  # the variable keeps its type and can't overflow
+  def update_variable(self, node, context: Context, operation: str, msg: str,
+                      amount_node=None) -> RuntimeNumber:
+    if node.value.__class__ is IndexAccess:
+      return self.update_element(node, context, operation, msg, amount_node)
+    variable = self.visit_VarAccess(node.value, context)
+    if node.value.is_const:
+      self.breaking_const_rule(node, msg=msg)
+
+    amount: int | float = 1
+    if amount_node is not None:
+      amount = self.visit(amount_node, context).value
+      if operation == "/" and amount == 0:
+        raise RTException(RTError(
+            amount_node.pos_start, amount_node.pos_end, "Division by zero", context))
+
+    new_value: int | float = update_value(
+        variable.type_, variable.value, amount, operation)
+    if not tpchecker.is_value_in_range(variable.type_, new_value):
+      raise RTException(VarSizeError(
+          node.pos_start, node.pos_end,
+          f"Result of `{operation}` does not fit in {type_map.get(variable.type_)}"))
+    new_number: RuntimeNumber = RuntimeNumber.of(
+        to_type(variable.type_, new_value), variable.type_)
+    context.symbol_table.frame(node.value.depth).values[node.value.slot] = new_number
+    if self.extremes is not None and node.value.var_name_token.value in self.extremes:
+      self.record_extreme(
+          node, node.value.var_name_token.value, new_number.value, operation)
+    # NOTE: Postfix returns the value from before the update,
+    # numbers don't change so it is the old number itself
+    if getattr(node, "postfix", False):
+      return variable
+    return new_number
+
+  # NOTE: Keeps the smallest and the largest value of a reduction variable in a chunk
+  def record_extreme(self, node, name: str, value: int | float, operation: str) -> None:
+    extremes: list[Extreme] = self.extremes[name]
+    extreme: Extreme = (value, node.pos_start, node.pos_end, operation)
+    if not extremes:
+      extremes.extend((extreme, extreme))
+    elif value < extremes[0][0]:
+      extremes[0] = extreme
+    elif value > extremes[1][0]:
+      extremes[1] = extreme
+
+  # NOTE: The same for `buf[i]++` and `incr buf[i] by n`, the element keeps its type
+  def update_element(self, node, context: Context, operation: str, msg: str,
+                     amount_node=None) -> RuntimeNumber:
+    table, buffer = self.lookup_array(node.value, context)
+    index: int = self.element_index(node.value, buffer, context)
+    if table.consts[node.value.slot]:
+      self.breaking_const_rule(node, msg=msg)
+    self.check_writable(node.value, buffer, node, context)
+
+    amount: int | float = 1
+    if amount_node is not None:
+      amount = self.visit(amount_node, context).value
+      if operation == "/" and amount == 0:
+        raise RTException(RTError(
+            amount_node.pos_start, amount_node.pos_end, "Division by zero", context))
+
+    type_: Any = buffer.elem_type
+    old_value: int | float = buffer.data[index]
+    new_value: int | float = update_value(type_, old_value, amount, operation)
+    if not tpchecker.is_value_in_range(type_, new_value):
+      raise RTException(VarSizeError(
+          node.pos_start, node.pos_end,
+          f"Result of `{operation}` does not fit in {type_map.get(type_)}"))
+    new_value = to_type(type_, new_value)
+    buffer.data[index] = new_value
+    if getattr(node, "postfix", False):
+      return RuntimeNumber.of(old_value, type_)
+    return RuntimeNumber.of(new_value, type_)
+
+  def visit_Increment(self, node, context: Context) -> RuntimeNumber:
+    return self.update_variable(
+        node, context, "+",
+        msg="Cannot perform increment operation on a constant variable")
+
+  def visit_IncrementBy(self, node: IncrementBy, context: Context) -> None:
+    self.update_variable(
+        node, context, "+", amount_node=node.amount,
+        msg="Cannot perform increment by operation on a constant variable")
+    return None
+
+  def breaking_const_rule(self, node: VarAccess, msg: str) -> Never:
+      raise RTException(ReassigningConstError(
+          details=msg, pos_start=node.pos_start, pos_end=node.pos_end))
+
+  def visit_DecrementBy(self, node: DecrementBy, context: Context) -> None:
+    self.update_variable(
+        node, context, "-", amount_node=node.amount,
+        msg="Cannot perform decrement by operation on a constant variable")
+    return None
+
+  def visit_MultiplyBy(self, node: MultiplyBy, context: Context) -> None:
+    self.update_variable(
+        node, context, "*", amount_node=node.amount,
+        msg="Cannot perform multiplication by operation on a constant variable")
+    return None
+
+  def visit_DivideBy(self, node: DivideBy, context: Context) -> None:
+    self.update_variable(
+        node, context, "/", amount_node=node.amount,
+        msg="Cannot perform division by operation on a constant variable")
+    return None
+
+  def visit_Decrement(self, node, context: Context) -> RuntimeNumber:
+    return self.update_variable(
+        node, context, "-",
+        msg="Cannot perform decrement operation on a constant variable")
+
+  def visit_VarAccess(self, node: VarAccess, context: Context) -> RuntimeNumber:
+    # NOTE: The resolver gives nodes their address before the program runs,
+    # others are resolved the first time they run
+    if node.slot is None:
+      node.depth, node.slot = context.symbol_table.address_of(node.var_name_token.value)
+    table: SymbolTable = context.symbol_table
+    if node.depth:
+      table = table.frame(node.depth)
+    value = table.values[node.slot]
+    node.is_const = table.consts[node.slot]
+    if value.__class__ is not RuntimeNumber:
+      var_name = node.var_name_token.value
+      raise RTException(
           RTError(
               node.pos_start,
               node.pos_end,
-              f"`{var_name}` is not defined",
+              f"`{var_name}` is not defined" if value is None
+              else f"`{var_name}` is an array, use `{var_name}[index]`",
               context,
           ))
-    value = value.copy().set_pos(node.pos_start, node.pos_end)
-    return res.success(value)
+    # NOTE: Numbers don't change,
+    # so a read gives the number the variable holds without copying it
+    return value
 
-  def visit_VarAssign(self, node: VarAssign, context: Context) -> RTResult:
-    res = RTResult()
+  def visit_VarAssign(self, node: VarAssign, context: Context) -> RuntimeNumber:
     var_name = node.var_name_token.value
-    value = res.register(self.visit(node.value_node, context))
-    if res.error:
-      return res
-    if context.symbol_table.get(var_name) and context.symbol_table.var_states[var_name]:
-        return res.failure(
+    value = self.visit(node.value_node, context)
+    if node.slot is None:
+      node.slot = context.symbol_table.slot_of(var_name)
+    table: SymbolTable = context.symbol_table
+    if table.values[node.slot] is not None and table.consts[node.slot]:
+        declared_start, declared_end = table.declared_at[node.slot]
+        raise RTException(
             ReassigningConstError(
                 node.pos_start,
                 node.pos_end,
-                f"`{var_name}` is already defined as const at start_pos={context.symbol_table.get(var_name).pos_start}, end_pos={context.symbol_table.get(var_name).pos_end}",
+                f"`{var_name}` is already defined as const at "
+                f"start_pos={declared_start}, end_pos={declared_end}",
             ))
-    context.symbol_table.set(var_name, value)
-    context.symbol_table.var_states[var_name] = node.is_value_const
-    return res.success(value)
+    table.values[node.slot] = value
+    table.consts[node.slot] = node.is_value_const
+    table.declared_at[node.slot] = (node.value_node.pos_start, node.value_node.pos_end)
+    return value
 
-  def visit_BinOp(self, node, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    left = res.register(self.visit(node.left_node, context))
-    if res.error: return res
-    right = res.register(self.visit(node.right_node, context))
-    if res.error: return res
-    self.OPS_MAP = {
-        # NOTE: a is left and b is right
-        TT.PLUS: lambda a, b: a.added_to(b),
-        TT.MINUS: lambda a, b: a.subbed_by(b),
-        TT.MUL: lambda a, b: a.mult_by(b),
-        TT.DIV: lambda a, b: a.divided_by(b),
-        TT.POW: lambda a, b: a.powered_by(b),
-        TT.EQ: lambda a, b: a.equals(b),
-        TT.NOT_EQ: lambda a, b: a.not_equals(b),
-        TT.LT: lambda a, b: a.less_than(b),
-        TT.L_EQ: lambda a, b: a.less_than_or_equal(b),
-        TT.GT: lambda a, b: a.greater_than(b),
-        TT.G_EQ: lambda a, b: a.greater_than_or_equal(b),
-        TT.AND: lambda a, b: a.anded_by(b),
-        TT.OR: lambda a, b: a.ored_by(b),
-    }
-    operation: Callable = self.OPS_MAP.get(node.op_token.type)
-    result, error = operation(left, right)
+  # NOTE: The table the array is in and the array, resolved once like a VarAccess
+  def lookup_array(self, node: IndexAccess | ArrayLength,
+                   context: Context) -> tuple[SymbolTable, TypedArray]:
+    if node.slot is None:
+      node.depth, node.slot = context.symbol_table.address_of(node.var_name_token.value)
+    table: SymbolTable = (context.symbol_table.frame(node.depth) if node.depth
+                          else context.symbol_table)
+    value = table.values[node.slot]
+    if not isinstance(value, TypedArray):
+      var_name = node.var_name_token.value
+      details: str = (f"`{var_name}` is not defined" if value is None
+                      else f"`{var_name}` is not an array")
+      raise RTException(RTError(node.pos_start, node.pos_end, details, context))
+    return table, value
+
+  # NOTE: Indices are whole numbers from 0 to the length - 1, none count from the end
+  def element_index(self, node: IndexAccess, buffer: TypedArray,
+                    context: Context) -> int:
+    index: RuntimeNumber = self.visit(node.index, context)
+    if index.type_ in DECIMAL_TYPES:
+      raise RTException(RTError(
+          node.index.pos_start, node.index.pos_end,
+          f"An index is a whole number, not {index}", context))
+    if not 0 <= index.value < len(buffer.data):
+      raise RTException(RTError(
+          node.pos_start, node.pos_end,
+          f"Index {index.value} is out of bounds for `{node.var_name_token.value}` "
+          f"of length {len(buffer.data)}", context))
+    return index.value
+
+  # NOTE: Arrays mapped from a file are read only, their pages are shared with the file
+  def check_writable(self, target: IndexAccess, buffer: TypedArray, node,
+                     context: Context) -> None:
+    if buffer.read_only:
+      raise RTException(RTError(
+          node.pos_start, node.pos_end,
+          f"`{target.var_name_token.value}` is mapped from `{buffer.path}`, "
+          "its elements can't be written", context))
+
+  # NOTE: A value can go in an array of type_ when it fits,
+  # a decimal can't go in a whole number array
+  def check_element(self, type_: Any, value: RuntimeNumber, node) -> None:
+    error: Error | None = tpchecker.check_type(node, type_, value.type_)
+    if error:
+      raise RTException(error)
+    if not tpchecker.is_value_in_range(type_, value.value):
+      raise RTException(VarSizeError(
+          node.pos_start, node.pos_end,
+          f"{value} does not fit in {type_map.get(type_)}"))
+
+  def visit_IndexAccess(self, node: IndexAccess, context: Context) -> RuntimeNumber:
+    _, buffer = self.lookup_array(node, context)
+    index: int = self.element_index(node, buffer, context)
+    return RuntimeNumber.of(buffer.data[index], buffer.elem_type)
+
+  def visit_IndexAssign(self, node: IndexAssign, context: Context) -> RuntimeNumber:
+    target: IndexAccess = node.target
+    table, buffer = self.lookup_array(target, context)
+    index: int = self.element_index(target, buffer, context)
+    value: RuntimeNumber = self.visit(node.value_node, context)
+    if table.consts[target.slot]:
+      self.breaking_const_rule(node, msg=(
+          "Cannot assign to an element of the constant array "
+          f"`{target.var_name_token.value}`"))
+    self.check_writable(target, buffer, node, context)
+    self.check_element(buffer.elem_type, value, node.value_node)
+    buffer.data[index] = to_type(buffer.elem_type, value.value)
+    return RuntimeNumber.of(buffer.data[index], buffer.elem_type)
+
+  def visit_ArrayLength(self, node: ArrayLength, context: Context) -> RuntimeNumber:
+    _, buffer = self.lookup_array(node, context)
+    return RuntimeNumber.of(len(buffer.data), ctypes.c_longlong)
+
+  # NOTE: The array is made once for the whole declaration,
+  # a declaration gives no value since arrays can be huge
+  def visit_ArrayAssign(self, node: ArrayAssign, context: Context) -> None:
+    var_name = node.var_name_token.value
+    length: int | None = None
+    if node.length is not None:
+      length_value: RuntimeNumber = self.visit(node.length, context)
+      if length_value.type_ in DECIMAL_TYPES or length_value.value < 0:
+        raise RTException(RTError(
+            node.length.pos_start, node.length.pos_end,
+            "The length of an array is a whole number of 0 or more, "
+            f"not {length_value}", context))
+      length = length_value.value
+    try:
+      if isinstance(node.value_node, ArrayLiteral):
+        buffer: TypedArray = self.make_literal(node, length, context)
+      elif isinstance(node.value_node, MappedFile):
+        buffer = self.map_array(node, length, context)
+      else:
+        fill: RuntimeNumber = self.visit(node.value_node, context)
+        self.check_element(node.type_, fill, node.value_node)
+        buffer = filled_array(node.type_, to_type(node.type_, fill.value), length)
+    except MemoryError:
+      raise RTException(RTError(
+          node.pos_start, node.pos_end, f"Not enough memory for `{var_name}`", context))
+
+    if node.slot is None:
+      node.slot = context.symbol_table.slot_of(var_name)
+    table: SymbolTable = context.symbol_table
+    if table.values[node.slot] is not None and table.consts[node.slot]:
+      declared_start, declared_end = table.declared_at[node.slot]
+      raise RTException(ReassigningConstError(
+          node.pos_start, node.pos_end,
+          f"`{var_name}` is already defined as const "
+          f"at start_pos={declared_start}, end_pos={declared_end}"))
+    table.values[node.slot] = buffer
+    table.consts[node.slot] = node.is_value_const
+    table.declared_at[node.slot] = (node.value_node.pos_start, node.value_node.pos_end)
+    return None
+
+  # NOTE: The elements are read from the file when they are indexed,
+  # mapping a huge file only reserves the addresses
+  def map_array(self, node: ArrayAssign, length: int | None,
+                context: Context) -> TypedArray:
+    mapped: MappedFile = node.value_node
+    path: str = mapped.path_token.value
+    offset: int = 0
+    if mapped.offset is not None:
+      offset_value: RuntimeNumber = self.visit(mapped.offset, context)
+      if offset_value.type_ in DECIMAL_TYPES or offset_value.value < 0:
+        raise RTException(RTError(
+            mapped.offset.pos_start, mapped.offset.pos_end,
+            "The offset of a mapped file is a whole number of bytes of 0 or more, "
+            f"not {offset_value}", context))
+      offset = offset_value.value
+    try:
+      return map_file(node.type_, path, offset, length)
+    except OSError as error:
+      raise RTException(RTError(
+          mapped.pos_start, mapped.pos_end,
+          f"Can't map `{path}`: {error.strerror or error}", context))
+    except ValueError as error:
+      raise RTException(RTError(mapped.pos_start, mapped.pos_end, str(error), context))
+
+  def make_literal(self, node: ArrayAssign, length: int | None,
+                   context: Context) -> TypedArray:
+    literal: ArrayLiteral = node.value_node
+    values: list[RuntimeNumber] = [
+        self.visit(element, context) for element in literal.elements]
+    if length is not None and len(values) != length:
+      raise RTException(RTError(
+          literal.pos_start, literal.pos_end,
+          f"`{node.var_name_token.value}` has a length of {length}, "
+          f"got {len(values)} values", context))
+    type_: Any = node.type_
+    if type_ is None:
+      type_ = narrowest_type([value.value for value in values])
+      if type_ is None:
+        raise RTException(VarSizeError(
+            literal.pos_start, literal.pos_end, "The values don't fit in one type"))
+    for element, value in zip(literal.elements, values):
+      self.check_element(type_, value, element)
+    return array_of(type_, [to_type(type_, value.value) for value in values])
+
+  def visit_BinOp(self, node, context: Context) -> RuntimeNumber:
+    left = self.visit(node.left_node, context)
+    if node.op_token.type in (TT.AND, TT.OR):
+      if self.profile is not None:
+        self.profile.record(node.left_node, left.is_true())
+      # NOTE: `&&` stops at a false left side and `||` at a true one,
+      # the right side is never evaluated
+      if left.is_true() == (node.op_token.type == TT.OR):
+        return self.short_circuit(node, left, context)
+    right = self.visit(node.right_node, context)
+    if self.profile is not None and node.op_token.type in (TT.AND, TT.OR):
+      self.profile.record(node.right_node, right.is_true())
+    operation: Callable | None = BINARY_OPS.get(node.op_token.type)
+    if operation is None:
+      raise RTException(
+          RTError(node.pos_start, node.pos_end, "Unknown binary operation",
+                  context))
+    result, error = operation(
+        left, right, node.result_type, node.checked, node, context)
     # NOTE: Checks for errors
-    if error: return res.failure(error)
-    if result: return res.success(result.set_pos(node.pos_start, node.pos_end))
-    return res.failure(
+    if error: raise RTException(error)
+    if result: return result
+    raise RTException(
         RTError(node.pos_start, node.pos_end, "Unknown binary operation",
                 context))
 
-  def visit_UnaryOp(self, node, context: Context) -> RTResult:
-    res: RTResult = RTResult()
-    number = res.register(self.visit(node.node, context))
-    if res.error:
-      return res
-    error = None
-    match node.op_tok.type:
-      case TT.MINUS:
-        number, error = number.mult_by(RuntimeNumber(ctypes.c_short(-1)))
-      case TT.NOT:
-        number, error = number.notted()
+  # NOTE: `x && x` and `x || x` are x,
+  # so the left side with itself gives its value in the type of the result
+  # Without an inferred type the right side isn't known,
+  # the result then keeps the type of the left side
+  def short_circuit(self, node, left: RuntimeNumber, context: Context) -> RuntimeNumber:
+    result, error = BINARY_OPS[node.op_token.type](
+        left, left, node.result_type, node.checked, node, context)
     if error:
-      return res.failure(error)
-    return res.success(number.set_pos(node.pos_start, node.pos_end))
+      raise RTException(error)
+    return result
+
+  def visit_UnaryOp(self, node, context: Context) -> RuntimeNumber:
+    number = self.visit(node.node, context)
+    number, error = UNARY_OPS[node.op_tok.type](
+        number, node.result_type, node.checked, node, context)
+    if error:
+      raise RTException(error)
+    return number
 
   # In INTERPRETER.py
 
-  def visit_IfExpr(self, node, context: Context) -> RTResult:
-    res: RTResult = RTResult()
+  def visit_IfExpr(self, node, context: Context) -> Any:
+    if self.checkpointer is not None:
+      if self.resume is not None:
+        index: int = self.resumed_state(IF)[1]
+      else:
+        index = self.pick_case(node, context)
+      return self.visit_case(node, index, context)
+    if node.dispatch is not None:
+      # NOTE: Jump table chain, the variable is read once and the literal picks the case
+      value = self.visit_VarAccess(node.dispatch_var, context)
+      # NOTE: A decimal value is compared as a decimal,
+      # so the cases are checked one by one
+      if value.type_ not in DECIMAL_TYPES:
+        index: int | None = node.dispatch.get(int(value.value))
+        if index is None:
+          return self.visit_else(node, context)
+        return self.visit(node.cases[index][1], context)
 
     for condition, expr in node.cases:
-      condition_value = res.register(self.visit(condition, context))
-      if res.error:
-        return res
+      condition_value = self.visit(condition, context)
 
+      if self.profile is not None:
+        self.profile.record(condition, condition_value.is_true())
       if condition_value.is_true():
         # expr is the list of nodes inside the { }
-        expr_value = res.register(self.visit(expr, context))
-        if res.error:
-          return res
-        return res.success(expr_value)
-
-    if node.else_case:
-      else_value = res.register(self.visit(node.else_case, context))
-      if res.error:
-        return res
-      return res.success(else_value)
-
-    return res.success(RuntimeNumber(ctypes.c_ushort(0)))
+        return self.visit(expr, context)
+
+    return self.visit_else(node, context)
+
+  # NOTE: Index of the case visit_IfExpr runs, -1 for the else case
+  def pick_case(self, node, context: Context) -> int:
+    if node.dispatch is not None:
+      value = self.visit_VarAccess(node.dispatch_var, context)
+      if value.type_ not in DECIMAL_TYPES:
+        return node.dispatch.get(int(value.value), -1)
+
+    for index, (condition, expr) in enumerate(node.cases):
+      condition_value = self.visit(condition, context)
+      if self.profile is not None:
+        self.profile.record(condition, condition_value.is_true())
+      if condition_value.is_true():
+        return index
+    return -1
+
+  # NOTE: With checkpoints on, the frame keeps which case runs
+  # so a resumed program goes back into the same one
+  def visit_case(self, node, index: int, context: Context) -> Any:
+    self.frames[-1].state = (IF, index)
+    if index < 0:
+      return self.visit_else(node, context)
+    return self.visit(node.cases[index][1], context)
+
+  def visit_else(self, node, context: Context) -> Any:
+    # NOTE: The optimizer can leave an empty else block, it still counts as an else
+    if node.else_case is not None:
+      return self.visit(node.else_case, context)
+    return RuntimeNumber.of(0, ctypes.c_ushort)
@@ -0,0 +1,226 @@
+"""
+Runs the top-level statements of a program at the same time
+when they don't touch the same variables
+  - a statement depends on the statements before it that write a variable it reads
+    or writes, and on the ones that keep a CSE value it loads
+  - a statement starts once the statements it depends on finished,
+    in a snapshot of the variables they left
+  - what every statement wrote goes into the symbol table in program order,
+    up to the first statement that failed
+  - once a statement fails, the ones after it are stopped
+    and nothing after it is started
+So the variables, the values and the error are the same
+as running the statements one after the other
+Branch profiles and checkpoints aren't used, the statements run in plain interpreters
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any
+
+from backend.INTERPRETER import Context, Interpreter, SymbolTable, find_temp_stores
+from middle_end.AST import TempLoad, TempStore
+from middle_end.ERRORS import Error, RTResult
+from middle_end.TRANSFORMER import collect_reads, collect_writes, iter_children
+
+# NOTE: name -> (value, is const, declared at) of every variable a statement can write,
+# taken after it ran
+Writes = dict[str, tuple[Any, bool, tuple[Any, Any]]]
+# NOTE: (value, error, writes, TempStore values, seconds) of a statement that ran
+Outcome = tuple[Any, Error | None, Writes, list[Any], float]
+
+
+# NOTE: The TempStore of every TempLoad in node, with repeats
+def find_temp_loads(node, stores: list[TempStore]) -> list[TempStore]:
+  if isinstance(node, TempLoad):
+    stores.append(node.store)
+  for child in iter_children(node):
+    find_temp_loads(child, stores)
+  return stores
+
+
+"""
+One top-level statement and what it touches
+  - accesses has the variables it reads and writes,
+    writing a variable checks if it is const so it counts as a read
+  - loads are TempStores of other statements, their values are sent with the statement
+  - deps are the statements it depends on directly, ancestors all of them
+"""
+class Statement:
+  def __init__(self, index: int, node) -> None:
+    self.index = index
+    self.node = node
+    self.writes: set[str] = collect_writes(node)
+    self.accesses: set[str] = collect_reads(node) | self.writes
+    self.stores: list[TempStore] = find_temp_stores(node, [])
+    own: set[int] = {id(store) for store in self.stores}
+    loads: dict[int, TempStore] = {
+        id(store): store
+        for store in find_temp_loads(node, []) if id(store) not in own}
+    self.loads: list[TempStore] = list(loads.values())
+    # NOTE: (statement, position in its stores) of every load
+    self.load_from: list[tuple[int, int]] = []
+    self.deps: set[int] = set()
+    self.ancestors: set[int] = set()
+    # NOTE: Statements on the longest chain of dependencies that ends here
+    self.depth: int = 1
+
+
+def build_graph(program: list) -> list[Statement]:
+  statements: list[Statement] = [
+      Statement(index, node) for index, node in enumerate(program)]
+  owners: dict[int, tuple[int, int]] = {
+      id(store): (statement.index, position)
+      for statement in statements for position, store in enumerate(statement.stores)}
+  for statement in statements:
+    for earlier in statements[:statement.index]:
+      if earlier.writes & statement.accesses:
+        statement.deps.add(earlier.index)
+    statement.load_from = [owners[id(store)] for store in statement.loads]
+    statement.deps.update(index for index, _ in statement.load_from)
+    for dep in statement.deps:
+      statement.ancestors |= statements[dep].ancestors | {dep}
+      statement.depth = max(statement.depth, statements[dep].depth + 1)
+  return statements
+
+
+def apply_writes(table: SymbolTable, writes: Writes) -> None:
+  table.own()
+  for name, (value, is_const, declared_at) in writes.items():
+    slot: int = table.slot_of(name)
+    table.values[slot] = value
+    table.consts[slot] = is_const
+    table.declared_at[slot] = declared_at
+
+
+# NOTE: Runs one statement in table, in a worker process or in this one
+# Gives its value, its error, what it wrote, the values of its TempStores
+# and the seconds it ran
+def run_statement(node, table: SymbolTable, loads: list[TempStore],
+                  values: list[Any]) -> Outcome:
+  for store, value in zip(loads, values):
+    store.value = value
+  context: Context = Context("<program>")
+  context.symbol_table = table
+  # NOTE: CPU time of this process,
+  # statements sharing a core don't count the time they waited for it
+  started: float = time.process_time()
+  res: RTResult = Interpreter().run(node, context)
+  seconds: float = time.process_time() - started
+  writes: Writes = {}
+  for name in collect_writes(node):
+    slot: int = table.slot_of(name)
+    writes[name] = (table.values[slot], table.consts[slot], table.declared_at[slot])
+  temps: list[Any] = [store.value for store in find_temp_stores(node, [])]
+  return res.value, res.error, writes, temps, seconds
+
+
+"""
+What the scheduler found and how much of it ran at the same time,
+printed after a run with --schedule
+"""
+class ScheduleReport:
+  def __init__(self, statements: int, dependencies: int, longest_chain: int) -> None:
+    self.statements = statements
+    self.dependencies = dependencies
+    self.longest_chain = longest_chain  # NOTE: Statements on the critical path
+    # NOTE: Seconds the critical path took, no schedule can finish sooner
+    self.critical_path: float = 0.0
+    self.work: float = 0.0  # NOTE: Seconds all statements took together
+    self.wall: float = 0.0
+
+  def __repr__(self) -> str:
+    achieved: float = self.work / self.wall if self.wall else 1.0
+    possible: float = self.work / self.critical_path if self.critical_path else 1.0
+    return (f"schedule: {self.statements} statements, "
+            f"{self.dependencies} dependencies, "
+            f"critical path {self.longest_chain} statements "
+            f"{self.critical_path * 1000:.3f}ms, "
+            f"work {self.work * 1000:.3f}ms in {self.wall * 1000:.3f}ms, "
+            f"parallelism {achieved:.2f} (at most {possible:.2f})")
+
+
+"""
+Runs a program's top-level statements in up to workers processes,
+see the top of this file
+With 1 worker the statements run in this process one after the other,
+through the same snapshots
+"""
+class Scheduler:
+  def __init__(self, workers: int = 1) -> None:
+    self.workers = workers
+
+  def run(self, program: list, context: Context) -> tuple[RTResult, ScheduleReport]:
+    started: float = time.perf_counter()
+    statements: list[Statement] = build_graph(program)
+    report: ScheduleReport = ScheduleReport(
+        len(statements), sum(len(statement.deps) for statement in statements),
+        max((statement.depth for statement in statements), default=0))
+    base: SymbolTable = context.symbol_table.snapshot()
+    results: dict[int, Outcome] = {}
+    # NOTE: Statements after the first one that failed don't matter,
+    # they are never started
+    first_error: int = len(statements)
+
+    def task(statement: Statement) -> tuple:
+      table: SymbolTable = base.snapshot()
+      for index in sorted(statement.ancestors):
+        apply_writes(table, results[index][2])
+      values: list[Any] = [results[index][3][position]
+                           for index, position in statement.load_from]
+      return statement.node, table, statement.loads, values
+
+    if self.workers > 1 and len(statements) > 1:
+      pool: ProcessPoolExecutor = ProcessPoolExecutor(
+          max_workers=min(self.workers, len(statements)))
+      running: dict[Future, int] = {}
+      submitted: set[int] = set()
+      try:
+        while True:
+          for statement in statements[:first_error]:
+            if statement.index not in submitted and statement.deps <= results.keys():
+              running[pool.submit(run_statement, *task(statement))] = statement.index
+              submitted.add(statement.index)
+          # NOTE: Only the statements before the first error are waited for,
+          # one of them can still fail earlier
+          if not any(index < first_error for index in running.values()):
+            break
+          done, _ = wait(running, return_when=FIRST_COMPLETED)
+          for future in done:
+            index: int = running.pop(future)
+            results[index] = future.result()
+            if results[index][1] is not None:
+              first_error = min(first_error, index)
+      finally:
+        # NOTE: What still runs is after an error and may never end,
+        # so the workers are stopped instead of waited for
+        if running:
+          pool.terminate_workers()
+        else:
+          pool.shutdown()
+    else:
+      for statement in statements:
+        results[statement.index] = run_statement(*task(statement))
+        if results[statement.index][1] is not None:
+          first_error = statement.index
+          break
+
+    # NOTE: A statement that failed keeps what it wrote before the error,
+    # like it would running in order
+    table: SymbolTable = context.symbol_table
+    for index in range(min(first_error + 1, len(statements))):
+      apply_writes(table, results[index][2])
+
+    finished: dict[int, float] = {}
+    for index in sorted(results):
+      seconds: float = results[index][4]
+      report.work += seconds
+      waited: float = max(
+          (finished[dep] for dep in statements[index].deps), default=0.0)
+      finished[index] = seconds + waited
+    report.critical_path = max(finished.values(), default=0.0)
+    report.wall = time.perf_counter() - started
+
+    res: RTResult = RTResult()
+    if first_error < len(statements):
+      return res.failure(results[first_error][1]), report
+    return res.success([results[index][0] for index in range(len(statements))]), report
@@ -2,33 +2,129 @@
 from frontend.LEXER import Lexer
 from frontend.PARSER import ParseResult, Parser
 from backend.INTERPRETER import Interpreter, Context, SymbolTable, RuntimeNumber
+from backend.SCHEDULER import Scheduler
+from middle_end.AFFINE import AffineLoopAnalyzer
+from middle_end.CONSTFOLD import ConstantFolder
+from middle_end.CSE import CommonSubexprEliminator
+from middle_end.DEADCODE import DeadCodeEliminator
+from middle_end.INTERVALS import IntervalAnalyzer
+from middle_end.JUMPTABLE import JumpTableBuilder
+from middle_end.LICM import LoopInvariantHoister
+from middle_end.PASSMANAGER import PassManager
+from middle_end.REDUCTION import ReductionAnalyzer
+from middle_end.REORDER import BranchReorderer
+from middle_end.RESOLVER import Resolver
+from middle_end.TRANSFORMER import OptReport, PassResult
+from runtime.checkpoint import Checkpointer, program_hash
+from runtime.profile import BranchProfile
+from typechecking.TYPEINFER import TypeInferencer
+from typing import Any
+import os
 import sys
 import ctypes
 
-global_symbol_table: SymbolTable = SymbolTable()
+# NOTE: Base layer with only the builtins, it never changes, programs run in forks of it
+builtin_symbol_table: SymbolTable = SymbolTable()
 
-# NOTE: This is for null variables, they are like Python's None
-global_symbol_table.set("null", RuntimeNumber(ctypes.c_uint8(0)))
-global_symbol_table.set("mid", RuntimeNumber(ctypes.c_uint8(0)))  # null
+BUILTIN_CONSTANTS: dict[str, Any] = {
+  # NOTE: This is for null variables, they are like Python's None
+  "null": ctypes.c_uint8(0),
+  "mid": ctypes.c_uint8(0),  # null
 
-# NOTE: This is for true variables
-global_symbol_table.set("true", RuntimeNumber(ctypes.c_uint8(1)))
-global_symbol_table.set("nocap", RuntimeNumber(ctypes.c_uint8(1)))  # true
+  # NOTE: This is for true variables
+  "true": ctypes.c_uint8(1),
+  "nocap": ctypes.c_uint8(1),  # true
 
-# NOTE: This is for representing false
-global_symbol_table.set("false", RuntimeNumber(ctypes.c_uint8(0)))
-global_symbol_table.set("cap", RuntimeNumber(ctypes.c_uint8(0)))  # false
+  # NOTE: This is for representing false
+  "false": ctypes.c_uint8(0),
+  "cap": ctypes.c_uint8(0),  # false
+}
+for name, value in BUILTIN_CONSTANTS.items():
+  builtin_symbol_table.set(name, RuntimeNumber.from_ctypes(value))
+builtin_symbol_table.freeze()
+
+
+# NOTE: A fresh environment with only the builtins,
+# forking costs the same no matter how many programs ran before
+def new_symbol_table() -> SymbolTable:
+  return builtin_symbol_table.fork()
+
+
+# NOTE: Used by run() when it isn't given a table,
+# the REPL keeps its variables in it between lines
+global_symbol_table: SymbolTable = new_symbol_table()
+# NOTE: Table of the run that is being compiled, the passes below read it
+active_symbol_table: SymbolTable = global_symbol_table
 
 """Debug flags"""
 dbg_lex = False  # NOTE: Prints tokens for debugging
 dbg_parse = True  # NOTE: Makes an ast.th_dbg file for debugging
+dbg_opt = False  # NOTE: Prints what the optimizer did, with the time of every pass
+# NOTE: Prints the AST before and after every pass, see middle_end/IR.py
+dump_ir = False
+# NOTE: Set with --profile=<file>, orders conditions by how they went in earlier runs
+branch_profile: BranchProfile | None = None
+# NOTE: Set with --checkpoint=<file>, a long run can continue from its last checkpoint
+checkpoint_path: str | None = None
+# NOTE: Seconds between checkpoints, set with --checkpoint-every=<seconds>
+checkpoint_every: float = 60.0
+# NOTE: Processes that run the chunks of par loops, set with --workers=<n>
+workers: int = os.cpu_count() or 1
+# NOTE: Set with --schedule,
+# runs top-level statements that don't share variables at the same time
+schedule = False
+# NOTE: -O0 only infers types, -O1 also folds constants, removes dead code and drops the
+# checks that can't fail, -O2 runs every pass
+opt_level = 2
+
+
+# NOTE: Uses the current values since the REPL can overwrite builtins
+def current_builtins() -> dict[str, tuple[Any, Any]]:
+  builtins: dict[str, tuple[Any, Any]] = {}
+  for name in BUILTIN_CONSTANTS:
+    value = active_symbol_table.get(name)
+    if isinstance(value, RuntimeNumber):
+      builtins[name] = (value.value, value.type_)
+  return builtins
+
+
+def current_consts() -> set[str]:
+  return {name for name in active_symbol_table.symbols
+          if active_symbol_table.is_const(name)}
+
+
+def current_var_types() -> dict[str, Any]:
+  return {name: value.type_ for name, value in active_symbol_table.symbols.items()}
+
+
+pass_manager: PassManager = PassManager()
+pass_manager.register("typeinfer", 0, lambda: TypeInferencer(current_var_types()))
+pass_manager.register(
+    "constfold", 1, lambda: ConstantFolder(current_builtins(), current_consts()))
+pass_manager.register("deadcode", 1, DeadCodeEliminator)
+pass_manager.register("intervals", 1, lambda: IntervalAnalyzer(current_var_types()))
+pass_manager.register(
+    "reorder", 2, lambda: BranchReorderer(branch_profile, current_var_types()))
+pass_manager.register("jumptable", 2, JumpTableBuilder)
+pass_manager.register("licm", 2, LoopInvariantHoister)
+pass_manager.register("affine", 2, AffineLoopAnalyzer)
+pass_manager.register("reduction", 2, ReductionAnalyzer)
+pass_manager.register("cse", 2, CommonSubexprEliminator)
+# NOTE: Last, it gives the final nodes their slots
+pass_manager.register("resolve", 0, lambda: Resolver(active_symbol_table))
 
 # Run function
 
 
-def run(fn: str, text: str | None):
+# NOTE: symbol_table is where the program's variables go,
+# give each program new_symbol_table() to keep them apart
+def run(fn: str, text: str | None, symbol_table: SymbolTable | None = None):
+  global active_symbol_table
   if text is None:
     return None
+  active_symbol_table = global_symbol_table
+  if symbol_table is not None:
+    active_symbol_table = symbol_table
   lexer: Lexer = Lexer(fn, text)
   tokens, error = lexer.get_tokens()
   if error:
@@ -37,7 +133,7 @@ def run(fn: str, text: str | None):
     for token in tokens:
       print(token)
   """Generate AST"""
-  parser: Parser = Parser(tokens)
+  parser: Parser = Parser(tokens, set(current_var_types()))
   ast: ParseResult = parser.parse()
   if ast.error:
     return ast
@@ -46,18 +142,65 @@ def run(fn: str, text: str | None):
       f.write(f"tokens[{len(tokens)}]: __format__ = Type, Contained:\n\n")
       for node in ast.node:
         f.write(repr(node))
+  """Optimize program"""
+  report: OptReport | None = OptReport() if dbg_opt else None
+  opt: PassResult = pass_manager.run(
+      ast.node, opt_level, report, print if dump_ir else None)
+  if opt.error:
+    return opt
+  ast.node = opt.node
+  if report is not None:
+    print(report)
   """Run program"""
 
-  interpreter: Interpreter = Interpreter()
+  checkpointer: Checkpointer | None = None
+  if checkpoint_path is not None:
+    checkpointer = Checkpointer(checkpoint_path, checkpoint_every,
+                                program_hash(text, opt_level, branch_profile))
+    if checkpointer.resume is not None:
+      print(f"Resuming from {checkpoint_path}")
   context: Context = Context("<program>")
-  context.symbol_table = global_symbol_table
-  result = interpreter.visit(ast.node, context)
+  context.symbol_table = active_symbol_table
+  # NOTE: A checkpoint is taken in the middle of one run,
+  # so checkpointed runs go one statement after the other
+  if schedule and checkpointer is None:
+    result, schedule_report = Scheduler(workers).run(ast.node, context)
+    print(schedule_report)
+    return result
+  interpreter: Interpreter = Interpreter(branch_profile, checkpointer, workers)
+  result = interpreter.run(ast.node, context)
+  # NOTE: The run got to the end, with or without an error,
+  # so there is nothing left to resume
+  if checkpointer is not None:
+    checkpointer.discard()
   return result
 
 
 if __name__ == "__main__":
   text: str | None = None
-  if len(sys.argv) == 1:
+  profile_path: str | None = None
+  args: list[str] = []
+  for arg in sys.argv[1:]:
+    if arg in ("-O0", "-O1", "-O2"):
+      opt_level = int(arg[2])
+    elif arg == "--dump-ir":
+      dump_ir = True
+    elif arg == "--opt-report":
+      dbg_opt = True
+    elif arg.startswith("--profile="):
+      profile_path = arg.split("=", 1)[1]
+      branch_profile = BranchProfile.load(profile_path)
+    elif arg.startswith("--checkpoint="):
+      checkpoint_path = arg.split("=", 1)[1]
+    elif arg.startswith("--checkpoint-every="):
+      checkpoint_every = float(arg.split("=", 1)[1])
+    elif arg.startswith("--workers="):
+      workers = max(1, int(arg.split("=", 1)[1]))
+    elif arg == "--schedule":
+      schedule = True
+    else:
+      args.append(arg)
+  if not args:
     text = input("warning-lang> ")
     while text != "exit":
       result = run("<stdin>", text)
@@ -74,12 +217,14 @@ if __name__ == "__main__":
 
         print_results(result.value)
       text = input("warning-lang> ")
-  if len(sys.argv) > 1:
-    with open(sys.argv[1], "r") as f:
+  if args:
+    with open(args[0], "r") as f:
       print("This is warning-lang")
-      print(f"Interpreting: {sys.argv[1]} [file]")
+      print(f"Interpreting: {args[0]} [file]")
       text: str | None = f.read()
-  result = run(f"{sys.argv[1]}", text)
+  result = run(f"{args[0]}", text)
+  if profile_path is not None:
+    branch_profile.save(profile_path)
   if result.error:
     print(result.error)
   elif result.value:
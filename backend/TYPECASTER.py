@@ -1,5 +1,7 @@
 from typing import Any
 
+from runtime.kernels import to_type
+
 class TypeCaster:
   def __init__(self) -> None:
     ...
@@ -9,4 +11,4 @@ class TypeCaster:
     if object.casted:
         return object_value
     object.casted = True
-    return casting_type(object_value)
\ No newline at end of file
+    return to_type(casting_type, object_value)
\ No newline at end of file
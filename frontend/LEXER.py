@@ -3,6 +3,7 @@
 from frontend.TOKENS import Token, TT
 from middle_end.ERRORS import ExpectedCharError, IllegalCharError, Error
 from middle_end.POSITION import Pos
+from runtime.typemap import TYPE_NAMES
 from typing import Any
 import string
 
@@ -25,9 +26,7 @@ class Lexer:
         # NOTE: The plus and minus operators will be handles seperately 
     }
     self.KEYWORDS: list[str] = [
-        "i64", "i32", "i16","i8",        # Signed Integer Types
-        "u64", "u32", "u16","u8",       # Unsigned Integer Types
-        "f32", "f64",                   # Float Types 
+        *TYPE_NAMES,                    # Number Types, from the type registry
         "if", "else", "elif",           # Conditionals
         "for", "while", "step", "in",   # Loops
         "decr", "incr", "mult", "div", "by", # Modifying variable by an amount
@@ -168,6 +167,20 @@ class Lexer:
         details="Expected another `|`, use `||` next time!\nOr else...",
     )
 
+  # NOTE: Text between backticks, it can't hold a backtick itself
+  def make_string(self) -> tuple[Token, None] | tuple[list, Error]:
+    pos_start: Pos = self.pos.copy()
+    self.advance()
+    text: str = ""
+    while self.current_char is not None and self.current_char != "`":
+      text += self.current_char
+      self.advance()
+    if self.current_char is None:
+      return [], ExpectedCharError(pos_start, self.pos, details="Expected a closing `")
+    self.advance()
+    return Token(type_=TT.STRING, value=text, pos_start=pos_start,
+                 pos_end=self.pos), None
+
   # NOTE: This handles increment and increment by (++, +=)
   def make_increment(self) -> Token:
     pos_start: Pos = self.pos.copy()
@@ -248,6 +261,32 @@ class Lexer:
             Token(type_=TT.RPAREN, value=self.current_char,
                   pos_start=self.pos))
         self.advance()
+      elif self.current_char == "[":
+        tokens.append(
+            Token(type_=TT.LBRACKET, value=self.current_char,
+                  pos_start=self.pos))
+        self.advance()
+      elif self.current_char == "]":
+        tokens.append(
+            Token(type_=TT.RBRACKET, value=self.current_char,
+                  pos_start=self.pos))
+        self.advance()
+      elif self.current_char == ":":
+        tokens.append(
+            Token(type_=TT.COLON, value=self.current_char,
+                  pos_start=self.pos))
+        self.advance()
+      elif self.current_char == ",":
+        tokens.append(
+            Token(type_=TT.COMMA, value=self.current_char,
+                  pos_start=self.pos))
+        self.advance()
+
+      elif self.current_char == "`":
+        token, error = self.make_string()
+        if error:
+          return [], [error]
+        tokens.append(token)
 
       elif self.current_char == "!":
         token, error = self.make_not_eq()
@@ -3,17 +3,91 @@ from typing import Any, Self
 
 from frontend.TOKENS import TT, Token
 from middle_end.AST import (
-  BinOp, Decrement,
-  DecrementBy, ForExpr,
-  IfExpr, Increment,
-  IncrementBy, Number,
-  RangeNode, UnaryOp,
-  VarAccess, VarAssign,
-  WhileStmt,
+  ArrayAssign, ArrayLength,
+  ArrayLiteral, BinOp,
+  Decrement, DecrementBy,
+  ForExpr, IfExpr,
+  Increment, IncrementBy,
+  IndexAccess, IndexAssign,
+  MappedFile, Number,
+  RangeBuiltin, RangeNode,
+  UnaryOp, VarAccess,
+  VarAssign, WhileStmt,
 )
-from middle_end.ERRORS import InvalidSyntaxError, MissingSemicolonError
+from middle_end.ERRORS import Error, InvalidSyntaxError, MissingSemicolonError
 from middle_end.POSITION import Pos
-from runtime.typemap import inverse_type_map
+from middle_end.TRANSFORMER import iter_children
+from runtime.ranges import RANGE_BUILTINS
+from runtime.typemap import NAME_CODES, inverse_type_map
+
+
+UPDATE_STMTS: tuple[type, ...] = (Increment, Decrement, IncrementBy, DecrementBy)
+
+
+# NOTE: What a par loop body can't do with a variable, the errors start with its name
+ONLY_REDUCTIONS: str = ("is declared outside the par loop, "
+                        "the loop can only add to its reduction variables")
+UNKNOWN_SUM: str = "is a reduction variable, its value isn't known inside the par loop"
+SHARED_ELEMENTS: str = ("is declared outside the par loop, "
+                        "its elements can't be written in it")
+
+
+def par_error(node, name: str, problem: str) -> Error:
+  return InvalidSyntaxError(node.pos_start, node.pos_end, f"`{name}` {problem}")
+
+
+# NOTE: Every chunk of a par loop starts from the variables as they were before the loop
+# and only its sums are kept, so the body can only add to its reduction variables
+# and write the variables it declares itself
+# Arrays declared outside are shared by the chunks that run in this process,
+# so their elements can't be written either
+def check_parallel_body(loop: ForExpr, outer: set[str]) -> Error | None:
+  reductions: set[str] = set(loop.reductions)
+  declared: set[str] = outer | reductions
+
+  def check(node, is_stmt: bool) -> Error | None:
+    if isinstance(node, list):
+      for stmt in node:
+        error: Error | None = check(stmt, True)
+        if error:
+          return error
+      return None
+    is_update: bool = isinstance(node, UPDATE_STMTS)
+    if is_update and isinstance(node.value, VarAccess):
+      name: str = node.value.var_name_token.value
+      if name in reductions:
+        # NOTE: x++ in an expression gives the value of x, only the sum of one chunk
+        if not is_stmt:
+          return par_error(node, name, UNKNOWN_SUM)
+        if isinstance(node, (IncrementBy, DecrementBy)):
+          return check(node.amount, False)
+        return None
+      if name in outer:
+        return par_error(node, name, ONLY_REDUCTIONS)
+    elif (is_update and isinstance(node.value, IndexAccess)
+          or isinstance(node, IndexAssign)):
+      target: IndexAccess = node.value if is_update else node.target
+      if target.var_name_token.value in declared:
+        return par_error(node, target.var_name_token.value, SHARED_ELEMENTS)
+    elif (isinstance(node, (VarAssign, ArrayAssign))
+          and node.var_name_token.value in declared):
+      return par_error(node, node.var_name_token.value, ONLY_REDUCTIONS)
+    elif isinstance(node, ForExpr):
+      if node.parallel:
+        return InvalidSyntaxError(
+            node.pos_start, node.pos_end, "A par loop can't be inside another par loop")
+      if node.var_name.value in declared:
+        return par_error(node, node.var_name.value, ONLY_REDUCTIONS)
+    elif (isinstance(node, (VarAccess, IndexAccess, ArrayLength))
+          and node.var_name_token.value in reductions):
+      return par_error(node, node.var_name_token.value, UNKNOWN_SUM)
+    for child in iter_children(node):
+      error = check(child, False)
+      if error:
+        return error
+    return None
+
+  return check(loop.block, True)
 
 
 class ParseResult:
@@ -42,11 +116,15 @@ class ParseResult:
 
 
 class Parser:
-  def __init__(self, tokens: list[Token]) -> None:
+  # NOTE: defined has the variables that already exist when the program starts,
+  # like the ones of earlier REPL lines
+  def __init__(self, tokens: list[Token], defined: set[str] | None = None) -> None:
     self.tokens = tokens
     self.token_index = -1
     self.advance()
     self.prev_token: Token
+    # NOTE: Every variable declared so far, par loops can't write to them
+    self.declared: set[str] = set(defined or ())
 
   def expect(self, type_, value=None) -> bool:
     if type(type_) is tuple:
@@ -61,6 +139,12 @@ class Parser:
   def consume(self, res: ParseResult):
     self.advance()
     res.register_advancement()
+  # NOTE: The token after the current one, only looked at before the EOF token
+  def peek(self) -> Token:
+    return self.tokens[self.token_index + 1]
+  def syntax_error(self, details: str) -> InvalidSyntaxError:
+    return InvalidSyntaxError(
+        self.current_token.pos_start, self.current_token.pos_end, details)
   # Factor is int, float, var, increment, decrement
   def factor(self) -> ParseResult:
     tok: Token = self.current_token
@@ -87,12 +171,22 @@ class Parser:
       return res.success(Number(tok, type_=None))
     elif tok.type == TT.IDENT:
       self.consume(res)
+      # NOTE: There are no function calls,
+      # so a builtin name is only a builtin when a `(` follows it
+      if tok.value in RANGE_BUILTINS and self.expect(TT.LPAREN):
+        return self.range_builtin(tok)
+      if tok.value == "len" and self.expect(TT.LPAREN):
+        return self.array_length(tok)
       node = VarAccess(tok)
+      if self.expect(TT.LBRACKET):
+        node = res.register(self.index_access(tok))
+        if res.error:
+          return res
       if self.current_token.type in (TT.INCREMENT, TT.DECREMENT):
         op_tok = self.current_token
         self.consume(res)
         return res.success(Increment(node, True) if op_tok.type == TT.INCREMENT else Decrement(node, True))
-      return res.success(VarAccess(tok))
+      return res.success(node)
     elif self.expect(TT.LPAREN):
       self.consume(res)
       expr = res.register(self.expr())
@@ -113,6 +207,56 @@ class Parser:
         InvalidSyntaxError(tok.pos_start, tok.pos_end,
                           "Expected int, float or identifier"))
 
+  # NOTE: `buf[i]`, the current token is the `[` after the name
+  def index_access(self, var_name: Token) -> ParseResult:
+    res: ParseResult = ParseResult()
+    self.consume(res)
+    index = res.register(self.expr())
+    if res.error:
+      return res
+    if not self.expect(TT.RBRACKET):
+      return res.failure(self.syntax_error("Expected `]` after the index"))
+    pos_end: Pos = self.current_token.pos_end
+    self.consume(res)
+    return res.success(IndexAccess(var_name, index, pos_end))
+
+  # NOTE: `sum(1...n step 1)`, the current token is the `(` after the name
+  def range_builtin(self, name: Token) -> ParseResult:
+    res: ParseResult = ParseResult()
+    self.consume(res)
+    range_node = res.register(self.range_expr())
+    if res.error:
+      return res
+    if not isinstance(range_node, RangeNode):
+      return res.failure(InvalidSyntaxError(
+          range_node.pos_start, range_node.pos_end,
+          f"`{name.value}` takes a range, like `{name.value}(1...10 step 1)`"))
+    if self.current_token.matches(TT.KEYWORD, "step"):
+      self.consume(res)
+      range_node.step = res.register(self.arith_expr())
+      if res.error:
+        return res
+    if not self.expect(TT.RPAREN):
+      return res.failure(self.syntax_error("Expected `)` after the range"))
+    pos_end: Pos = self.current_token.pos_end
+    self.consume(res)
+    return res.success(RangeBuiltin(name, range_node, pos_end))
+
+  # NOTE: `len(buf)`, the current token is the `(` after len
+  def array_length(self, name: Token) -> ParseResult:
+    res: ParseResult = ParseResult()
+    pos_start: Pos = name.pos_start
+    self.consume(res)
+    if not self.expect(TT.IDENT):
+      return res.failure(self.syntax_error("Expected the name of an array"))
+    var_name: Token = self.current_token
+    self.consume(res)
+    if not self.expect(TT.RPAREN):
+      return res.failure(self.syntax_error("Expected `)`"))
+    pos_end: Pos = self.current_token.pos_end
+    self.consume(res)
+    return res.success(ArrayLength(var_name, pos_start, pos_end))
+
   def parse(self):
     res = self.stmts()
     if not res.error and not self.expect(TT.EOF):
@@ -289,7 +433,70 @@ class Parser:
 
     return res.success(WhileStmt(condition=condition, block=block))
 
-  def for_expr(self):
+  # NOTE: `par for i in a...b step s reduce(total: +) { ... }`,
+  # see check_parallel_body for what the body can do
+  def par_for_expr(self) -> ParseResult:
+    res: ParseResult = ParseResult()
+    self.consume(res)  # eat par, stmt only gets here when `for` follows it
+    outer: set[str] = set(self.declared)
+    loop: ForExpr = res.register(self.for_expr(parallel=True))
+    if res.error:
+      return res
+    error: Error | None = check_parallel_body(loop, outer)
+    if error:
+      return res.failure(error)
+    return res.success(loop)
+
+  # NOTE: reduce(total: +, count: +), the variables the chunks of a par loop add to
+  def reduce_clause(self) -> ParseResult:
+    res: ParseResult = ParseResult()
+    if not self.current_token.matches(TT.IDENT, "reduce"):
+      return res.failure(InvalidSyntaxError(
+        details="Expected `reduce(<variable>: +)` after the range of a par loop",
+        pos_start=self.current_token.pos_start, pos_end=self.current_token.pos_end
+      ))
+    self.consume(res)
+    if not self.expect(TT.LPAREN):
+      return res.failure(InvalidSyntaxError(
+        details="Expected `(` after `reduce`",
+        pos_start=self.current_token.pos_start, pos_end=self.current_token.pos_end
+      ))
+    self.consume(res)
+    names: list[str] = []
+    while True:
+      if not self.expect(TT.IDENT) or self.current_token.value in names:
+        return res.failure(InvalidSyntaxError(
+          details=f"Expected a new reduction variable not {self.current_token}",
+          pos_start=self.current_token.pos_start, pos_end=self.current_token.pos_end
+        ))
+      names.append(self.current_token.value)
+      self.consume(res)
+      if not self.expect(TT.COLON):
+        return res.failure(InvalidSyntaxError(
+          details="Expected `:` after the reduction variable",
+          pos_start=self.current_token.pos_start, pos_end=self.current_token.pos_end
+        ))
+      self.consume(res)
+      # NOTE: Sums are the only reduction the body can make,
+      # there is no statement that multiplies a variable
+      if not self.expect(TT.PLUS):
+        return res.failure(InvalidSyntaxError(
+          details="Only `+` reductions are supported",
+          pos_start=self.current_token.pos_start, pos_end=self.current_token.pos_end
+        ))
+      self.consume(res)
+      if not self.expect(TT.COMMA):
+        break
+      self.consume(res)
+    if not self.expect(TT.RPAREN):
+      return res.failure(InvalidSyntaxError(
+        details="Expected `)` after the reduction variables",
+        pos_start=self.current_token.pos_start, pos_end=self.current_token.pos_end
+      ))
+    self.consume(res)
+    return res.success(names)
+
+  def for_expr(self, parallel: bool = False):
     res: ParseResult = ParseResult()
     pos_start = self.current_token.pos_start.copy()
     self.advance()
@@ -325,6 +532,11 @@ class Parser:
         range_node.step = res.register(self.arith_expr())
         if res.error:
           return res
+    reductions: list[str] = []
+    if parallel:
+      reductions = res.register(self.reduce_clause())
+      if res.error:
+        return res
     if not self.expect(TT.LBRACE):
       return res.failure(
         InvalidSyntaxError(pos_start=self.current_token.pos_start, pos_end=self.current_token.pos_end, details="Expected `{`")
@@ -343,7 +555,10 @@ class Parser:
         ))
     res.register_advancement()
     self.advance()
-    return res.success(ForExpr(var_name, range_node, block=block))
+    self.declared.add(var_name.value)
+    loop: ForExpr = ForExpr(var_name, range_node, block=block)
+    loop.parallel, loop.reductions = parallel, reductions
+    return res.success(loop)
 
   def range_expr(self):
     res = ParseResult()
@@ -404,8 +619,124 @@ class Parser:
     if res.error:
       return res
 
+    self.declared.add(var_name.value)
     return res.success(VarAssign(var_name, value, type_, is_value_const=is_const))
 
+  # NOTE: A literal value gets the declared type, like make_var does it
+  def type_literal(self, value, type_) -> None:
+    if type_ is None:
+      return
+    if isinstance(value, UnaryOp) and isinstance(value.node, Number):
+      value.node.type_ = type_
+    elif isinstance(value, Number):
+      value.type_ = type_
+
+  # NOTE: `u8[1000] buf = 0;` fills the array, `u8[] buf = [1, 2];` gets a length of 2
+  # `[] buf = [1, 2, 300];` has no type, the values pick it when the declaration runs
+  # `i32[1000] data = mmap(`dump.bin`, 16);` maps 1000 elements from byte 16 of the file
+  # and the rest of it without a length
+  def make_array(self) -> ParseResult:
+    res: ParseResult = ParseResult()
+    type_: Any = None
+    if self.expect(TT.KEYWORD):
+      type_ = inverse_type_map.get(self.current_token.value)
+      self.consume(res)  # eat 'u8, i64 etc.'
+    self.consume(res)  # eat [
+    length = None
+    if not self.expect(TT.RBRACKET):
+      if type_ is None:
+        return res.failure(self.syntax_error(
+            "An array without a type takes its length from its values, "
+            "use `[] name = [...]`"))
+      length = res.register(self.arith_expr())
+      if res.error:
+        return res
+    if not self.expect(TT.RBRACKET):
+      return res.failure(self.syntax_error("Expected `]` after the length"))
+    self.consume(res)
+
+    is_const: bool = False
+    if self.expect(type_=TT.KEYWORD, value="const"):
+      is_const = True
+      self.consume(res)
+    if not self.expect(TT.IDENT):
+      return res.failure(self.syntax_error("Expected identifier"))
+    var_name: Token = self.current_token
+    self.consume(res)
+    if not self.expect(TT.EQ):
+      return res.failure(
+          self.syntax_error("Expected '=' not " + str(self.current_token.value)))
+    self.consume(res)
+
+    if self.expect(TT.LBRACKET):
+      value: Any = res.register(self.array_literal(type_))
+      if res.error:
+        return res
+    elif self.current_token.matches(TT.IDENT, "mmap") and self.peek().type == TT.LPAREN:
+      if type_ is None:
+        return res.failure(self.syntax_error(
+            "A mapped array needs the type of its elements, "
+            "like `f32[] data = mmap(`data.bin`);`"))
+      value = res.register(self.mapped_file())
+      if res.error:
+        return res
+    else:
+      if length is None:
+        return res.failure(InvalidSyntaxError(
+            self.current_token.pos_start, self.current_token.pos_end,
+            "An array filled with one value needs a length, like `u8[10] buf = 0;`"))
+      value = res.register(self.expr())
+      if res.error:
+        return res
+      self.type_literal(value, type_)
+    self.declared.add(var_name.value)
+    return res.success(
+        ArrayAssign(var_name, type_, length, value, is_value_const=is_const))
+
+  # NOTE: `mmap(`dump.bin`)` or `mmap(`dump.bin`, offset)`
+  def mapped_file(self) -> ParseResult:
+    res: ParseResult = ParseResult()
+    pos_start: Pos = self.current_token.pos_start
+    self.consume(res)  # eat mmap
+    self.consume(res)  # eat (, make_array only gets here when it follows mmap
+    if not self.expect(TT.STRING):
+      return res.failure(self.syntax_error(
+          "Expected the path of the file, like `data.bin`"))
+    path: Token = self.current_token
+    self.consume(res)
+    offset = None
+    if self.expect(TT.COMMA):
+      self.consume(res)
+      offset = res.register(self.expr())
+      if res.error:
+        return res
+    if not self.expect(TT.RPAREN):
+      return res.failure(self.syntax_error("Expected `)`"))
+    pos_end: Pos = self.current_token.pos_end
+    self.consume(res)
+    return res.success(MappedFile(path, offset, pos_start, pos_end))
+
+  # NOTE: `[1, 2, 3]`, only parsed as the value of an array declaration
+  def array_literal(self, type_) -> ParseResult:
+    res: ParseResult = ParseResult()
+    pos_start: Pos = self.current_token.pos_start
+    self.consume(res)  # eat [
+    elements: list = []
+    while not self.expect(TT.RBRACKET):
+      element = res.register(self.expr())
+      if res.error:
+        return res
+      self.type_literal(element, type_)
+      elements.append(element)
+      if not self.expect(TT.COMMA):
+        break
+      self.consume(res)
+    if not self.expect(TT.RBRACKET):
+      return res.failure(self.syntax_error("Expected `,` or `]`"))
+    pos_end: Pos = self.current_token.pos_end
+    self.consume(res)
+    return res.success(ArrayLiteral(elements, pos_start, pos_end))
+
   def stmt(self) -> ParseResult:
     res: ParseResult = ParseResult()
     if self.current_token.matches(TT.KEYWORD,
@@ -421,6 +752,14 @@ class Parser:
       if res.error:
         return res
       return res.success(for_expr)
+    # NOTE: par, reduce, len and mmap are names,
+    # they only mean something before the token that follows them here
+    elif (self.current_token.matches(TT.IDENT, "par") and self.peek().type == TT.KEYWORD
+          and self.peek().value in ("for", "loopsy")):
+      par_for = res.register(self.par_for_expr())
+      if res.error:
+        return res
+      return res.success(par_for)
     elif self.current_token.matches(TT.KEYWORD, "incr"):
           incr_stmt = res.register(self.incr_by())
           if res.error:
@@ -437,15 +776,28 @@ class Parser:
         return res
       return res.success(while_stmt)
 
-    if self.current_token.type == TT.KEYWORD and self.current_token.value in (
-        "i64", "i32", "i16","i8",
-        "u64", "u32", "u16","u8",
-        "f32", "f64",
-    ):
+    is_type: bool = (self.current_token.type == TT.KEYWORD
+                     and self.current_token.value in NAME_CODES)
+    if self.expect(TT.LBRACKET) or is_type and self.peek().type == TT.LBRACKET:
+      array = res.register(self.make_array())
+      if res.error:
+        return res
+      return res.success(array)
+    if is_type:
       node = res.register(
           self.make_var(res=res, type_=self.current_token.value))
       return res.success(node)
-    return self.expr()
+    node = res.register(self.expr())
+    if res.error:
+      return res
+    # NOTE: `buf[i] = value;`, an element is the only thing assigned without a type
+    if isinstance(node, IndexAccess) and self.expect(TT.EQ):
+      self.consume(res)
+      value = res.register(self.expr())
+      if res.error:
+        return res
+      return res.success(IndexAssign(node, value))
+    return res.success(node)
 
   # Expression
   def expr(self) -> ParseResult:
@@ -7,6 +7,7 @@ class TT(Enum):
   # Types
   INT = "INT"
   FLOAT = "FLOAT"
+  STRING = "STRING"  # `text`
 
   # Operators
   MINUS = "MINUS"
@@ -25,6 +26,10 @@ class TT(Enum):
   RPAREN = "RPAREN"
   LBRACE = "LBRACE"  # {
   RBRACE = "RBRACE"  # }
+  LBRACKET = "LBRACKET"  # [
+  RBRACKET = "RBRACKET"  # ]
+  COLON = "COLON"  # :
+  COMMA = "COMMA"  # ,
 
   # Special
   IDENT = "IDENT"
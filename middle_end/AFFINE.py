@@ -0,0 +1,68 @@
+from typing import Any
+
+from frontend.TOKENS import TT
+from middle_end.AST import (
+  Decrement, DecrementBy,
+  ForExpr, Increment,
+  IncrementBy, Number,
+  VarAccess,
+)
+from middle_end.TRANSFORMER import NodeTransformer, OptReport, PassResult, count_nodes
+
+
+# NOTE: How much a statement moves its variable every iteration,
+# None if it is not a constant step
+def affine_step(stmt) -> tuple[str, int] | None:
+  if not isinstance(stmt, (Increment, Decrement, IncrementBy, DecrementBy)):
+    return None
+  if not isinstance(stmt.value, VarAccess):
+    return None
+  if isinstance(stmt, (Increment, Decrement)):
+    amount: int = 1
+  elif isinstance(stmt.amount, Number) and stmt.amount.token.type == TT.INT:
+    amount = stmt.amount.token.value
+  else:
+    return None
+  sign: int = 1 if isinstance(stmt, (Increment, IncrementBy)) else -1
+  return stmt.value.var_name_token.value, sign * amount
+
+
+def affine_updates(node: ForExpr) -> list[tuple[str, int]] | None:
+  # NOTE: The chunks of a par loop add to their own copies,
+  # that is left to the interpreter
+  if node.parallel:
+    return None
+  updates: list[tuple[str, int]] = []
+  for stmt in node.block:
+    step: tuple[str, int] | None = affine_step(stmt)
+    if step is None or step[0] == node.var_name.value:
+      return None
+    updates.append(step)
+  return updates or None
+
+
+"""
+Finds for loops like `for i in 0...n step 1 { incr x by 3; decr y by 1; };`
+where the block only moves variables declared outside the loop by whole number
+amounts. The interpreter computes the final values of these loops from the trip
+count instead of running every iteration.
+"""
+class AffineLoopAnalyzer(NodeTransformer):
+  def __init__(self) -> None:
+    super().__init__()
+    self.affine_loops: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      report.add("affine", nodes_before, count_nodes(res.node),
+                 closed_form_loops=self.affine_loops)
+    return res
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node = self.generic_visit(node)
+    node.affine_updates = affine_updates(node)
+    if node.affine_updates is not None:
+      self.affine_loops += 1
+    return node
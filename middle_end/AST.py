@@ -44,7 +44,9 @@ class Number(Node, Expr):
     self.casted: bool = False
     self.is_typed: bool = False # used for when number is assigned to a variable
     if not type_:
-      self.type_ = ctypes.c_int64
+      # NOTE: A literal without a declared type is i64, or f64 if it has a decimal point
+      is_float: bool = isinstance(self.token.value, float)
+      self.type_ = ctypes.c_double if is_float else ctypes.c_int64
   def __eq__(self, other) -> bool:
     return isinstance(other, Number) and self.token == other.token and self.type_ == other.type_
 
@@ -62,6 +64,12 @@ class VarAccess(Node, Expr):
     )
     self.type_ = None
     self.is_const: bool = False
+    # NOTE: Set by type inference, None when it is only known at runtime
+    self.result_type: Any = None
+    # NOTE: Set by the resolver,
+    # the variable is in slot of the symbol table depth parents up
+    self.depth: int = 0
+    self.slot: int | None = None
 
 # Keyword for assigning is make but the name should still be var assign
 class VarAssign(Node, Stmt):
@@ -76,6 +84,8 @@ class VarAssign(Node, Stmt):
         self.var_name_token.pos_end,
     )
     self.is_value_const: bool = is_value_const
+    # NOTE: Set by the resolver, always in the innermost symbol table
+    self.slot: int | None = None
 
 class UnaryOp(Node, Expr):
   def __init__(self, op_tok: Token, node) -> None:
@@ -83,6 +93,9 @@ class UnaryOp(Node, Expr):
     self.node = node
     self.pos_start = self.op_tok.pos_start
     self.pos_end = self.node.pos_end
+    self.result_type: Any = None
+    # NOTE: False when interval analysis proved the result always fits its type
+    self.checked: bool = True
     
 class BinOp(Node, Expr):
   def __init__(self, left_node, op_token: Token,
@@ -92,6 +105,8 @@ class BinOp(Node, Expr):
     self.op_token: Token = op_token
     self.pos_start: Pos = self.left_node.pos_start
     self.pos_end: Pos = self.right_node.pos_end
+    self.result_type: Any = None
+    self.checked: bool = True
     
     
 class Increment(Node, Expr):
@@ -100,6 +115,7 @@ class Increment(Node, Expr):
     self.postfix = postfix
     self.pos_start = self.value.pos_start
     self.pos_end = self.value.pos_end
+    self.result_type: Any = None
 
 class IncrementBy(Node, Expr):
   def __init__(self, value: VarAccess, amount: Number) -> None:
@@ -115,6 +131,7 @@ class Decrement(Node, Expr):
     self.postfix = postfix
     self.pos_start: Pos = self.value.pos_start
     self.pos_end: Pos = self.value.pos_end
+    self.result_type: Any = None
 
 
 class DecrementBy(Node, Expr):
@@ -143,6 +160,10 @@ class IfExpr(Node, Expr):
   def __init__(self, cases: list, else_case) -> None:
     self.cases: list = cases
     self.else_case = else_case
+    # NOTE: Set when every case is `VAR == literal`,
+    # literal -> index of the first case it matches
+    self.dispatch: dict[int, int] | None = None
+    self.dispatch_var: VarAccess | None = None
     self.pos_start = self.cases[0][0].pos_start
     self.pos_end = (self.cases[len(self.cases) - 1][0]).pos_end
 
@@ -150,6 +171,8 @@ class WhileStmt(Node, Stmt):
   def __init__(self, condition, block: list):
     self.condition = condition
     self.block = block
+    # NOTE: Loop invariant expressions, reset every time the loop starts
+    self.hoisted: list[Hoisted] = []
     self.pos_start: Pos = self.condition.pos_start
     if not block:
       self.pos_end: Pos = self.condition.pos_end
@@ -167,6 +190,119 @@ class ForExpr(Node, Expr):
     self.var_name = var_name
     self.range = range
     self.block = block
+    self.hoisted: list[Hoisted] = []
+    # NOTE: Set when the loop can be computed in closed form
+    self.affine_updates: list[tuple[str, int]] | None = None
+    # NOTE: Set when the loop can run in batches, see REDUCTION.py
+    self.reduction: list[tuple[str, str, tuple]] | None = None
+    # NOTE: A `par for` loop, its chunks run in forks of the symbol table
+    self.parallel: bool = False
+    # NOTE: Variables a par loop adds to, from its reduce(...) clause
+    self.reductions: list[str] = []
+    # NOTE: Set by the resolver,
+    # slot of the loop variable in the innermost symbol table
+    self.var_slot: int | None = None
     self.pos_start = self.var_name.pos_start
-    self.pos_end = self.block[-1].pos_end
-    
\ No newline at end of file
+    if not block:
+      self.pos_end: Pos = (self.range.step or self.range.end).pos_end
+    else:
+      self.pos_end: Pos = self.block[-1].pos_end
+
+# NOTE: Made by the optimizer, an expression that does not change while its loop runs
+# The value is computed the first time it is needed
+# and reused until the loop starts again
+class Hoisted(Node, Expr):
+  def __init__(self, node) -> None:
+    self.node = node
+    self.value = None
+    self.pos_start: Pos = self.node.pos_start
+    self.pos_end: Pos = self.node.pos_end
+
+# NOTE: Made by the optimizer,
+# the first time a repeated expression is computed its value is kept here
+class TempStore(Node, Expr):
+  def __init__(self, node) -> None:
+    self.node = node
+    self.value = None
+    self.pos_start: Pos = self.node.pos_start
+    self.pos_end: Pos = self.node.pos_end
+
+# NOTE: A repeated expression that reuses the value of a TempStore,
+# positions are the ones of the expression it replaced
+class TempLoad(Node, Expr):
+  def __init__(self, store: TempStore, pos_start: Pos, pos_end: Pos) -> None:
+    self.store = store
+    self.pos_start = pos_start
+    self.pos_end = pos_end
+
+# NOTE: `u8[1000] buf = 0;` fills the array with the value,
+# `u8[] buf = [1, 2, 3];` takes the length from the literal
+# type_ is None for `[] buf = [1, 2, 3];`,
+# the literal then gets the smallest type that holds its values
+class ArrayAssign(Node, Stmt):
+  def __init__(self, var_name_tok: Token, type_: Any, length, value_node,
+               is_value_const: bool = False) -> None:
+    self.var_name_token = var_name_tok
+    self.type_ = type_
+    self.length = length  # NOTE: None when the length comes from the literal
+    self.value_node = value_node
+    self.is_value_const: bool = is_value_const
+    self.pos_start: Pos = self.var_name_token.pos_start
+    self.pos_end: Pos = self.var_name_token.pos_end
+    self.slot: int | None = None
+
+# NOTE: `[1, 2, 300]`, only the value of an array declaration
+class ArrayLiteral(Node, Expr):
+  def __init__(self, elements: list, pos_start: Pos, pos_end: Pos) -> None:
+    self.elements = elements
+    self.pos_start = pos_start
+    self.pos_end = pos_end
+
+# NOTE: `buf[i]`, the array is named by its token like a VarAccess,
+# so passes never treat it as a number
+class IndexAccess(Node, Expr):
+  def __init__(self, var_name_token: Token, index, pos_end: Pos) -> None:
+    self.var_name_token = var_name_token
+    self.index = index
+    self.pos_start: Pos = self.var_name_token.pos_start
+    self.pos_end = pos_end
+    self.result_type: Any = None  # NOTE: The element type, set by type inference
+    self.depth: int = 0
+    self.slot: int | None = None
+
+# NOTE: `buf[i] = value;`
+class IndexAssign(Node, Stmt):
+  def __init__(self, target: IndexAccess, value_node) -> None:
+    self.target = target
+    self.value_node = value_node
+    self.pos_start: Pos = self.target.pos_start
+    self.pos_end: Pos = self.value_node.pos_end
+
+# NOTE: `len(buf)`, an i64
+class ArrayLength(Node, Expr):
+  def __init__(self, var_name_token: Token, pos_start: Pos, pos_end: Pos) -> None:
+    self.var_name_token = var_name_token
+    self.pos_start = pos_start
+    self.pos_end = pos_end
+    self.result_type: Any = None
+    self.depth: int = 0
+    self.slot: int | None = None
+
+# NOTE: `mmap(`dump.bin`, 16)`, only the value of an array declaration,
+# offset is in bytes and None maps from the start
+class MappedFile(Node, Expr):
+  def __init__(self, path_token: Token, offset, pos_start: Pos, pos_end: Pos) -> None:
+    self.path_token = path_token
+    self.offset = offset
+    self.pos_start = pos_start
+    self.pos_end = pos_end
+
+# NOTE: `sum(1...n step 1)` and the other builtins of runtime/ranges.py,
+# an i64 like the counter of a loop over the range
+class RangeBuiltin(Node, Expr):
+  def __init__(self, name_token: Token, range: RangeNode, pos_end: Pos) -> None:
+    self.name_token = name_token
+    self.range = range
+    self.pos_start: Pos = self.name_token.pos_start
+    self.pos_end = pos_end
+    self.result_type: Any = None
@@ -0,0 +1,279 @@
+import ctypes
+from typing import Any
+
+from frontend.TOKENS import TT, Token
+from middle_end.AST import (
+  BinOp, ForExpr,
+  IfExpr, IndexAccess,
+  Number, RangeBuiltin,
+  UnaryOp, VarAccess,
+  VarAssign, WhileStmt,
+)
+from middle_end.ERRORS import Error
+from middle_end.TRANSFORMER import (
+  NodeTransformer, OptReport,
+  PassResult, collect_writes,
+  count_nodes,
+)
+from runtime.kernels import to_type
+from runtime.number import BINARY_OPS, UNARY_OPS, RuntimeNumber
+from runtime.ranges import reduce_range, trip_count
+from typechecking.TYPECHECKER import TypeChecker
+
+tpchecker: TypeChecker = TypeChecker()
+
+
+# NOTE: Makes a literal node for a value,
+# the position is the one of the node it replaces
+def make_number(value: int | float, type_: Any, node) -> Number:
+  token: Token = Token(
+      type_=TT.FLOAT if isinstance(value, float) else TT.INT,
+      value=value,
+      pos_start=node.pos_start,
+      pos_end=node.pos_end,
+  )
+  number: Number = Number(token, type_=type_)
+  number.checked_size = True
+  return number
+
+
+# NOTE: Literals that fit their type and the operators between them,
+# folding it gives its value or the error it raises
+def is_literal_expr(node) -> bool:
+  if isinstance(node, Number):
+    return tpchecker.is_value_in_range(node.type_, node.token.value)
+  if isinstance(node, BinOp):
+    return is_literal_expr(node.left_node) and is_literal_expr(node.right_node)
+  if isinstance(node, UnaryOp):
+    return is_literal_expr(node.node)
+  return False
+
+
+# NOTE: How many statements at the start of the program always run,
+# the ones after a statement that can fail only run if it didn't
+# A declaration of a literal expression can only fail with the error folding it gives,
+# unless its variable is const
+def always_run_count(program: list, consts: set[str]) -> int:
+  declared: set[str] = set(consts)
+  for index, stmt in enumerate(program):
+    if not (isinstance(stmt, VarAssign) and stmt.var_name_token.value not in declared
+            and is_literal_expr(stmt.value_node)):
+      return index + 1
+    if stmt.is_value_const:
+      declared.add(stmt.var_name_token.value)
+  return len(program)
+
+
+"""
+Constant folding and propagation:
+  - BinOp and UnaryOp trees of literals are evaluated once,
+    with the same code the interpreter uses
+  - Range builtins over a whole number range of literals are computed once,
+    they have a closed form
+  - Reads of const variables are replaced with the literal they were declared with
+  - Reads of builtins the program never writes to are replaced with their value
+  - Overflow and division by zero in code that always runs are reported before running,
+    like the interpreter would report them
+    Code that may not run is left for the interpreter:
+    statements after one that can fail, if and loop bodies,
+    elif conditions and the right side of `&&` and `||`
+"""
+class ConstantFolder(NodeTransformer):
+  # NOTE: builtins are predefined variables like `true`,
+  # they count as const if the program never writes them
+  # consts are the variables that are already const when the program starts,
+  # like the ones of earlier REPL lines
+  def __init__(self, builtins: dict[str, tuple[int | float, Any]] | None = None,
+               consts: set[str] | None = None) -> None:
+    super().__init__()
+    self.builtins: dict[str, tuple[int | float, Any]] = builtins or {}
+    self.defined_consts: set[str] = consts or set()
+    self.consts: dict[str, tuple[int | float, Any]] = {}
+    self.folded: int = 0
+    self.propagated: int = 0
+    # NOTE: How many blocks and conditions that may not run the visit is inside
+    self.may_not_run: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    writes: set[str] = collect_writes(ast)
+    self.consts = {name: const for name, const in self.builtins.items()
+                   if name not in writes}
+    always: int = always_run_count(ast, self.defined_consts)
+    res = self.run(ast[:always])
+    if not res.error:
+      self.may_not_run += 1
+      rest: PassResult = self.run(ast[always:])
+      self.may_not_run -= 1
+      res = rest if rest.error else res.success(res.node + rest.node)
+    if report is not None and not res.error:
+      report.add("constfold", nodes_before, count_nodes(res.node),
+                 folded=self.folded, propagated=self.propagated)
+    return res
+
+  # NOTE: Turns a literal into the value the interpreter would make for it
+  # A literal that doesn't fit its type is left for the interpreter,
+  # which raises only if the code runs
+  def to_runtime(self, node: Number) -> RuntimeNumber | None:
+    if not tpchecker.is_value_in_range(node.type_, node.token.value):
+      return None
+    return RuntimeNumber.of(to_type(node.type_, node.token.value), node.type_)
+
+  def to_number(self, result: RuntimeNumber, node) -> Number:
+    self.folded += 1
+    return make_number(result.value, result.type_, node)
+
+  # NOTE: Declarations inside a block only exist if the block runs,
+  # so they are forgotten after it
+  def visit_scoped_block(self, block: list) -> list:
+    consts: dict[str, tuple[int | float, Any]] = dict(self.consts)
+    self.may_not_run += 1
+    block = self.visit_block(block)
+    self.may_not_run -= 1
+    self.consts = consts
+    return block
+
+  def visit_maybe_run(self, node) -> Any:
+    self.may_not_run += 1
+    node = self.visit(node)
+    self.may_not_run -= 1
+    return node
+
+  # NOTE: An error of code that always runs is the error of the program,
+  # the rest is raised only if the code runs
+  def fold_error(self, error: Error, node) -> Any:
+    if self.may_not_run:
+      return node
+    return self.fail(error, node)
+
+  def visit_VarAccess(self, node: VarAccess) -> Any:
+    const: tuple[int | float, Any] | None = self.consts.get(node.var_name_token.value)
+    if const is None:
+      return node
+    self.propagated += 1
+    return make_number(const[0], const[1], node)
+
+  def visit_VarAssign(self, node: VarAssign) -> Any:
+    node.value_node = self.visit(node.value_node)
+    if node.is_value_const and isinstance(node.value_node, Number):
+      self.consts[node.var_name_token.value] = (
+          node.value_node.token.value, node.value_node.type_)
+    return node
+
+  def visit_BinOp(self, node: BinOp) -> Any:
+    node.left_node = self.visit(node.left_node)
+    if node.op_token.type in (TT.AND, TT.OR):
+      node.right_node = self.visit_maybe_run(node.right_node)
+    else:
+      node.right_node = self.visit(node.right_node)
+    if node.op_token.type in (TT.AND, TT.OR) and isinstance(node.left_node, Number):
+      folded: Number | None = self.fold_short_circuit(node)
+      if folded is not None:
+        return folded
+    literals: bool = (isinstance(node.left_node, Number)
+                      and isinstance(node.right_node, Number))
+    if self.error or not literals:
+      return node
+    left: RuntimeNumber | None = self.to_runtime(node.left_node)
+    right: RuntimeNumber | None = self.to_runtime(node.right_node)
+    if left is None or right is None:
+      return node
+    result, error = BINARY_OPS[node.op_token.type](left, right, None, True, node)
+    if error:
+      return self.fold_error(error, node)
+    return self.to_number(result, node)
+
+  # NOTE: A literal left side that decides `&&` or `||` makes the right side dead,
+  # it's folded like the interpreter does it
+  def fold_short_circuit(self, node: BinOp) -> Number | None:
+    left: RuntimeNumber | None = self.to_runtime(node.left_node)
+    if left is None or node.result_type is None:
+      return None
+    if left.is_true() != (node.op_token.type == TT.OR):
+      return None
+    result, error = BINARY_OPS[node.op_token.type](left, left, node.result_type)
+    if error:
+      return None
+    return self.to_number(result, node)
+
+  def visit_UnaryOp(self, node: UnaryOp) -> Any:
+    node.node = self.visit(node.node)
+    if self.error or not isinstance(node.node, Number):
+      return node
+    number: RuntimeNumber | None = self.to_runtime(node.node)
+    if number is None:
+      return node
+    result, error = UNARY_OPS[node.op_tok.type](number, None, True, node)
+    if error:
+      return self.fold_error(error, node)
+    return self.to_number(result, node)
+
+  # NOTE: A range with decimals runs its counter to be reduced,
+  # so only whole number ranges are folded
+  # A range that never ends, an empty min or max and an overflow
+  # are left for the interpreter to raise
+  def visit_RangeBuiltin(self, node: RangeBuiltin) -> Any:
+    node = self.generic_visit(node)
+    parts: list = [node.range.start, node.range.end]
+    if node.range.step is not None:
+      parts.append(node.range.step)
+    whole: bool = all(isinstance(part, Number) and isinstance(part.token.value, int)
+                      for part in parts)
+    if self.error or not whole:
+      return node
+    numbers: list[RuntimeNumber | None] = [self.to_runtime(part) for part in parts]
+    if any(number is None for number in numbers):
+      return node
+    start, end = numbers[0].value, numbers[1].value
+    step: int = numbers[2].value if len(numbers) == 3 else 1
+    name: str = node.name_token.value
+    trips: int | None = trip_count(start, end, step)
+    if trips is None or (trips == 0 and name in ("min", "max")):
+      return node
+    value: int | None = reduce_range(name, start, end, step, trips)
+    if value is None:
+      return node
+    return self.to_number(RuntimeNumber.of(value, ctypes.c_longlong), node)
+
+  # NOTE: Update statements write to their variable,
+  # only the amount and the index of an element can be folded
+  def visit_update(self, node) -> Any:
+    if isinstance(node.value, IndexAccess):
+      node.value = self.visit(node.value)
+    if hasattr(node, "amount"):
+      node.amount = self.visit(node.amount)
+    return node
+
+  visit_Increment = visit_update
+  visit_Decrement = visit_update
+  visit_IncrementBy = visit_update
+  visit_DecrementBy = visit_update
+  visit_MultiplyBy = visit_update
+  visit_DivideBy = visit_update
+
+  def visit_IfExpr(self, node: IfExpr) -> Any:
+    cases: list = []
+    for index, (condition, body) in enumerate(node.cases):
+      # NOTE: Only the first condition always runs
+      if index == 0:
+        condition = self.visit(condition)
+      else:
+        condition = self.visit_maybe_run(condition)
+      cases.append((condition, self.visit_scoped_block(body)))
+    node.cases = cases
+    if node.else_case is not None:
+      node.else_case = self.visit_scoped_block(node.else_case)
+    return node
+
+  def visit_WhileStmt(self, node: WhileStmt) -> Any:
+    node.condition = self.visit(node.condition)
+    node.block = self.visit_scoped_block(node.block)
+    return node
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node.range = self.visit(node.range)
+    # NOTE: The loop overwrites its variable without checking if it is const
+    self.consts.pop(node.var_name.value, None)
+    node.block = self.visit_scoped_block(node.block)
+    self.consts.pop(node.var_name.value, None)
+    return node
@@ -0,0 +1,209 @@
+from typing import Any
+
+from frontend.TOKENS import TT
+from middle_end.AST import (
+  BinOp, ForExpr,
+  Hoisted, IfExpr,
+  Number, TempLoad,
+  TempStore, UnaryOp,
+  VarAccess, VarAssign,
+  WhileStmt,
+)
+from middle_end.TRANSFORMER import (
+  UPDATE_NODES,
+  NodeTransformer, OptReport,
+  PassResult, collect_writes,
+  count_nodes, iter_children,
+)
+
+# NOTE: A key is the same for two expressions
+# that always compute the same value from the same variables
+Key = tuple
+
+
+def expr_key(node) -> Key | None:
+  if isinstance(node, Number):
+    return ("num", node.type_, node.token.value)
+  if isinstance(node, VarAccess):
+    return ("var", node.var_name_token.value)
+  if isinstance(node, Hoisted):
+    return ("hoisted", id(node))
+  if isinstance(node, UnaryOp):
+    operand: Key | None = expr_key(node.node)
+    return None if operand is None else ("unary", node.op_tok.type, operand)
+  if isinstance(node, BinOp):
+    left: Key | None = expr_key(node.left_node)
+    right: Key | None = expr_key(node.right_node)
+    if left is None or right is None:
+      return None
+    return ("binary", node.op_token.type, left, right)
+  return None
+
+
+def key_inputs(key: Key, inputs: set[str] | None = None) -> set[str]:
+  if inputs is None:
+    inputs = set()
+  if key[0] == "var":
+    inputs.add(key[1])
+  elif key[0] in ("unary", "binary"):
+    for operand in key[2:]:
+      key_inputs(operand, inputs)
+  return inputs
+
+
+def is_candidate(node) -> bool:
+  return isinstance(node, (BinOp, UnaryOp))
+
+
+# NOTE: The parts of a statement that run every time it runs,
+# before anything in the statement writes a variable
+def definite_parts(stmt) -> list:
+  if isinstance(stmt, VarAssign):
+    return [stmt.value_node]
+  if isinstance(stmt, UPDATE_NODES):
+    return [stmt.amount] if hasattr(stmt, "amount") else []
+  if isinstance(stmt, IfExpr):
+    # NOTE: A jump table reads the variable instead of running the first condition
+    return [stmt.cases[0][0]] if stmt.dispatch is None else []
+  if isinstance(stmt, ForExpr):
+    parts: tuple = (stmt.range.start, stmt.range.end, stmt.range.step)
+    return [part for part in parts if part is not None]
+  if isinstance(stmt, WhileStmt):
+    return []
+  return [stmt]
+
+
+# NOTE: Everything else in the statement,
+# only reached after the definite parts or not at all
+def nested_parts(stmt) -> list:
+  if isinstance(stmt, IfExpr):
+    parts: list = [stmt.cases[0][1]] if stmt.dispatch is None else list(stmt.cases[0])
+    for condition, body in stmt.cases[1:]:
+      parts.append(condition)
+      parts.append(body)
+    if stmt.else_case is not None:
+      parts.append(stmt.else_case)
+    return parts
+  if isinstance(stmt, ForExpr):
+    return [stmt.block]
+  if isinstance(stmt, WhileStmt):
+    return [stmt.condition, stmt.block]
+  return []
+
+
+def has_update(node) -> bool:
+  if isinstance(node, UPDATE_NODES):
+    return True
+  return any(has_update(child) for child in iter_children(node))
+
+
+"""
+Common subexpression elimination over the statements of a block:
+  - The first time an expression runs in a statement that always runs,
+    its value is kept in a TempStore
+  - Later copies of it in the block become a TempLoad,
+    until something writes to one of its variables
+  - Every block (if bodies, loop bodies) is also handled on its own
+"""
+class CommonSubexprEliminator(NodeTransformer):
+  def __init__(self) -> None:
+    super().__init__()
+    self.reused: int = 0
+    self.nodes_saved: int = 0
+    # NOTE: id of a reused expression -> the first occurrence it reuses,
+    # and the stores made for those
+    self.uses: dict[int, Any] = {}
+    self.stores: dict[int, TempStore] = {}
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    self.analyze_block(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      report.add("cse", nodes_before, count_nodes(res.node),
+                 reused=self.reused, nodes_saved=self.nodes_saved)
+    return res
+
+  def add_use(self, node, first) -> None:
+    self.uses[id(node)] = first
+    if id(first) not in self.stores:
+      self.stores[id(first)] = TempStore(first)
+    self.reused += 1
+    self.nodes_saved += count_nodes(node) - 1
+
+  def analyze_block(self, block: list) -> None:
+    available: dict[Key, Any] = {}
+    for stmt in block:
+      writes: set[str] = collect_writes(stmt)
+      definite: list = definite_parts(stmt)
+      if any(has_update(part) for part in definite):
+        # NOTE: x++ inside an expression writes while it is evaluated,
+        # nothing in it is safe to keep
+        self.find_uses(definite, available, writes)
+      else:
+        for part in definite:
+          self.walk_definite(part, available)
+      self.find_uses(nested_parts(stmt), available, writes)
+      for key in [key for key in available if key_inputs(key) & writes]:
+        del available[key]
+    for stmt in block:
+      for child in iter_children(stmt):
+        self.analyze_nested(child)
+
+  # NOTE: Nested blocks start with nothing available of their own,
+  # what they reuse from outside was found already
+  def analyze_nested(self, node) -> None:
+    if isinstance(node, list):
+      self.analyze_block(node)
+      return
+    if id(node) in self.uses:
+      return
+    for child in iter_children(node):
+      self.analyze_nested(child)
+
+  # NOTE: Walks in evaluation order
+  # so an expression is always stored before it is loaded
+  def walk_definite(self, node, available: dict[Key, Any]) -> None:
+    if id(node) in self.uses:
+      return
+    key: Key | None = expr_key(node) if is_candidate(node) else None
+    if key is not None and key in available:
+      self.add_use(node, available[key])
+      return
+    if isinstance(node, Hoisted):
+      return
+    if isinstance(node, BinOp) and node.op_token.type in (TT.AND, TT.OR):
+      # NOTE: The right side is skipped when the left side decides the result,
+      # it can only reuse values
+      self.walk_definite(node.left_node, available)
+      self.find_uses([node.right_node], available, collect_writes(node.right_node))
+    else:
+      for child in iter_children(node):
+        self.walk_definite(child, available)
+    if key is not None:
+      available[key] = node
+
+  # NOTE: Only reuses values the whole statement can't change
+  def find_uses(self, parts: list, available: dict[Key, Any], writes: set[str]) -> None:
+    for part in parts:
+      if id(part) in self.uses:
+        continue
+      key: Key | None = expr_key(part) if is_candidate(part) else None
+      if key is not None and key in available and not key_inputs(key) & writes:
+        self.add_use(part, available[key])
+        continue
+      if isinstance(part, Hoisted):
+        continue
+      self.find_uses(iter_children(part), available, writes)
+
+  def visit(self, node) -> Any:
+    if node is None or isinstance(node, list) or self.error:
+      return super().visit(node)
+    first = self.uses.get(id(node))
+    if first is not None:
+      return TempLoad(self.stores[id(first)], node.pos_start, node.pos_end)
+    store: TempStore | None = self.stores.get(id(node))
+    if store is not None:
+      store.node = self.generic_visit(node)
+      return store
+    return self.generic_visit(node)
@@ -0,0 +1,81 @@
+import ctypes
+from typing import Any
+
+from middle_end.AST import ForExpr, IfExpr, Number, WhileStmt
+from middle_end.CONSTFOLD import make_number
+from middle_end.TRANSFORMER import NodeTransformer, OptReport, PassResult, count_nodes
+from runtime.ranges import trip_count
+
+
+# NOTE: Returns None when the truth of the node is only known at runtime
+def constant_truth(node) -> bool | None:
+  if isinstance(node, Number):
+    return node.token.value != 0
+  return None
+
+
+"""
+Dead branch and unreachable code elimination, runs after constant folding:
+  - if/elif cases with a constant false condition are removed
+  - the first constant true case becomes the else case, the cases after it can never run
+  - an if without any cases left is replaced with its else body
+    or with the value an if returns when nothing matches
+  - while and for loops that never run are removed
+"""
+class DeadCodeEliminator(NodeTransformer):
+  def __init__(self) -> None:
+    super().__init__()
+    self.pruned_cases: int = 0
+    self.removed_loops: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      report.add("deadcode", nodes_before, count_nodes(res.node),
+                 pruned_cases=self.pruned_cases, removed_loops=self.removed_loops)
+    return res
+
+  def visit_IfExpr(self, node: IfExpr) -> Any:
+    node = self.generic_visit(node)
+    cases: list = []
+    else_case: list | None = node.else_case
+    for index, (condition, body) in enumerate(node.cases):
+      truth: bool | None = constant_truth(condition)
+      if truth is None:
+        cases.append((condition, body))
+      elif truth:
+        self.pruned_cases += len(node.cases) - index - 1 + (node.else_case is not None)
+        else_case = body
+        break
+      else:
+        self.pruned_cases += 1
+
+    if cases:
+      node.cases = cases
+      node.else_case = else_case
+      return node
+    # NOTE: The body gets spliced into the block the if was in
+    if else_case is not None:
+      return else_case
+    # NOTE: Keeps what visit_IfExpr returns when no case matches
+    return make_number(0, ctypes.c_ushort, node)
+
+  def visit_WhileStmt(self, node: WhileStmt) -> Any:
+    node = self.generic_visit(node)
+    if constant_truth(node.condition) is False:
+      self.removed_loops += 1
+      return None
+    return node
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node = self.generic_visit(node)
+    start, end, step = node.range.start, node.range.end, node.range.step
+    if not (isinstance(start, Number) and isinstance(end, Number)
+            and (step is None or isinstance(step, Number))):
+      return node
+    step_value: int | float = step.token.value if step is not None else 1
+    if trip_count(start.token.value, end.token.value, step_value) == 0:
+      self.removed_loops += 1
+      return None
+    return node
@@ -61,6 +61,14 @@ class InvalidSyntaxError(Error):
         details=details,
     )
 
+# * Raised by the interpreter on a runtime error,
+# it carries the error so Interpreter.run can give it back in an RTResult
+class RTException(Exception):
+  def __init__(self, error: Error) -> None:
+    super().__init__(error.details)
+    self.error = error
+
+
 class RTResult:
   def __init__(self) -> None:
     self.value = None
@@ -94,7 +102,7 @@ class RTError(Error):
     pos = self.pos_start
     ctx = self.context
     while ctx:
-      result += (
+      result = (
           f" File {pos.fn}, line {pos.line_num + 1}, in {ctx.display_name}\n"
           + result)
       pos = ctx.parent_entry_pos
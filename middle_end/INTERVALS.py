@@ -0,0 +1,290 @@
+from typing import Any
+
+from frontend.TOKENS import TT
+from middle_end.AST import (
+  ArrayAssign, ArrayLength,
+  BinOp, ForExpr,
+  IfExpr, IndexAccess,
+  Number, RangeBuiltin,
+  UnaryOp, VarAccess,
+  VarAssign, WhileStmt,
+)
+from middle_end.TRANSFORMER import (
+  NodeTransformer, OptReport,
+  PassResult, count_nodes,
+  iter_children,
+)
+from runtime.ranges import trip_count
+from runtime.typemap import TYPE_BOUNDS, TYPE_CODES, TYPE_IS_FLOAT
+
+# NOTE: Smallest and largest value an expression can have, None when nothing is known
+Interval = tuple[int, int]
+Env = dict[str, Interval | None]
+
+# NOTE: Comparisons and `!` give 0 or 1, which fits every type
+BOOLEAN_OPS: tuple[TT, ...] = (TT.DOUBLE_EQ, TT.NOT_EQ, TT.LT, TT.L_EQ, TT.GT, TT.G_EQ)
+
+
+def type_range(type_: Any) -> Interval | None:
+  code: int | None = TYPE_CODES.get(type_)
+  if code is None or TYPE_IS_FLOAT[code]:
+    return None
+  return TYPE_BOUNDS[code]
+
+
+def hull(first: Interval | None, second: Interval | None) -> Interval | None:
+  if first is None or second is None:
+    return None
+  return (min(first[0], second[0]), max(first[1], second[1]))
+
+
+def fits(interval: Interval | None, bounds: Interval | None) -> bool:
+  return (interval is not None and bounds is not None
+          and bounds[0] <= interval[0] and interval[1] <= bounds[1])
+
+
+# NOTE: A variable only one side has is declared on just one of the paths,
+# so nothing is known about it after the join
+def join_envs(first: Env, second: Env) -> Env:
+  return {name: hull(first.get(name), second.get(name))
+          for name in first.keys() | second.keys()}
+
+
+# NOTE: Integer division truncates towards zero,
+# so the result is never further from zero than the left side
+def divide_interval(left: Interval, right: Interval) -> Interval:
+  if right[0] <= 0 <= right[1]:
+    largest: int = max(abs(left[0]), abs(left[1]))
+    return (-largest, largest)
+  corners: list[int] = []
+  for a in left:
+    for b in right:
+      quotient: int = abs(a) // abs(b)
+      corners.append(quotient if (a < 0) == (b < 0) else -quotient)
+  return (min(corners), max(corners))
+
+
+def binary_interval(op: TT, left: Interval, right: Interval) -> Interval | None:
+  if op == TT.PLUS:
+    return (left[0] + right[0], left[1] + right[1])
+  if op == TT.MINUS:
+    return (left[0] - right[1], left[1] - right[0])
+  if op == TT.MUL:
+    corners: list[int] = [a * b for a in left for b in right]
+    return (min(corners), max(corners))
+  if op == TT.DIV:
+    return divide_interval(left, right)
+  if op in (TT.AND, TT.OR):
+    # NOTE: `&&` and `||` give one of their operands
+    return hull(hull(left, right), (0, 0))
+  return None
+
+
+"""
+Interval analysis, proves which operations can't overflow:
+  - Literals and for loop ranges give the bounds,
+    a variable with nothing known has the full range of its type
+  - Variables the symbol table already has, from the REPL or the host,
+    start with the full range of their type
+  - Values are joined after an if, a loop is visited until nothing changes
+    and a bound that keeps moving is dropped
+  - A BinOp or UnaryOp on whole numbers whose result always fits its type
+    gets checked=False, the runtime skips the range check for it
+Needs the result types from type inference
+"""
+class IntervalAnalyzer(NodeTransformer):
+  def __init__(self, var_types: dict[str, Any] | None = None) -> None:
+    super().__init__()
+    self.env: Env = {name: type_range(type_)
+                     for name, type_ in (var_types or {}).items()}
+    # NOTE: Interval of every visited expression, by id,
+    # from the last time it was visited
+    self.intervals: dict[int, Interval | None] = {}
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      unchecked, checked = count_checks(res.node)
+      report.add("intervals", nodes_before, count_nodes(res.node),
+                 unchecked=unchecked, checked=checked)
+    return res
+
+  def interval_of(self, node) -> Interval | None:
+    return self.intervals.get(id(node))
+
+  def record(self, node, interval: Interval | None, type_: Any) -> Any:
+    bounds: Interval | None = type_range(type_)
+    if bounds is None:
+      self.intervals[id(node)] = None
+      return node
+    # NOTE: A checked result that didn't raise fits its type
+    if interval is not None:
+      interval = (max(interval[0], bounds[0]), min(interval[1], bounds[1]))
+    if interval is None or interval[0] > interval[1]:
+      interval = bounds
+    self.intervals[id(node)] = interval
+    return node
+
+  def visit_Number(self, node: Number) -> Any:
+    if isinstance(node.token.value, int):
+      return self.record(node, (node.token.value, node.token.value), node.type_)
+    return self.record(node, None, node.type_)
+
+  def visit_VarAccess(self, node: VarAccess) -> Any:
+    return self.record(node, self.env.get(node.var_name_token.value), node.result_type)
+
+  def visit_VarAssign(self, node: VarAssign) -> Any:
+    node.value_node = self.visit(node.value_node)
+    self.env[node.var_name_token.value] = self.interval_of(node.value_node)
+    return node
+
+  # NOTE: Elements are only known to fit the type of their array
+  def visit_IndexAccess(self, node: IndexAccess) -> Any:
+    node.index = self.visit(node.index)
+    return self.record(node, None, node.result_type)
+
+  def visit_ArrayLength(self, node: ArrayLength) -> Any:
+    return self.record(node, (0, type_range(node.result_type)[1]), node.result_type)
+
+  # NOTE: A count is never negative, the others are only known to fit an i64
+  def visit_RangeBuiltin(self, node: RangeBuiltin) -> Any:
+    node = self.generic_visit(node)
+    if node.name_token.value == "count":
+      return self.record(node, (0, type_range(node.result_type)[1]), node.result_type)
+    return self.record(node, None, node.result_type)
+
+  def visit_ArrayAssign(self, node: ArrayAssign) -> Any:
+    node = self.generic_visit(node)
+    self.env[node.var_name_token.value] = None
+    return node
+
+  def visit_BinOp(self, node: BinOp) -> Any:
+    node.left_node = self.visit(node.left_node)
+    node.right_node = self.visit(node.right_node)
+    bounds: Interval | None = type_range(node.result_type)
+    if bounds is None:
+      node.checked = True
+      return self.record(node, None, node.result_type)
+    if node.op_token.type in BOOLEAN_OPS:
+      interval: Interval | None = (0, 1)
+    else:
+      left: Interval | None = self.interval_of(node.left_node)
+      right: Interval | None = self.interval_of(node.right_node)
+      interval = None
+      if left and right:
+        interval = binary_interval(node.op_token.type, left, right)
+    node.checked = not fits(interval, bounds)
+    return self.record(node, interval, node.result_type)
+
+  def visit_UnaryOp(self, node: UnaryOp) -> Any:
+    node.node = self.visit(node.node)
+    bounds: Interval | None = type_range(node.result_type)
+    operand: Interval | None = self.interval_of(node.node)
+    interval: Interval | None = None
+    if node.op_tok.type == TT.NOT:
+      interval = (0, 1)
+    elif node.op_tok.type == TT.MINUS and operand is not None:
+      interval = (-operand[1], -operand[0])
+    elif node.op_tok.type == TT.PLUS:
+      interval = operand
+    node.checked = not fits(interval, bounds)
+    return self.record(node, interval, node.result_type)
+
+  # NOTE: Updates keep their own checks,
+  # afterwards only the type of the variable is known
+  def visit_update(self, node) -> Any:
+    if isinstance(node.value, IndexAccess):
+      node.value = self.visit(node.value)
+    if hasattr(node, "amount"):
+      node.amount = self.visit(node.amount)
+    if isinstance(node.value, VarAccess):
+      self.env[node.value.var_name_token.value] = None
+    return self.record(node, None, getattr(node, "result_type", None))
+
+  visit_Increment = visit_update
+  visit_Decrement = visit_update
+  visit_IncrementBy = visit_update
+  visit_DecrementBy = visit_update
+  visit_MultiplyBy = visit_update
+  visit_DivideBy = visit_update
+
+  def visit_IfExpr(self, node: IfExpr) -> Any:
+    outcomes: list[Env] = []
+    for condition, body in node.cases:
+      self.visit(condition)
+      entry: Env = dict(self.env)
+      self.visit_block(body)
+      outcomes.append(self.env)
+      self.env = entry
+    if node.else_case is not None:
+      self.visit_block(node.else_case)
+    outcomes.append(self.env)
+    self.env = outcomes[0]
+    for outcome in outcomes[1:]:
+      self.env = join_envs(self.env, outcome)
+    return node
+
+  # NOTE: Values of the loop variable, from the first value it is given to the last
+  def loop_var_interval(self, node: ForExpr) -> Interval | None:
+    start: Interval | None = self.interval_of(node.range.start)
+    end: Interval | None = self.interval_of(node.range.end)
+    if node.range.step is None:
+      step: int | None = 1
+    elif (isinstance(node.range.step, Number)
+          and isinstance(node.range.step.token.value, int)):
+      step = node.range.step.token.value
+    else:
+      step = None
+    if start is None or end is None or step is None:
+      return None
+    if start[0] == start[1] and end[0] == end[1]:
+      trips: int | None = trip_count(start[0], end[0], step)
+      if trips is not None:
+        first, last = start[0] + step, start[0] + max(trips, 1) * step
+        return (min(first, last), max(first, last))
+    if step > 0:
+      return (start[0] + step, max(start[1], end[1] + step - 1))
+    if step < 0:
+      return (min(start[0], end[0] + step + 1), start[1] + step)
+    return start
+
+  def visit_loop(self, node, loop_var: str | None,
+                 loop_var_interval: Interval | None) -> None:
+    while not self.error:
+      entry: Env = dict(self.env)
+      if isinstance(node, WhileStmt):
+        self.visit(node.condition)
+      if loop_var is not None:
+        self.env[loop_var] = loop_var_interval
+      self.visit_block(node.block)
+      joined: Env = join_envs(entry, self.env)
+      if joined == entry:
+        self.env = joined
+        return
+      # NOTE: Widening, anything the body changed is forgotten
+      # so the next visit is the last one
+      self.env = {name: (interval if entry.get(name) == interval else None)
+                  for name, interval in joined.items()}
+      if loop_var is not None:
+        stable: bool = entry.get(loop_var) == loop_var_interval
+        self.env[loop_var] = loop_var_interval if stable else None
+
+  def visit_WhileStmt(self, node: WhileStmt) -> Any:
+    self.visit_loop(node, None, None)
+    return node
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node.range = self.visit(node.range)
+    self.visit_loop(node, node.var_name.value, self.loop_var_interval(node))
+    return node
+
+
+def count_checks(node, counts: list[int] | None = None) -> tuple[int, int]:
+  if counts is None:
+    counts = [0, 0]
+  if isinstance(node, (BinOp, UnaryOp)):
+    counts[1 if node.checked else 0] += 1
+  for child in iter_children(node):
+    count_checks(child, counts)
+  return counts[0], counts[1]
@@ -0,0 +1,185 @@
+from frontend.TOKENS import TT
+from middle_end.AST import (
+  ArrayAssign, ArrayLength,
+  ArrayLiteral, BinOp,
+  Decrement, DecrementBy,
+  DivideBy, ForExpr,
+  Hoisted, IfExpr,
+  Increment, IncrementBy,
+  IndexAccess, IndexAssign,
+  MappedFile, MultiplyBy,
+  Number, RangeBuiltin,
+  RangeNode, TempLoad,
+  TempStore, UnaryOp,
+  VarAccess, VarAssign,
+  WhileStmt,
+)
+from runtime.typemap import type_map
+
+SYMBOLS: dict[TT, str] = {
+  TT.PLUS: "+",
+  TT.MINUS: "-",
+  TT.MUL: "*",
+  TT.DIV: "/",
+  TT.POW: "^",
+  TT.DOUBLE_EQ: "==",
+  TT.NOT_EQ: "!=",
+  TT.LT: "<",
+  TT.L_EQ: "<=",
+  TT.GT: ">",
+  TT.G_EQ: ">=",
+  TT.AND: "&&",
+  TT.OR: "||",
+  TT.NOT: "!",
+}
+
+# NOTE: {0} is the variable or element that is updated, {1} the amount
+UPDATE_FORMATS: dict[type, str] = {
+  IncrementBy: "incr {0} by {1}",
+  DecrementBy: "decr {0} by {1}",
+  MultiplyBy: "mult {0} by {1}",
+  DivideBy: "div {0} by {1}",
+}
+
+
+"""
+Prints the AST in the syntax of the language, one statement per line, for --dump-ir
+The passes rewrite the AST and the interpreter runs it, so the AST is what gets dumped
+What the passes added to it is shown too:
+  - an operation proven to fit its type runs without a range check, marked with `!`
+  - `(t0 := ...)` is a value CSE keeps and `t0` a use of it
+  - `hoist h0 = ...` is a loop invariant computed before the loop and `h0` a use of it
+  - closed forms, batched reductions and jump tables are noted in `[...]`
+"""
+class Printer:
+  def __init__(self) -> None:
+    self.lines: list[str] = []
+    self.depth: int = 0
+    # NOTE: id of a TempStore or Hoisted node -> its name, numbered in printing order
+    self.names: dict[int, str] = {}
+
+  def dump(self, ast: list) -> str:
+    self.print_block(ast)
+    return "".join(f"{line}\n" for line in self.lines)
+
+  def name_of(self, node, prefix: str) -> str:
+    if id(node) not in self.names:
+      count: int = sum(name.startswith(prefix) for name in self.names.values())
+      self.names[id(node)] = f"{prefix}{count}"
+    return self.names[id(node)]
+
+  def line(self, text: str) -> None:
+    self.lines.append("  " * self.depth + text)
+
+  def print_block(self, block: list) -> None:
+    for stmt in block:
+      self.print_stmt(stmt)
+
+  def print_body(self, header: str, block: list) -> None:
+    self.line(header + " {")
+    self.depth += 1
+    self.print_block(block)
+    self.depth -= 1
+    self.line("}")
+
+  def print_stmt(self, node) -> None:
+    if isinstance(node, list):
+      self.print_block(node)
+    elif isinstance(node, IfExpr):
+      self.print_if(node)
+    elif isinstance(node, WhileStmt):
+      self.print_hoisted(node)
+      self.print_body(f"while {self.expr(node.condition)}", node.block)
+    elif isinstance(node, ForExpr):
+      self.print_for(node)
+    else:
+      self.line(self.expr(node))
+
+  def print_hoisted(self, loop) -> None:
+    for hoisted in loop.hoisted:
+      self.line(f"hoist {self.name_of(hoisted, 'h')} = {self.expr(hoisted.node)}")
+
+  def print_if(self, node: IfExpr) -> None:
+    keyword: str = "if"
+    if node.dispatch is not None:
+      self.line(f"[jump table on {self.expr(node.dispatch_var)}]")
+    for condition, body in node.cases:
+      self.print_body(f"{keyword} {self.expr(condition)}", body)
+      keyword = "elif"
+    if node.else_case is not None:
+      self.print_body("else", node.else_case)
+
+  def print_for(self, node: ForExpr) -> None:
+    self.print_hoisted(node)
+    header: str = f"for {node.var_name.value} in {self.expr(node.range)}"
+    if node.parallel:
+      reductions: str = ", ".join(f"{name}: +" for name in node.reductions)
+      header = f"par {header} reduce({reductions})"
+    if node.affine_updates is not None:
+      updates: str = ", ".join(
+          f"{name} += {amount}" for name, amount in node.affine_updates)
+      header += f" [closed form: {updates}]"
+    if node.reduction is not None:
+      header += f" [batched: {', '.join(name for name, _, _ in node.reduction)}]"
+    self.print_body(header, node.block)
+
+  def expr(self, node) -> str:
+    if isinstance(node, Number):
+      return str(node.token.value)
+    if isinstance(node, VarAccess):
+      return node.var_name_token.value
+    if isinstance(node, BinOp):
+      mark: str = "" if node.checked else "!"
+      symbol: str = SYMBOLS.get(node.op_token.type, "?")
+      left, right = self.expr(node.left_node), self.expr(node.right_node)
+      return f"({left} {symbol}{mark} {right})"
+    if isinstance(node, UnaryOp):
+      mark = "" if node.checked else "!"
+      return f"{SYMBOLS.get(node.op_tok.type, '?')}{mark}{self.expr(node.node)}"
+    if isinstance(node, VarAssign):
+      return f"{self.declared(node)} = {self.expr(node.value_node)}"
+    if isinstance(node, ArrayAssign):
+      length: str = self.expr(node.length) if node.length is not None else ""
+      return f"{self.declared(node, f'[{length}]')} = {self.expr(node.value_node)}"
+    if isinstance(node, ArrayLiteral):
+      return f"[{', '.join(self.expr(element) for element in node.elements)}]"
+    if isinstance(node, MappedFile):
+      offset: str = f", {self.expr(node.offset)}" if node.offset is not None else ""
+      return f"mmap(`{node.path_token.value}`{offset})"
+    if isinstance(node, IndexAccess):
+      return f"{node.var_name_token.value}[{self.expr(node.index)}]"
+    if isinstance(node, IndexAssign):
+      return f"{self.expr(node.target)} = {self.expr(node.value_node)}"
+    if isinstance(node, ArrayLength):
+      return f"len({node.var_name_token.value})"
+    if isinstance(node, RangeBuiltin):
+      return f"{node.name_token.value}({self.expr(node.range)})"
+    if isinstance(node, RangeNode):
+      step: str = f" step {self.expr(node.step)}" if node.step is not None else ""
+      return f"{self.expr(node.start)}...{self.expr(node.end)}{step}"
+    if isinstance(node, (Increment, Decrement)):
+      symbol = "++" if isinstance(node, Increment) else "--"
+      value: str = self.expr(node.value)
+      return f"{value}{symbol}" if node.postfix else f"{symbol}{value}"
+    if type(node) in UPDATE_FORMATS:
+      return UPDATE_FORMATS[type(node)].format(
+          self.expr(node.value), self.expr(node.amount))
+    if isinstance(node, TempStore):
+      return f"({self.name_of(node, 't')} := {self.expr(node.node)})"
+    if isinstance(node, TempLoad):
+      return self.name_of(node.store, "t")
+    if isinstance(node, Hoisted):
+      return self.name_of(node, "h")
+    return f"<{type(node).__name__}>"
+
+  # NOTE: `const u8 x` or `u8[4] buf`, a type that comes from the value isn't shown
+  # The parser keeps the name of the type when the value isn't a literal
+  def declared(self, node, suffix: str = "") -> str:
+    parts: list[str] = ["const"] if node.is_value_const else []
+    if node.type_ is not None or suffix:
+      parts.append(type_map.get(node.type_, node.type_ or "?") + suffix)
+    return " ".join(parts + [node.var_name_token.value])
+
+
+def dump(ast: list) -> str:
+  return Printer().dump(ast)
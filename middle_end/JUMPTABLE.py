@@ -0,0 +1,76 @@
+from typing import Any
+
+from frontend.TOKENS import TT
+from middle_end.AST import BinOp, IfExpr, Number, VarAccess
+from middle_end.TRANSFORMER import NodeTransformer, OptReport, PassResult, count_nodes
+from typechecking.TYPECHECKER import TypeChecker
+
+tpchecker: TypeChecker = TypeChecker()
+
+# NOTE: Shorter chains are as fast to walk as to look up
+MIN_DISPATCH_CASES: int = 4
+
+
+# NOTE: The variable and the literal of `VAR == literal` or `literal == VAR`,
+# None for any other condition
+def compared_literal(condition) -> tuple[VarAccess, int] | None:
+  if not isinstance(condition, BinOp) or condition.op_token.type != TT.DOUBLE_EQ:
+    return None
+  left, right = condition.left_node, condition.right_node
+  if isinstance(left, Number) and isinstance(right, VarAccess):
+    left, right = right, left
+  if not isinstance(left, VarAccess) or not isinstance(right, Number):
+    return None
+  # NOTE: A decimal or out of range literal compares differently or fails,
+  # those chains are left alone
+  value: int | float = right.token.value
+  if not isinstance(value, int) or not tpchecker.is_value_in_range(right.type_, value):
+    return None
+  return left, right.token.value
+
+
+"""
+Finds if/elif chains where every condition compares the same variable
+with a whole number literal
+  - The chain gets a table from the literal to the first case that matches it
+  - The interpreter reads the variable once and jumps to that case,
+    the else case is used when nothing matches
+  - When the variable holds a decimal at runtime
+    the cases are checked one by one like before
+"""
+class JumpTableBuilder(NodeTransformer):
+  def __init__(self) -> None:
+    super().__init__()
+    self.tables: int = 0
+    self.dispatched_cases: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      report.add("jumptable", nodes_before, count_nodes(res.node),
+                 tables=self.tables, dispatched_cases=self.dispatched_cases)
+    return res
+
+  def visit_IfExpr(self, node: IfExpr) -> Any:
+    node = self.generic_visit(node)
+    if len(node.cases) < MIN_DISPATCH_CASES:
+      return node
+    variable: VarAccess | None = None
+    table: dict[int, int] = {}
+    for index, (condition, _) in enumerate(node.cases):
+      compared: tuple[VarAccess, int] | None = compared_literal(condition)
+      if compared is None:
+        return node
+      access, literal = compared
+      if variable is None:
+        variable = access
+      elif access.var_name_token.value != variable.var_name_token.value:
+        return node
+      # NOTE: A repeated literal can never reach its later case
+      table.setdefault(literal, index)
+    node.dispatch = table
+    node.dispatch_var = variable
+    self.tables += 1
+    self.dispatched_cases += len(node.cases)
+    return node
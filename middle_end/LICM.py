@@ -0,0 +1,105 @@
+from typing import Any
+
+from middle_end.AST import (
+  BinOp, ForExpr,
+  Hoisted, Number,
+  RangeBuiltin, UnaryOp,
+  VarAccess, WhileStmt,
+)
+from middle_end.TRANSFORMER import (
+  NodeTransformer, OptReport,
+  PassResult, collect_writes,
+  count_nodes,
+)
+
+
+# NOTE: An expression is invariant when it only reads literals
+# and variables the loop never writes
+def is_invariant(node, writes: set[str]) -> bool:
+  if isinstance(node, Number):
+    return True
+  if isinstance(node, VarAccess):
+    return node.var_name_token.value not in writes
+  if isinstance(node, UnaryOp):
+    return is_invariant(node.node, writes)
+  if isinstance(node, BinOp):
+    return (is_invariant(node.left_node, writes)
+            and is_invariant(node.right_node, writes))
+  if isinstance(node, RangeBuiltin):
+    parts: list = [node.range.start, node.range.end, node.range.step]
+    return all(part is None or is_invariant(part, writes) for part in parts)
+  return False
+
+
+"""
+Wraps the biggest invariant expressions inside one loop,
+including the loops nested in it
+"""
+class InvariantMarker(NodeTransformer):
+  def __init__(self, loop: WhileStmt | ForExpr, writes: set[str]) -> None:
+    super().__init__()
+    self.loop = loop
+    self.writes = writes
+
+  def hoist(self, node) -> Any:
+    if not is_invariant(node, self.writes):
+      return self.generic_visit(node)
+    hoisted: Hoisted = Hoisted(node)
+    self.loop.hoisted.append(hoisted)
+    return hoisted
+
+  visit_BinOp = hoist
+  visit_UnaryOp = hoist
+  visit_RangeBuiltin = hoist
+
+  def visit_Hoisted(self, node: Hoisted) -> Any:
+    return node
+
+  # NOTE: The target of an update is written, only the amount can be hoisted
+  def visit_update(self, node) -> Any:
+    if hasattr(node, "amount"):
+      node.amount = self.visit(node.amount)
+    return node
+
+  visit_Increment = visit_update
+  visit_Decrement = visit_update
+  visit_IncrementBy = visit_update
+  visit_DecrementBy = visit_update
+  visit_MultiplyBy = visit_update
+  visit_DivideBy = visit_update
+
+
+"""
+Loop invariant code motion, expressions inside a loop that only read variables
+the loop never writes (through VarAssign, the increment and decrement statements
+or a for loop variable) are hoisted.
+A hoisted expression is evaluated once each time the loop starts, lazily on its
+first use, so overflow and division errors still happen at the same time and
+position as without the optimization.
+"""
+class LoopInvariantHoister(NodeTransformer):
+  def __init__(self) -> None:
+    super().__init__()
+    self.hoisted: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      report.add("licm", nodes_before, count_nodes(res.node), hoisted=self.hoisted)
+    return res
+
+  # NOTE: Outer loops go first
+  # so an expression is hoisted out of as many loops as possible
+  def visit_WhileStmt(self, node: WhileStmt) -> Any:
+    marker: InvariantMarker = InvariantMarker(node, collect_writes(node))
+    node.condition = marker.visit(node.condition)
+    node.block = marker.visit_block(node.block)
+    self.hoisted += len(node.hoisted)
+    return self.generic_visit(node)
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    marker: InvariantMarker = InvariantMarker(node, collect_writes(node))
+    node.block = marker.visit_block(node.block)
+    self.hoisted += len(node.hoisted)
+    return self.generic_visit(node)
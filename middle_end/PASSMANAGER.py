@@ -0,0 +1,48 @@
+import time
+from typing import Any, Callable
+
+from middle_end.IR import dump as dump_ast
+from middle_end.TRANSFORMER import OptReport, PassResult
+
+"""
+A pass the manager can run, make builds a new one every run since passes keep counters
+level is the lowest optimization level it runs at, level 0 passes always run
+"""
+class RegisteredPass:
+  def __init__(self, name: str, level: int, make: Callable[[], Any]) -> None:
+    self.name = name
+    self.level = level
+    self.make = make
+
+
+"""
+Runs the registered passes in order
+  - Only passes at or below the optimization level run
+  - With a report, the time of every pass is recorded next to what the pass reported
+  - With dump, the AST is printed before and after every pass, see middle_end/IR.py
+"""
+class PassManager:
+  def __init__(self) -> None:
+    self.passes: list[RegisteredPass] = []
+
+  def register(self, name: str, level: int, make: Callable[[], Any]) -> None:
+    self.passes.append(RegisteredPass(name, level, make))
+
+  def run(self, ast: list, level: int, report: OptReport | None = None,
+          dump: Callable[[str], None] | None = None) -> PassResult:
+    res: PassResult = PassResult().success(ast)
+    for pass_ in self.passes:
+      if pass_.level > level:
+        continue
+      if dump is not None:
+        dump(f"--- IR before {pass_.name} ---\n{dump_ast(res.node)}")
+      start: float = time.perf_counter()
+      res = pass_.make().optimize(res.node, report)
+      elapsed: float = time.perf_counter() - start
+      if res.error:
+        return res
+      if report is not None:
+        report.add_timing(pass_.name, elapsed)
+      if dump is not None:
+        dump(f"--- IR after {pass_.name} ---\n{dump_ast(res.node)}")
+    return res
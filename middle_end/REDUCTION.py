@@ -0,0 +1,109 @@
+import ctypes
+from typing import Any
+
+from frontend.TOKENS import TT
+from middle_end.AST import (
+  BinOp, Decrement,
+  DecrementBy, ForExpr,
+  Hoisted, Increment,
+  IncrementBy, Number,
+  VarAccess,
+)
+from middle_end.TRANSFORMER import (
+  NodeTransformer, OptReport,
+  PassResult, collect_writes,
+  count_nodes,
+)
+from runtime.batch import Expr
+from runtime.kernels import DECIMAL_TYPES, to_type
+from typechecking.TYPECHECKER import TypeChecker
+
+tpchecker: TypeChecker = TypeChecker()
+
+# NOTE: Operators runtime/batch.py can run on a whole batch
+BATCH_OPS: dict[TT, str] = {TT.PLUS: "+", TT.MINUS: "-", TT.MUL: "*", TT.DIV: "/"}
+
+
+# NOTE: The expression as a runtime/batch.py tree, None if it can't run on a batch
+# Variables the loop doesn't write and hoisted expressions are leaves,
+# the interpreter reads them once per batch
+def batch_expr(node, loop_var: str, written: set[str]) -> Expr | None:
+  if isinstance(node, Number):
+    if not tpchecker.is_value_in_range(node.type_, node.token.value):
+      return None
+    if node.type_ not in DECIMAL_TYPES and type(node.token.value) is not int:
+      return None
+    return ("number", to_type(node.type_, node.token.value), node.type_)
+  if isinstance(node, VarAccess):
+    name: str = node.var_name_token.value
+    if name == loop_var:
+      return ("index",)
+    return None if name in written else ("leaf", node)
+  if isinstance(node, Hoisted):
+    return ("leaf", node)
+  if isinstance(node, BinOp) and node.op_token.type in BATCH_OPS:
+    left: Expr | None = batch_expr(node.left_node, loop_var, written)
+    right: Expr | None = batch_expr(node.right_node, loop_var, written)
+    if left is None or right is None:
+      return None
+    return ("op", BATCH_OPS[node.op_token.type], node.result_type, left, right)
+  return None
+
+
+# NOTE: (accumulator, "+" or "-", amount) for every statement,
+# None if a statement isn't an accumulator update
+def reduction_updates(node: ForExpr) -> list[tuple[str, str, Expr]] | None:
+  if node.parallel:
+    return None
+  loop_var: str = node.var_name.value
+  written: set[str] = collect_writes(node.block) | {loop_var}
+  updates: list[tuple[str, str, Expr]] = []
+  for stmt in node.block:
+    if (not isinstance(stmt, (Increment, Decrement, IncrementBy, DecrementBy))
+        or not isinstance(stmt.value, VarAccess)):
+      return None
+    name: str = stmt.value.var_name_token.value
+    if name == loop_var or any(name == other for other, _, _ in updates):
+      return None
+    operation: str = "+" if isinstance(stmt, (Increment, IncrementBy)) else "-"
+    if isinstance(stmt, (Increment, Decrement)):
+      amount: Expr | None = ("number", 1, ctypes.c_longlong)
+    else:
+      amount = batch_expr(stmt.amount, loop_var, written)
+    if amount is None:
+      return None
+    updates.append((name, operation, amount))
+  # NOTE: Loops of only constant steps are the affine pass's, they don't need batches
+  if all(amount[0] == "number" for _, _, amount in updates):
+    return None
+  return updates or None
+
+
+"""
+Finds reduction loops like
+`for i in 0...n step 1 { incr total by i * i; decr left by 2 * i + k; };`
+  - every statement adds to or subtracts from a different variable
+    that the amounts don't read
+  - amounts only use + - * / on the loop variable, literals
+    and variables the loop doesn't write
+The interpreter runs these loops a batch of iterations at a time, see runtime/batch.py
+"""
+class ReductionAnalyzer(NodeTransformer):
+  def __init__(self) -> None:
+    super().__init__()
+    self.reduction_loops: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      report.add("reduction", nodes_before, count_nodes(res.node),
+                 batched_loops=self.reduction_loops)
+    return res
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node = self.generic_visit(node)
+    node.reduction = reduction_updates(node)
+    if node.reduction is not None:
+      self.reduction_loops += 1
+    return node
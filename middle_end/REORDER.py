@@ -0,0 +1,189 @@
+from typing import Any
+
+from frontend.TOKENS import TT
+from middle_end.AST import (
+  BinOp, ForExpr,
+  IfExpr, Number,
+  UnaryOp, VarAccess,
+  VarAssign, WhileStmt,
+)
+from middle_end.INTERVALS import BOOLEAN_OPS
+from middle_end.JUMPTABLE import compared_literal
+from middle_end.TRANSFORMER import NodeTransformer, OptReport, PassResult, count_nodes
+from runtime.profile import BranchProfile
+from typechecking.TYPECHECKER import TypeChecker
+from typechecking.TYPEINFER import type_of
+
+tpchecker: TypeChecker = TypeChecker()
+
+# NOTE: Operators that can't raise once their range check is gone
+PURE_OPS: tuple[TT, ...] = (TT.AND, TT.OR, TT.PLUS, TT.MINUS, TT.MUL)
+
+
+# NOTE: A pure expression has no side effects and can't raise,
+# so it can run more or less often than before
+def is_pure(node, defined: set[str]) -> bool:
+  if isinstance(node, Number):
+    return tpchecker.is_value_in_range(node.type_, node.token.value)
+  if isinstance(node, VarAccess):
+    return node.var_name_token.value in defined
+  if isinstance(node, UnaryOp):
+    if node.op_tok.type == TT.MINUS and node.checked:
+      return False
+    return is_pure(node.node, defined)
+  if isinstance(node, BinOp):
+    if node.op_token.type not in BOOLEAN_OPS + PURE_OPS:
+      return False
+    if node.op_token.type not in BOOLEAN_OPS and node.checked:
+      return False
+    return is_pure(node.left_node, defined) and is_pure(node.right_node, defined)
+  return False
+
+
+# NOTE: Comparisons and `!` give 0 or 1,
+# which fits whatever type the operator next to them promotes to
+def is_boolean(node) -> bool:
+  if isinstance(node, BinOp):
+    return node.op_token.type in BOOLEAN_OPS
+  return isinstance(node, UnaryOp) and node.op_tok.type == TT.NOT
+
+
+def flatten(node, op: TT, operands: list) -> list:
+  if isinstance(node, BinOp) and node.op_token.type == op:
+    flatten(node.left_node, op, operands)
+    flatten(node.right_node, op, operands)
+  else:
+    operands.append(node)
+  return operands
+
+
+def rebuild(operands: list, op_token) -> Any:
+  node = operands[0]
+  for operand in operands[1:]:
+    node = BinOp(node, op_token, operand)
+    left, right = type_of(node.left_node), type_of(node.right_node)
+    if left is not None and right is not None:
+      node.result_type = tpchecker.promote_type(left, right)
+  return node
+
+
+"""
+Profile guided branch ordering, needs a profile from earlier runs (--profile=<file>):
+  - Operands of a `&&` chain in a condition are ordered from most to least often false,
+    `||` from most to least often true
+  - Only pure comparisons move, an operand with side effects stays where it is
+    and the ones before it stay before it
+  - if/elif cases comparing one variable with different literals
+    are ordered from most to least often taken
+Conditions are only used for being true or not,
+so the order doesn't change what a program does
+"""
+class BranchReorderer(NodeTransformer):
+  def __init__(self, profile: BranchProfile | None,
+               var_types: dict[str, Any] | None = None) -> None:
+    super().__init__()
+    self.profile = profile
+    # NOTE: Variables that are always defined at this point of the program
+    self.defined: set[str] = set(var_types or {})
+    self.reordered_operands: int = 0
+    self.reordered_cases: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast) if self.profile is not None else PassResult().success(ast)
+    if report is not None and not res.error:
+      report.add("reorder", nodes_before, count_nodes(res.node),
+                 reordered_operands=self.reordered_operands,
+                 reordered_cases=self.reordered_cases)
+    return res
+
+  # NOTE: Declarations inside a block only exist if the block runs
+  def visit_scoped_block(self, block: list, defined: set[str] | None = None) -> list:
+    outer: set[str] = self.defined
+    self.defined = set(outer) | (defined or set())
+    block = self.visit_block(block)
+    self.defined = outer
+    return block
+
+  def visit_VarAssign(self, node: VarAssign) -> Any:
+    node.value_node = self.visit(node.value_node)
+    self.defined.add(node.var_name_token.value)
+    return node
+
+  def sort_key(self, operand, op: TT) -> float:
+    rate: float = self.profile.true_rate(operand)
+    return -rate if op == TT.OR else rate
+
+  def order_condition(self, node) -> Any:
+    if isinstance(node, UnaryOp) and node.op_tok.type == TT.NOT:
+      node.node = self.order_condition(node.node)
+      return node
+    if not isinstance(node, BinOp) or node.op_token.type not in (TT.AND, TT.OR):
+      return node
+    op: TT = node.op_token.type
+    operands: list = [self.order_condition(operand)
+                      for operand in flatten(node, op, [])]
+    ordered: list = []
+    run: list = []
+    for operand in operands + [None]:
+      if operand is not None and is_boolean(operand) and is_pure(operand, self.defined):
+        run.append(operand)
+        continue
+      # NOTE: An operand that can't move ends the run,
+      # it runs after the same operands as before
+      if all(self.profile.true_rate(moving) is not None for moving in run):
+        run = sorted(run, key=lambda moving: self.sort_key(moving, op))
+      ordered.extend(run)
+      run = []
+      if operand is not None:
+        ordered.append(operand)
+    if all(first is second for first, second in zip(ordered, operands)):
+      return node
+    self.reordered_operands += 1
+    return rebuild(ordered, node.op_token)
+
+  # NOTE: Cases of `x == 1`, `x == 2`, ... can't both be true,
+  # so the case that is taken most often can go first
+  def order_cases(self, cases: list) -> list:
+    ordered: list = []
+    run: list = []
+    name: str | None = None
+    literals: set[int] = set()
+    for case in cases + [None]:
+      compared: tuple[VarAccess, int] | None = None
+      if case is not None:
+        compared = compared_literal(case[0])
+      if compared is not None and compared[0].var_name_token.value in self.defined:
+        access, literal = compared
+        if name == access.var_name_token.value and literal not in literals:
+          run.append(case)
+          literals.add(literal)
+          continue
+      ordered.extend(sorted(run, key=lambda taken: -self.profile.times_true(taken[0])))
+      run, name, literals = [], None, set()
+      if compared is not None and compared[0].var_name_token.value in self.defined:
+        run, name, literals = [case], compared[0].var_name_token.value, {compared[1]}
+      elif case is not None:
+        ordered.append(case)
+    if any(first is not second for first, second in zip(ordered, cases)):
+      self.reordered_cases += 1
+    return ordered
+
+  def visit_IfExpr(self, node: IfExpr) -> Any:
+    node.cases = [
+        (self.order_condition(self.visit(condition)), self.visit_scoped_block(body))
+        for condition, body in node.cases]
+    node.cases = self.order_cases(node.cases)
+    if node.else_case is not None:
+      node.else_case = self.visit_scoped_block(node.else_case)
+    return node
+
+  def visit_WhileStmt(self, node: WhileStmt) -> Any:
+    node.condition = self.order_condition(self.visit(node.condition))
+    node.block = self.visit_scoped_block(node.block)
+    return node
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node.range = self.visit(node.range)
+    node.block = self.visit_scoped_block(node.block, {node.var_name.value})
+    return node
@@ -0,0 +1,71 @@
+from typing import Any
+
+from middle_end.AST import (
+  ArrayAssign, ArrayLength,
+  ForExpr, IfExpr,
+  IndexAccess, VarAccess,
+  VarAssign,
+)
+from middle_end.TRANSFORMER import NodeTransformer, OptReport, PassResult, count_nodes
+
+"""
+Resolver, gives every variable node the address of its value
+so the interpreter doesn't look names up:
+  - A read gets the (depth, slot) of the closest symbol table with the name,
+    or a new slot in the innermost one
+  - Assignments and loop variables always write to the innermost symbol table,
+    like the interpreter always did
+  - Elements and lengths of arrays are read through the address of the array
+Slots are made in the symbol table the program will run with,
+so this runs last, after the optimizer made its nodes
+"""
+class Resolver(NodeTransformer):
+  # NOTE: symbol_table is the interpreter's SymbolTable
+  def __init__(self, symbol_table: Any) -> None:
+    super().__init__()
+    self.symbol_table = symbol_table
+    self.resolved: int = 0
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    res = self.run(ast)
+    if report is not None and not res.error:
+      nodes: int = count_nodes(res.node)
+      report.add("resolve", nodes, nodes, resolved=self.resolved,
+                 slots=len(self.symbol_table.slots))
+    return res
+
+  def visit_VarAccess(self, node: VarAccess) -> Any:
+    node.depth, node.slot = self.symbol_table.address_of(node.var_name_token.value)
+    self.resolved += 1
+    return node
+
+  def visit_VarAssign(self, node: VarAssign) -> Any:
+    node.value_node = self.visit(node.value_node)
+    node.slot = self.symbol_table.slot_of(node.var_name_token.value)
+    self.resolved += 1
+    return node
+
+  def visit_IndexAccess(self, node: IndexAccess) -> Any:
+    node.depth, node.slot = self.symbol_table.address_of(node.var_name_token.value)
+    self.resolved += 1
+    return self.generic_visit(node)
+
+  visit_ArrayLength = visit_IndexAccess
+
+  def visit_ArrayAssign(self, node: ArrayAssign) -> Any:
+    node = self.generic_visit(node)
+    node.slot = self.symbol_table.slot_of(node.var_name_token.value)
+    self.resolved += 1
+    return node
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node.var_slot = self.symbol_table.slot_of(node.var_name.value)
+    self.resolved += 1
+    return self.generic_visit(node)
+
+  # NOTE: The variable a jump table reads came from the first condition,
+  # later passes can replace that condition
+  def visit_IfExpr(self, node: IfExpr) -> Any:
+    if node.dispatch_var is not None:
+      self.visit(node.dispatch_var)
+    return self.generic_visit(node)
@@ -0,0 +1,218 @@
+from typing import Any, Self
+
+from middle_end.AST import (
+  ArrayAssign, ArrayLength,
+  ArrayLiteral, BinOp,
+  Decrement, DecrementBy,
+  DivideBy, ForExpr,
+  Hoisted, IfExpr,
+  Increment, IncrementBy,
+  IndexAccess, IndexAssign,
+  MappedFile, MultiplyBy,
+  Number, RangeBuiltin,
+  RangeNode, TempLoad,
+  TempStore, UnaryOp,
+  VarAccess, VarAssign,
+  WhileStmt,
+)
+from middle_end.ERRORS import Error
+
+# NOTE: The fields of each node that hold child nodes, blocks are handled seperately
+CHILD_FIELDS: dict[type, tuple[str, ...]] = {
+  Number: (),
+  VarAccess: (),
+  VarAssign: ("value_node",),
+  UnaryOp: ("node",),
+  BinOp: ("left_node", "right_node"),
+  Increment: ("value",),
+  Decrement: ("value",),
+  IncrementBy: ("value", "amount"),
+  DecrementBy: ("value", "amount"),
+  MultiplyBy: ("value", "amount"),
+  DivideBy: ("value", "amount"),
+  WhileStmt: ("condition",),
+  RangeNode: ("start", "end", "step"),
+  ForExpr: ("range",),
+  Hoisted: ("node",),
+  TempStore: ("node",),
+  TempLoad: (),  # NOTE: The store is reached through the expression it was made for
+  ArrayAssign: ("length", "value_node"),
+  ArrayLiteral: ("elements",),
+  IndexAccess: ("index",),
+  IndexAssign: ("target", "value_node"),
+  ArrayLength: (),
+  MappedFile: ("offset",),
+  RangeBuiltin: ("range",),
+}
+
+# NOTE: Nodes that write to the variable in their `value` field,
+# or to an element when it is an IndexAccess
+UPDATE_NODES: tuple[type, ...] = (
+  Increment, Decrement,
+  IncrementBy, DecrementBy,
+  MultiplyBy, DivideBy,
+)
+
+
+class PassResult:
+  def __init__(self) -> None:
+    self.node = None
+    self.error: Error | None = None
+
+  def register(self, res) -> Any:
+    if res.error:
+      self.error = res.error
+    return res.node
+
+  def success(self, node) -> Self:
+    self.node = node
+    return self
+
+  def failure(self, error) -> Self:
+    self.error = error
+    return self
+
+
+"""Keeps track of what every pass did so it can be printed after optimizing"""
+class OptReport:
+  def __init__(self) -> None:
+    self.entries: list[tuple[str, int, int, dict[str, int]]] = []
+    # NOTE: Filled in by the pass manager, pass name -> seconds
+    self.timings: dict[str, float] = {}
+
+  def add(self, pass_name: str, nodes_before: int, nodes_after: int,
+          **stats: int) -> None:
+    self.entries.append((pass_name, nodes_before, nodes_after, stats))
+
+  def add_timing(self, pass_name: str, seconds: float) -> None:
+    self.timings[pass_name] = seconds
+
+  def __repr__(self) -> str:
+    result: str = ""
+    for pass_name, nodes_before, nodes_after, stats in self.entries:
+      eliminated: int = nodes_before - nodes_after
+      result += (f"{pass_name}: {nodes_before} -> {nodes_after} nodes "
+                 f"({eliminated} eliminated)")
+      for name, count in stats.items():
+        result += f", {name}={count}"
+      if pass_name in self.timings:
+        result += f", {self.timings[pass_name] * 1000:.3f}ms"
+      result += "\n"
+    return result
+
+
+def iter_children(node) -> list:
+  if isinstance(node, list):
+    return node
+  children: list = [getattr(node, field) for field in CHILD_FIELDS.get(type(node), ())]
+  if isinstance(node, IfExpr):
+    for condition, body in node.cases:
+      children.append(condition)
+      children.append(body)
+    if node.else_case is not None:
+      children.append(node.else_case)
+  elif isinstance(node, (WhileStmt, ForExpr)):
+    children.append(node.block)
+  return [child for child in children if child is not None]
+
+
+# NOTE: Names of every variable the node (or block) can write to
+def collect_writes(node, writes: set[str] | None = None) -> set[str]:
+  if writes is None:
+    writes = set()
+  if node is None:
+    return writes
+  if isinstance(node, (VarAssign, ArrayAssign)):
+    writes.add(node.var_name_token.value)
+  elif (isinstance(node, UPDATE_NODES)
+        and isinstance(node.value, (VarAccess, IndexAccess))):
+    writes.add(node.value.var_name_token.value)
+  elif isinstance(node, IndexAssign):
+    writes.add(node.target.var_name_token.value)
+  elif isinstance(node, ForExpr):
+    writes.add(node.var_name.value)
+  for child in iter_children(node):
+    collect_writes(child, writes)
+  return writes
+
+
+# NOTE: Names of every variable the node (or block) can read,
+# a jump table reads its variable once for the whole if
+def collect_reads(node, reads: set[str] | None = None) -> set[str]:
+  if reads is None:
+    reads = set()
+  if node is None:
+    return reads
+  if isinstance(node, (VarAccess, IndexAccess, ArrayLength)):
+    reads.add(node.var_name_token.value)
+  elif isinstance(node, IfExpr) and node.dispatch_var is not None:
+    reads.add(node.dispatch_var.var_name_token.value)
+  for child in iter_children(node):
+    collect_reads(child, reads)
+  return reads
+
+
+def count_nodes(node) -> int:
+  if node is None:
+    return 0
+  count: int = 0 if isinstance(node, list) else 1
+  for child in iter_children(node):
+    count += count_nodes(child)
+  return count
+
+
+"""
+Base class for passes that rewrite the AST, a visit method can return
+  - a node, which replaces the visited node
+  - a list when visited inside a block, which gets spliced into the block
+  - None when visited inside a block, which removes the statement
+"""
+class NodeTransformer:
+  def __init__(self) -> None:
+    self.error: Error | None = None
+
+  def run(self, ast: list) -> PassResult:
+    res: PassResult = PassResult()
+    node = self.visit_block(ast)
+    if self.error:
+      return res.failure(self.error)
+    return res.success(node)
+
+  def fail(self, error: Error, node) -> Any:
+    if not self.error:
+      self.error = error
+    return node
+
+  def visit(self, node) -> Any:
+    if node is None or self.error:
+      return node
+    if isinstance(node, list):
+      return self.visit_block(node)
+    method = getattr(self, f"visit_{type(node).__name__}", self.generic_visit)
+    return method(node)
+
+  def visit_block(self, block: list) -> list:
+    statements: list = []
+    for stmt in block:
+      new_stmt = self.visit(stmt)
+      if self.error:
+        return block
+      if isinstance(new_stmt, list):
+        statements.extend(new_stmt)
+      elif new_stmt is not None:
+        statements.append(new_stmt)
+    return statements
+
+  def generic_visit(self, node) -> Any:
+    for field in CHILD_FIELDS.get(type(node), ()):
+      child = getattr(node, field)
+      if child is not None:
+        setattr(node, field, self.visit(child))
+    if isinstance(node, IfExpr):
+      node.cases = [(self.visit(condition), self.visit_block(body))
+                    for condition, body in node.cases]
+      if node.else_case is not None:
+        node.else_case = self.visit_block(node.else_case)
+    elif isinstance(node, (WhileStmt, ForExpr)):
+      node.block = self.visit_block(node.block)
+    return node
@@ -0,0 +1,139 @@
+"""
+Runs the amounts of a reduction loop (see middle_end/REDUCTION.py)
+for a whole batch of iterations at once
+An amount is a small tree of tuples:
+  ("index",)                                   the loop variable, an i64
+  ("number", value, type)                      a literal
+  ("leaf", node)                               a variable or hoisted expression,
+                                               the interpreter reads it once per batch
+  ("op", operation, result type, left, right)  an operator, the result type is None
+                                               when it wasn't inferred
+Every operator runs over the batch with map() and keeps the rules of runtime/kernels.py:
+  - whole numbers are Python ints and / truncates towards zero
+  - decimals are computed as doubles,
+    f32 results are rounded by storing them in an array("f")
+  - a value that doesn't fit its type or a division by zero gives None
+None means the batch runs one iteration at a time instead,
+which raises the same error at the same place as always
+"""
+import ctypes
+import itertools
+import operator
+from array import array
+from typing import Any, Callable
+
+from runtime.kernels import BOUNDS, DECIMAL_TYPES, OPERATIONS, round_f32, to_type
+from runtime.number import update_value
+from runtime.typemap import PROMOTED, TYPE_CODES, TYPE_CTYPES
+
+Expr = tuple
+# NOTE: Values of a batch, or one value that is the same for the whole batch
+Values = array | list | int | float
+
+BATCH_SIZE: int = 4096
+
+
+def is_scalar(values: Values) -> bool:
+  return isinstance(values, (int, float))
+
+
+def spread(values: Values, count: int) -> Any:
+  return itertools.repeat(values, count) if is_scalar(values) else values
+
+
+# NOTE: The type the kernel would give,
+# the inferred one or else the larger of the two types
+def result_type_of(result_type: Any, left_type: Any, right_type: Any) -> Any:
+  if result_type is not None:
+    return result_type
+  return TYPE_CTYPES[PROMOTED[TYPE_CODES[left_type]][TYPE_CODES[right_type]]]
+
+
+def run_op(operation: str, type_: Any, left: Values, right: Values,
+           count: int) -> Values | None:
+  is_decimal: bool = type_ in DECIMAL_TYPES
+  compute: Callable = OPERATIONS[operation][is_decimal]
+  if is_decimal:
+    left = float(left) if is_scalar(left) else list(map(float, left))
+    right = float(right) if is_scalar(right) else list(map(float, right))
+  try:
+    if is_scalar(left) and is_scalar(right):
+      values: Values = compute(left, right)
+    else:
+      values = list(map(compute, spread(left, count), spread(right, count)))
+  except (ZeroDivisionError, OverflowError):
+    return None
+  min_, max_ = BOUNDS[type_]
+  # NOTE: A negative base with a fractional exponent gives a complex number,
+  # the normal loop raises for it
+  if type(values) is complex:
+    return None
+  if is_scalar(values):
+    if not min_ <= values <= max_:
+      return None
+    return round_f32(values) if type_ is ctypes.c_float else values
+  # NOTE: min() and max() are wrong with a nan in the list,
+  # so decimals are checked one by one
+  if is_decimal and not all(type(value) is not complex and min_ <= value <= max_
+                            for value in values):
+    return None
+  if not is_decimal and (min(values) < min_ or max(values) > max_):
+    return None
+  if type_ is ctypes.c_float:
+    return array("f", values).tolist()
+  return values
+
+
+# NOTE: The values of expr for every index, with their type,
+# None if the batch can't be computed this way
+def evaluate(expr: Expr, indices: array,
+             read: Callable[[Any], Any]) -> tuple[Values, Any] | None:
+  kind: str = expr[0]
+  if kind == "index":
+    return indices, ctypes.c_longlong
+  if kind == "number":
+    return expr[1], expr[2]
+  if kind == "leaf":
+    number = read(expr[1])
+    return number.value, number.type_
+  _, operation, result_type, left_expr, right_expr = expr
+  left: tuple[Values, Any] | None = evaluate(left_expr, indices, read)
+  right: tuple[Values, Any] | None = evaluate(right_expr, indices, read)
+  if left is None or right is None:
+    return None
+  type_: Any = result_type_of(result_type, left[1], right[1])
+  # NOTE: A whole number kernel truncates decimal operands,
+  # that is left to the normal loop
+  if (type_ not in DECIMAL_TYPES
+      and (left[1] in DECIMAL_TYPES or right[1] in DECIMAL_TYPES)):
+    return None
+  values: Values | None = run_op(operation, type_, left[0], right[0], len(indices))
+  return None if values is None else (values, type_)
+
+
+# NOTE: Value of an accumulator after every amount was added (or subtracted) in order,
+# None if a step doesn't fit its type
+def accumulate(type_: Any, value: int | float, amounts: Values, amount_type: Any,
+               operation: str, count: int) -> int | float | None:
+  min_, max_ = BOUNDS[type_]
+  amounts = spread(amounts, count)
+  step: Callable = operator.add if operation == "+" else operator.sub
+  # NOTE: Whole numbers and doubles give the same steps as update_value,
+  # so the running totals come from accumulate()
+  if type_ not in DECIMAL_TYPES and amount_type not in DECIMAL_TYPES:
+    totals: list = list(itertools.accumulate(amounts, step, initial=value))
+    if min(totals) < min_ or max(totals) > max_:
+      return None
+    return totals[-1]
+  if type_ is ctypes.c_double:
+    totals = list(itertools.accumulate(amounts, step, initial=value))
+    if not all(min_ <= total <= max_ for total in totals):
+      return None
+    return totals[-1]
+  # NOTE: f32 rounds and whole numbers truncate a decimal amount after every step
+  for amount in amounts:
+    new_value: int | float = update_value(type_, value, amount, operation)
+    if not min_ <= new_value <= max_:
+      return None
+    value = to_type(type_, new_value)
+  return value
@@ -0,0 +1,155 @@
+"""
+Fixed size arrays of one number type, declared with `u8[1000] buf = 0;`
+The elements are kept in an array.array with the struct format of the type,
+so a million u8 elements take a million bytes
+Elements are plain ints and floats like the values of RuntimeNumber,
+the interpreter checks every index and value it writes
+An array literal without a type gets the smallest type that holds all its values exactly
+`f32[] data = mmap(`dump.bin`);` maps a binary file instead,
+its elements are read from the pages of the file without copying them
+"""
+import mmap
+import os
+from array import array
+from typing import Any
+
+from runtime.kernels import round_f32
+from runtime.typemap import (
+  F32, F64, I8, I16, I32, I64, TYPE_BOUNDS, TYPE_CODES, TYPE_CTYPES, TYPE_FORMATS,
+  U8, U16, U32, U64, type_map,
+)
+
+# NOTE: Elements repr shows, a longer array ends with ...
+SHOWN_ELEMENTS: int = 8
+
+# NOTE: Types an untyped literal can get, from the smallest to the largest
+UNSIGNED_CODES: tuple[int, ...] = (U8, U16, U32, U64)
+SIGNED_CODES: tuple[int, ...] = (I8, I16, I32, I64)
+
+
+"""Type of an array variable in type inference, the same for one element type"""
+class ArrayType:
+  __slots__ = ("type_",)
+
+  def __init__(self, type_: Any) -> None:
+    # NOTE: c_longlong and c_int64 can be different classes of the same type,
+    # the one of the registry is kept
+    self.type_ = TYPE_CTYPES[TYPE_CODES[type_]]
+
+  def __eq__(self, other: Any) -> bool:
+    return isinstance(other, ArrayType) and self.type_ is other.type_
+
+  def __hash__(self) -> int:
+    return hash((ArrayType, self.type_))
+
+  def __repr__(self) -> str:
+    return f"{type_map.get(self.type_)}[]"
+
+
+class TypedArray:
+  __slots__ = ("elem_type", "data")
+  read_only: bool = False
+
+  def __init__(self, elem_type: Any, data: array | memoryview) -> None:
+    self.elem_type = elem_type
+    self.data = data
+
+  # NOTE: Like RuntimeNumber.type_, what the symbol table gives type inference
+  @property
+  def type_(self) -> ArrayType:
+    return ArrayType(self.elem_type)
+
+  def __len__(self) -> int:
+    return len(self.data)
+
+  def __repr__(self) -> str:
+    shown: str = ", ".join(repr(value) for value in self.data[:SHOWN_ELEMENTS])
+    if len(self.data) > SHOWN_ELEMENTS:
+      shown += ", ..."
+    return f"{type_map.get(self.elem_type)}[{len(self.data)}]({shown})"
+
+
+"""
+Elements of a binary file mapped with mmap,
+data is a memoryview of the mapped pages cast to the element type
+The file is mapped read only and the elements are in the byte order of this machine,
+little endian on x86 and ARM
+"""
+class MappedArray(TypedArray):
+  __slots__ = ("path", "offset")
+  read_only: bool = True
+
+  def __init__(self, elem_type: Any, data: memoryview, path: str, offset: int) -> None:
+    super().__init__(elem_type, data)
+    self.path = path
+    self.offset = offset
+
+  # NOTE: A memoryview can't be pickled,
+  # a worker process maps the same part of the file again
+  def __reduce__(self) -> tuple:
+    return map_file, (self.elem_type, self.path, self.offset, len(self.data))
+
+
+def storage_format(type_: Any) -> str:
+  return TYPE_FORMATS[TYPE_CODES[type_]]
+
+
+# NOTE: values are already plain values of type_, see runtime.kernels.to_type
+def array_of(type_: Any, values: list[int | float]) -> TypedArray:
+  return TypedArray(type_, array(storage_format(type_), values))
+
+
+# NOTE: Repeating a one element array fills the buffer in C, without a Python loop
+def filled_array(type_: Any, value: int | float, length: int) -> TypedArray:
+  return TypedArray(type_, array(storage_format(type_), [value]) * length)
+
+
+# NOTE: Smallest type that holds every value exactly, None when no type holds them all
+# Whole numbers get an unsigned type unless one is negative,
+# decimals get f32 when rounding to it changes none of them
+def narrowest_type(values: list[int | float]) -> Any:
+  if any(type(value) is float for value in values):
+    if all(round_f32(float(value)) == value for value in values):
+      return TYPE_CTYPES[F32]
+    return TYPE_CTYPES[F64]
+  if not values:
+    return TYPE_CTYPES[U8]
+  smallest, largest = min(values), max(values)
+  for code in UNSIGNED_CODES if smallest >= 0 else SIGNED_CODES:
+    min_, max_ = TYPE_BOUNDS[code]
+    if min_ <= smallest and largest <= max_:
+      return TYPE_CTYPES[code]
+  return None
+
+
+# NOTE: offset is in bytes and length in elements,
+# None maps every element after the offset
+# Raises OSError when the file can't be mapped
+# and ValueError when it doesn't have the elements asked for
+def map_file(type_: Any, path: str, offset: int = 0,
+             length: int | None = None) -> MappedArray:
+  format_: str = storage_format(type_)
+  size: int = array(format_).itemsize
+  name: str = type_map.get(type_)
+  with open(path, "rb") as f:
+    file_size: int = os.fstat(f.fileno()).st_size
+    if offset > file_size:
+      raise ValueError(f"The offset {offset} is past the end of `{path}`, "
+                       f"it has {file_size} bytes")
+    available: int = file_size - offset
+    if length is None:
+      if available % size:
+        raise ValueError(f"The {available} bytes of `{path}` after offset {offset} "
+                         f"aren't a whole number of {name} elements")
+      length = available // size
+    elif length * size > available:
+      raise ValueError(f"`{path}` has {available // size} {name} elements "
+                       f"after offset {offset}, not {length}")
+    # NOTE: mmap can't map an empty file, and its offset has to be a multiple
+    # of the page size so the view is sliced instead
+    if length == 0:
+      view: memoryview = memoryview(b"")
+    else:
+      pages: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      view = memoryview(pages)[offset:offset + length * size]
+  return MappedArray(type_, view.cast(format_), path, offset)
@@ -0,0 +1,304 @@
+"""
+Checkpoints of a running program, written every few seconds
+so a long run can continue after it was stopped
+A checkpoint is only taken when a for loop is about to start an iteration,
+the file holds:
+  - every variable of the symbol table, numbers are (type code, raw bytes) records
+    and arrays are (ARRAY, element type code, length, raw bytes of the elements)
+    records, all little endian
+    arrays mapped from a file are (MAPPED, element type code, offset, length, path)
+    records, resuming maps the file again
+  - for every block the program is in, the statement it is at
+    and the values of the statements before it
+  - the counter, end and step of every loop it is in and the case of every if it is in
+  - the values kept by TempStore nodes, in the order they are in the program
+Resuming runs the same program again,
+blocks skip to the statement in the checkpoint instead of running from the top
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Any
+
+from runtime.buffer import MappedArray, TypedArray, map_file, storage_format
+from runtime.number import RuntimeNumber
+from runtime.profile import BranchProfile
+from runtime.typemap import (
+  F64, I64,
+  TYPE_BOUNDS, TYPE_CODES,
+  TYPE_CTYPES, TYPE_FORMATS,
+  U64,
+)
+
+MAGIC: bytes = b"WLCP"
+VERSION: int = 3
+NO_VALUE: int = 255  # NOTE: Type code of an empty slot
+# NOTE: Type code of an array variable, the code of its elements comes after it
+ARRAY: int = 254
+MAPPED: int = 253  # NOTE: Type code of an array mapped from a file
+
+# NOTE: Statement a block is in when the checkpoint is taken
+FOR, IF, WHILE = range(3)
+
+# NOTE: Tags of the values statements gave, a block gives a list
+NONE_TAG, NUMBER_TAG, LIST_TAG = range(3)
+
+
+"""
+Where a block is, the interpreter keeps one for every block it is in
+while checkpoints are on
+  - index is the statement that is running
+    and results has the values of the statements before it
+  - state is what the running statement is doing:
+    (FOR, counter, end, step), (IF, case) or (WHILE,), -1 is the else case
+"""
+class Frame:
+  __slots__ = ("index", "results", "state")
+
+  def __init__(self, index: int = 0, results: list | None = None,
+               state: tuple | None = None) -> None:
+    self.index = index
+    self.results: list = results if results is not None else []
+    self.state = state
+
+
+class Checkpoint:
+  def __init__(self, program_hash: bytes,
+               variables: list[tuple[str, bool, RuntimeNumber | TypedArray | None]],
+               frames: list[Frame], temps: list[Any]) -> None:
+    self.program_hash = program_hash
+    self.variables = variables  # NOTE: (name, is const, value)
+    self.frames = frames
+    self.temps = temps
+
+
+# NOTE: The same source compiled the same way gives the same hash,
+# a checkpoint only resumes the program it came from
+# The profile reorders conditions and cases, so it is part of how a program is compiled
+def program_hash(text: str, opt_level: int,
+                 profile: BranchProfile | None = None) -> bytes:
+  counts: str = ""
+  if profile is not None:
+    counts = json.dumps(profile.counts, sort_keys=True)
+  return hashlib.sha256(f"{opt_level}\n{counts}\n{text}".encode()).digest()
+
+
+def pack_number(out: bytearray, number: RuntimeNumber | None) -> None:
+  if number is None:
+    out += struct.pack("<B", NO_VALUE)
+    return
+  code: int = TYPE_CODES[number.type_]
+  out += struct.pack("<B" + TYPE_FORMATS[code], code, number.value)
+
+
+# NOTE: Variables hold a number or an array
+def pack_value(out: bytearray, value: RuntimeNumber | TypedArray | None) -> None:
+  if not isinstance(value, TypedArray):
+    pack_number(out, value)
+    return
+  if isinstance(value, MappedArray):
+    out += struct.pack("<BBQQ", MAPPED, TYPE_CODES[value.elem_type],
+                       value.offset, len(value.data))
+    pack_str(out, value.path)
+    return
+  out += struct.pack("<BBQ", ARRAY, TYPE_CODES[value.elem_type], len(value.data))
+  data: array = value.data
+  if sys.byteorder == "big":
+    data = array(data.typecode, data)
+    data.byteswap()
+  out += data.tobytes()
+
+
+# NOTE: Loop counters are plain values, they are kept as an i64, u64 or f64 record
+def pack_counter(out: bytearray, value: int | float) -> None:
+  if type(value) is float:
+    code: int = F64
+  else:
+    min_, max_ = TYPE_BOUNDS[I64]
+    code = I64 if min_ <= value <= max_ else U64
+  out += struct.pack("<B" + TYPE_FORMATS[code], code, value)
+
+
+def pack_str(out: bytearray, text: str) -> None:
+  data: bytes = text.encode()
+  out += struct.pack("<H", len(data)) + data
+
+
+def pack_result(out: bytearray, result: Any) -> None:
+  if result is None:
+    out += struct.pack("<B", NONE_TAG)
+  elif isinstance(result, RuntimeNumber):
+    out += struct.pack("<B", NUMBER_TAG)
+    pack_number(out, result)
+  else:
+    out += struct.pack("<BI", LIST_TAG, len(result))
+    for item in result:
+      pack_result(out, item)
+
+
+def pack_state(out: bytearray, state: tuple | None) -> None:
+  if state is None:
+    out += struct.pack("<B", NO_VALUE)
+    return
+  out += struct.pack("<B", state[0])
+  if state[0] == FOR:
+    _, counter, end_value, step_value = state
+    pack_counter(out, counter)
+    pack_number(out, end_value)
+    pack_number(out, step_value)
+  elif state[0] == IF:
+    out += struct.pack("<i", state[1])
+
+
+def pack_checkpoint(program_hash: bytes, table: Any, frames: list[Frame],
+                    temps: list[Any]) -> bytes:
+  out: bytearray = bytearray(MAGIC)
+  out += struct.pack("<B32s", VERSION, program_hash)
+  out += struct.pack("<I", len(table.slots))
+  for name, slot in table.slots.items():
+    pack_str(out, name)
+    out += struct.pack("<?", table.consts[slot])
+    pack_value(out, table.values[slot])
+  out += struct.pack("<I", len(frames))
+  for frame in frames:
+    out += struct.pack("<I", frame.index)
+    pack_result(out, frame.results)
+    pack_state(out, frame.state)
+  out += struct.pack("<I", len(temps))
+  for value in temps:
+    pack_result(out, value)
+  return bytes(out)
+
+
+class Reader:
+  def __init__(self, data: bytes) -> None:
+    self.data = data
+    self.offset: int = 0
+
+  def take(self, format_: str) -> tuple:
+    values: tuple = struct.unpack_from("<" + format_, self.data, self.offset)
+    self.offset += struct.calcsize("<" + format_)
+    return values
+
+  # NOTE: Records of the number types give a RuntimeNumber, None for an empty slot
+  def number(self) -> RuntimeNumber | None:
+    code: int = self.take("B")[0]
+    if code == NO_VALUE:
+      return None
+    return RuntimeNumber.of(self.take(TYPE_FORMATS[code])[0], TYPE_CTYPES[code])
+
+  def value(self) -> RuntimeNumber | TypedArray | None:
+    if self.data[self.offset] == MAPPED:
+      _, code, offset, length = self.take("BBQQ")
+      return map_file(TYPE_CTYPES[code], self.text(), offset, length)
+    if self.data[self.offset] != ARRAY:
+      return self.number()
+    _, code, length = self.take("BBQ")
+    data: array = array(storage_format(TYPE_CTYPES[code]))
+    size: int = length * data.itemsize
+    data.frombytes(self.data[self.offset:self.offset + size])
+    self.offset += size
+    if sys.byteorder == "big":
+      data.byteswap()
+    return TypedArray(TYPE_CTYPES[code], data)
+
+  def counter(self) -> int | float:
+    return self.number().value
+
+  def text(self) -> str:
+    length: int = self.take("H")[0]
+    self.offset += length
+    return self.data[self.offset - length:self.offset].decode()
+
+  def result(self) -> Any:
+    tag: int = self.take("B")[0]
+    if tag == NONE_TAG:
+      return None
+    if tag == NUMBER_TAG:
+      return self.number()
+    return [self.result() for _ in range(self.take("I")[0])]
+
+  def state(self) -> tuple | None:
+    kind: int = self.take("B")[0]
+    if kind == NO_VALUE:
+      return None
+    if kind == FOR:
+      return (FOR, self.counter(), self.number(), self.number())
+    if kind == IF:
+      return (IF, self.take("i")[0])
+    return (WHILE,)
+
+
+def unpack_checkpoint(data: bytes) -> Checkpoint | None:
+  if data[:len(MAGIC)] != MAGIC:
+    return None
+  reader: Reader = Reader(data)
+  reader.offset = len(MAGIC)
+  version, hash_ = reader.take("B32s")
+  if version != VERSION:
+    return None
+  variables: list[tuple[str, bool, RuntimeNumber | TypedArray | None]] = []
+  for _ in range(reader.take("I")[0]):
+    name: str = reader.text()
+    is_const: bool = reader.take("?")[0]
+    variables.append((name, is_const, reader.value()))
+  frames: list[Frame] = []
+  for _ in range(reader.take("I")[0]):
+    index: int = reader.take("I")[0]
+    results: list = reader.result()
+    frames.append(Frame(index, results, reader.state()))
+  temps: list[Any] = [reader.result() for _ in range(reader.take("I")[0])]
+  return Checkpoint(hash_, variables, frames, temps)
+
+
+"""
+Writes checkpoints of one run to a file, at most one every interval seconds
+A file that holds a checkpoint of the same program is loaded into resume,
+the run then continues from it
+The file is written next to the old one first and then moved over it,
+so a stopped run never leaves half a checkpoint
+"""
+class Checkpointer:
+  def __init__(self, path: str, interval: float, program_hash: bytes) -> None:
+    self.path = path
+    self.interval = interval
+    self.program_hash = program_hash
+    self.next_save: float = time.monotonic() + interval
+    self.saved: int = 0
+    self.resume: Checkpoint | None = self.load()
+
+  def load(self) -> Checkpoint | None:
+    if not os.path.exists(self.path):
+      return None
+    with open(self.path, "rb") as f:
+      data: bytes = f.read()
+    # NOTE: A file mapped by the run can be gone or shorter now,
+    # the run starts from the top and reports it there
+    try:
+      checkpoint: Checkpoint | None = unpack_checkpoint(data)
+    except (OSError, ValueError):
+      return None
+    if checkpoint is None or checkpoint.program_hash != self.program_hash:
+      return None
+    return checkpoint
+
+  def due(self) -> bool:
+    return time.monotonic() >= self.next_save
+
+  def save(self, table: Any, frames: list[Frame], temps: list[Any]) -> None:
+    data: bytes = pack_checkpoint(self.program_hash, table, frames, temps)
+    with open(self.path + ".tmp", "wb") as f:
+      f.write(data)
+    os.replace(self.path + ".tmp", self.path)
+    self.saved += 1
+    self.next_save = time.monotonic() + self.interval
+
+  # NOTE: A run that finished doesn't need its checkpoint,
+  # the next run starts from the top
+  def discard(self) -> None:
+    if os.path.exists(self.path):
+      os.remove(self.path)
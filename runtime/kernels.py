@@ -0,0 +1,142 @@
+"""
+Operator kernels, one function for every operator and pair of types,
+built once when this is imported
+"""
+import ctypes
+import math
+import operator
+import struct
+from typing import Any, Callable
+
+from runtime.typemap import (
+  PROMOTED, TYPE_BOUNDS,
+  TYPE_CODES, TYPE_CTYPES,
+  TYPE_IS_FLOAT,
+)
+
+# NOTE: Smallest and largest value of every type, a range check is two comparisons
+BOUNDS: dict[Any, tuple[int | float, int | float]] = {
+  ctype: TYPE_BOUNDS[code] for ctype, code in TYPE_CODES.items()
+}
+WHOLE_NUM_TYPES: frozenset = frozenset(
+  ctype for ctype, code in TYPE_CODES.items() if not TYPE_IS_FLOAT[code])
+DECIMAL_TYPES: frozenset = frozenset(
+  ctype for ctype, code in TYPE_CODES.items() if TYPE_IS_FLOAT[code])
+
+F32: struct.Struct = struct.Struct("f")
+
+# NOTE: Takes the two plain values, gives the result and its type,
+# the result is None when it doesn't fit the type
+# Division by zero raises ZeroDivisionError,
+# RuntimeNumber turns it into an error for the program
+Kernel = Callable[[int | float, int | float], tuple[int | float | None, Any]]
+
+
+# NOTE: Rounds a float to the nearest f32 like a C float does,
+# too large values become inf
+def round_f32(value: float) -> float:
+  try:
+    return F32.unpack(F32.pack(value))[0]
+  except OverflowError:
+    return math.copysign(math.inf, value)
+
+
+# NOTE: The plain value a number of type_ holds,
+# whole number types hold an int and f32 is rounded
+def to_type(type_: Any, value: int | float) -> int | float:
+  if type_ not in DECIMAL_TYPES:
+    return int(value)
+  if type_ is ctypes.c_float:
+    return round_f32(float(value))
+  return float(value)
+
+
+# NOTE: Whole numbers divide like C does, truncating towards zero
+def whole_divide(left: int, right: int) -> int:
+  quotient: int = abs(left) // abs(right)
+  return quotient if (left < 0) == (right < 0) else -quotient
+
+
+# NOTE: A negative exponent gives a fraction,
+# a whole number type truncates it like division
+def whole_power(left: int, right: int) -> int:
+  return int(left**right)
+
+
+def float_divide(left: float, right: float) -> float:
+  return left / right
+
+
+# NOTE: What every operator computes, for whole number and for decimal operands
+OPERATIONS: dict[str, tuple[Callable, Callable]] = {
+  "+": (operator.add, operator.add),
+  "-": (operator.sub, operator.sub),
+  "*": (operator.mul, operator.mul),
+  "/": (whole_divide, float_divide),
+  "^": (whole_power, operator.pow),
+  "<": (operator.lt, operator.lt),
+  ">": (operator.gt, operator.gt),
+  ">=": (operator.ge, operator.ge),
+  "<=": (operator.le, operator.le),
+  "==": (operator.eq, operator.eq),
+  "!=": (operator.ne, operator.ne),
+  "&&": (lambda left, right: left and right, lambda left, right: left and right),
+  "||": (lambda left, right: left or right, lambda left, right: left or right),
+  "!": (lambda left, right: not left, lambda left, right: not left),
+}
+
+
+def whole_kernel(compute: Callable, type_: Any, checked: bool) -> Kernel:
+  min_, max_ = BOUNDS[type_]
+  if not checked:
+    return lambda left, right: (int(compute(left, right)), type_)
+
+  def kernel(left: int | float, right: int | float) -> tuple[int | None, Any]:
+    value = compute(left, right)
+    if min_ <= value <= max_:
+      return int(value), type_
+    return None, type_
+  return kernel
+
+
+# NOTE: Whole number operands are converted first,
+# so comparing with an int is the same as comparing with its float
+# A power too large for a float raises OverflowError
+# and a negative base with a fractional exponent gives a complex number,
+# neither fits the type so they give None even without the range check
+def decimal_kernel(compute: Callable, type_: Any, checked: bool) -> Kernel:
+  min_, max_ = BOUNDS[type_]
+  convert: Callable[[float], float] = round_f32 if type_ is ctypes.c_float else float
+
+  def kernel(left: int | float, right: int | float) -> tuple[float | None, Any]:
+    try:
+      value = compute(float(left), float(right))
+    except OverflowError:
+      return None, type_
+    if type(value) is complex or (checked and not min_ <= value <= max_):
+      return None, type_
+    return convert(float(value)), type_
+  return kernel
+
+
+def build_kernels(checked: bool) -> dict[tuple[str, Any, Any], Kernel]:
+  # NOTE: The result only depends on the type both sides are promoted to,
+  # so pairs share kernels
+  by_code: dict[tuple[str, int], Kernel] = {}
+  for operation, (whole, decimal) in OPERATIONS.items():
+    for code, type_ in enumerate(TYPE_CTYPES):
+      if TYPE_IS_FLOAT[code]:
+        by_code[(operation, code)] = decimal_kernel(decimal, type_, checked)
+      else:
+        by_code[(operation, code)] = whole_kernel(whole, type_, checked)
+  return {(operation, left, right):
+          by_code[(operation, PROMOTED[left_code][right_code])]
+          for operation in OPERATIONS
+          for left, left_code in TYPE_CODES.items()
+          for right, right_code in TYPE_CODES.items()}
+
+
+# NOTE: (operator, left type, right type) -> kernel,
+# UNCHECKED_KERNELS skip the range check
+KERNELS: dict[tuple[str, Any, Any], Kernel] = build_kernels(checked=True)
+UNCHECKED_KERNELS: dict[tuple[str, Any, Any], Kernel] = build_kernels(checked=False)
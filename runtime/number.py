@@ -1,223 +1,236 @@
 import ctypes
-from typing import Any, Self, TypeAlias
+import math
+from typing import Any, Callable
 
-from middle_end.ERRORS import RTError
+from frontend.TOKENS import TT
+from middle_end.ERRORS import Error, RTError, VarSizeError
 from middle_end.POSITION import Pos
-from runtime.typemap import type_map
-from typechecking.TYPECHECKER import TypeChecker
-
-"""Number class to help with number ops"""
-num_type: TypeAlias = (ctypes.c_int64
-                       | ctypes.c_int32
-                       | ctypes.c_int16
-                       | ctypes.c_int8
-                       | ctypes.c_int64
-                       | ctypes.c_float
-                       | ctypes.c_double
-                       | ctypes.c_uint8
-                       | ctypes.c_uint16
-                       | ctypes.c_uint32
-                       | ctypes.c_uint64
+from runtime.kernels import (
+  BOUNDS, DECIMAL_TYPES,
+  KERNELS, UNCHECKED_KERNELS,
+  WHOLE_NUM_TYPES, Kernel,
 )
+from runtime.typemap import type_map
+
 
 class Context:
   ... # NOTE: Use interpreter's Context, but don't import it otherwise there will be an import error
 
+
+def error_pos(node: Any) -> tuple[Pos, Pos]:
+  if node is None:
+    return Pos(0, 0, 0, "<unknown>", ""), Pos(0, 0, 0, "<unknown>", "")
+  return node.pos_start, node.pos_end
+
+
+"""
+Number class to help with number ops
+value is a plain int or float and type_ is the ctypes type it has,
+ctypes values are only made with to_ctypes
+Numbers never change after they are made,
+so variables, reads and results can share one object
+Positions aren't kept on numbers, errors point at the node the interpreter passes in
+"""
 class RuntimeNumber:
-  def __init__(self, value: num_type) -> None:
+  __slots__ = ("value", "type_")
+
+  # NOTE: Nothing sets value or type_ after this,
+  # a __setattr__ that raises would make every number twice as slow to make
+  def __init__(self, value: int | float, type_: Any) -> None:
     self.value = value
-    self.set_pos()
-    self.set_context()
-    self.type_: type = type(value)
+    self.type_ = type_
+
+  # NOTE: Small whole numbers come from SMALL_NUMBERS like CPython's small ints,
+  # anything else is a new number
+  @classmethod
+  def of(cls, value: int | float, type_: Any) -> "RuntimeNumber":
+    if type(value) is int and SMALL_MIN <= value <= SMALL_MAX:
+      cached: RuntimeNumber | None = SMALL_NUMBERS[type_][value - SMALL_MIN]
+      if cached is not None:
+        return cached
+    return cls(value, type_)
+
+  @classmethod
+  def from_ctypes(cls, value: Any) -> "RuntimeNumber":
+    return cls.of(value.value, type(value))
+
+  def to_ctypes(self) -> Any:
+    return self.type_(self.value)
+
   def is_true(self) -> bool:
-    # We are using ctypes module so use .value.value instead of .value
-    return self.value.value != 0
-
-  def operate(self, other, operation: str) -> Any:
-    if isinstance(other, RuntimeNumber):
-      whole_num_types: tuple = (ctypes.c_uint16, ctypes.c_uint32, ctypes.c_uint64, ctypes.c_int8, ctypes.c_int16, ctypes.c_int32, ctypes.c_int64, ctypes.c_uint8)
-      decimal_types: tuple = (ctypes.c_float, ctypes.c_double)
-      type_1 = type(self.value)
-      type_2 = type(other.value)
-      type_ = TypeChecker().promote_type(type_1, type_2)
-
-      # NOTE: variable conv_type is the type you convert the value to when performing operations
-      conv_type = float  # If no type is found, it defaults to float
-      result_value = None
-      if type_ in whole_num_types:
-        conv_type = int
-      elif type_ in decimal_types:
-        conv_type = float
-      if type(self.value) in whole_num_types + decimal_types:
-        match operation:
-          case "+":
-            if conv_type is int:
-              result_value = int(self.value.value) + int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) + float(other.value.value)
-          case "-":
-            if conv_type is int:
-              result_value = int(self.value.value) - int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) - float(other.value.value)
-          case "*":
-            if conv_type is int:
-              result_value = int(self.value.value) * int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) * float(other.value.value)
-          case "/":
-            if other.value.value == 0 or other.value.value == 0.0:
-              # Creating position if None
-              start_pos: Pos = (other.pos_start
-                                if other.pos_start is not None else
-                                (self.pos_start if self.pos_start is not None
-                                 else Pos(0, 0, 0, "<unknown>", "")))
-              end_pos: Pos = (self.pos_end if self.pos_end is not None else
-                              (other.pos_end if other.pos_end is not None else
-                               Pos(0, 0, 0, "<unknown>", "")))
-
-              return None, RTError(
-                  pos_start=start_pos,
-                  pos_end=end_pos,
-                  details="Division by zero",
-                  context=self.context,
-              )
-            if conv_type is int:
-              result_value = int(self.value.value) / int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) / float(other.value.value)
-          case "^":
-            if conv_type is int:
-              result_value = int(self.value.value)**int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value)**float(other.value.value)
-
-          case "<":
-            if conv_type is int:
-              result_value = int(self.value.value) < int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) < float(other.value.value)
-          case ">":
-            if conv_type is int:
-              result_value = int(self.value.value) > int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) > float(other.value.value)
-          case ">=":
-            if conv_type is int:
-              result_value = int(self.value.value) >= int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) >= float(
-                  other.value.value)
-          case "<=":
-            if conv_type is int:
-              result_value = int(self.value.value) <= int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) <= float(
-                  other.value.value)
-          case "==":
-            if conv_type is int:
-              result_value = int(self.value.value) == int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) == float(
-                  other.value.value)
-          case "!=":
-            if conv_type is int:
-              result_value = int(self.value.value) != int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) != float(
-                  other.value.value)
-          case "&&":
-            if conv_type is int:
-              result_value = int(self.value.value) and int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) and float(
-                  other.value.value)
-          case "||":
-            if conv_type is int:
-              result_value = int(self.value.value) or int(other.value.value)
-            elif conv_type is float:
-              result_value = float(self.value.value) or float(
-                  other.value.value)
-          case "!":
-            if conv_type is int:
-              result_value = not int(self.value.value)
-            elif conv_type is float:
-              result_value = not float(self.value.value)
-        result_value = type_(result_value)
-        return result_value
-
-  def set_pos(self,
-              pos_start: Pos | None = None,
-              pos_end: Pos | None = None) -> Self:
-    self.pos_start = pos_start
-    self.pos_end = pos_end
-    return self
-
-  def set_context(self, context: Context | None = None) -> Self:
-    self.context = context
-    return self
-
-  def added_to(self, other: Any):
-    result_value = self.operate(other, "+")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def subbed_by(self, other: Any):
-    result_value = self.operate(other, "-")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def mult_by(self, other: Any):
-    result_value = self.operate(other, "*")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def pow_by(self, other: Any):
-    result_value = self.operate(other, "^")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def div_by(self, other: Any):
-    result_value = self.operate(other, "/")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def comp_eq(self, other):
-    result_value = self.operate(other, "==")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def comp_not_eq(self, other):
-    result_value = self.operate(other, "!=")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def comp_lt(self, other):
-    result_value = self.operate(other, "<")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def comp_gt(self, other):
-    result_value = self.operate(other, ">")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def comp_l_eq(self, other):
-    result_value = self.operate(other, "<=")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def comp_g_eq(self, other):
-    result_value = self.operate(other, ">=")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def anded_by(self, other):
-    result_value = self.operate(other, "&&")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def ored_by(self, other):
-    result_value = self.operate(other, "||")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def notted(self):
-    result_value = self.operate(None, "!")
-    return RuntimeNumber(result_value).set_context(self.context), None
-
-  def copy(self) -> "RuntimeNumber":
-    copy = RuntimeNumber(self.value)
-    copy.set_pos(self.pos_start, self.pos_end)
-    copy.set_context(self.context)
-    return copy
+    return self.value != 0
+
+  # NOTE: result_type comes from type inference,
+  # the kernel for it is the same one the promoted types would pick
+  # checked is False when interval analysis proved the result fits,
+  # then the kernel skips the range check
+  # node is what errors point at and context is where they happened,
+  # both are only used for errors
+  def apply(self, other: Any, operation: str, result_type: Any = None,
+            checked: bool = True, node: Any = None,
+            context: Context | None = None) -> tuple[Any, Error | None]:
+    # NOTE: other is None for unary operations like `!`
+    if other is None:
+      other = self
+    elif not isinstance(other, RuntimeNumber):
+      return None, None
+    kernels: dict[tuple[str, Any, Any], Kernel] = (
+        KERNELS if checked else UNCHECKED_KERNELS)
+    if result_type is None:
+      kernel: Kernel = kernels[(operation, self.type_, other.type_)]
+    else:
+      kernel = kernels[(operation, result_type, result_type)]
+    try:
+      value, type_ = kernel(self.value, other.value)
+    except ZeroDivisionError:
+      pos_start, pos_end = error_pos(node)
+      return None, RTError(pos_start=pos_start, pos_end=pos_end,
+                           details="Division by zero", context=context)
+    # NOTE: Raise instead of letting the value wrap around
+    if value is None:
+      pos_start, pos_end = error_pos(node)
+      return None, VarSizeError(
+          pos_start=pos_start,
+          pos_end=pos_end,
+          details=f"Result of `{operation}` does not fit in {type_map.get(type_)}",
+      )
+    return RuntimeNumber.of(value, type_), None
+
+  def added_to(self, other: Any, result_type: Any = None, checked: bool = True,
+               node: Any = None, context: Context | None = None):
+    return self.apply(other, "+", result_type, checked, node, context)
+
+  def subbed_by(self, other: Any, result_type: Any = None, checked: bool = True,
+                node: Any = None, context: Context | None = None):
+    return self.apply(other, "-", result_type, checked, node, context)
+
+  def mult_by(self, other: Any, result_type: Any = None, checked: bool = True,
+              node: Any = None, context: Context | None = None):
+    return self.apply(other, "*", result_type, checked, node, context)
+
+  def powered_by(self, other: Any, result_type: Any = None, checked: bool = True,
+                 node: Any = None, context: Context | None = None):
+    return self.apply(other, "^", result_type, checked, node, context)
+
+  def divided_by(self, other: Any, result_type: Any = None, checked: bool = True,
+                 node: Any = None, context: Context | None = None):
+    return self.apply(other, "/", result_type, checked, node, context)
+
+  def equals(self, other: Any, result_type: Any = None, checked: bool = True,
+             node: Any = None, context: Context | None = None):
+    return self.apply(other, "==", result_type, checked, node, context)
+
+  def not_equals(self, other: Any, result_type: Any = None, checked: bool = True,
+                 node: Any = None, context: Context | None = None):
+    return self.apply(other, "!=", result_type, checked, node, context)
+
+  def less_than(self, other: Any, result_type: Any = None, checked: bool = True,
+                node: Any = None, context: Context | None = None):
+    return self.apply(other, "<", result_type, checked, node, context)
+
+  def greater_than(self, other: Any, result_type: Any = None, checked: bool = True,
+                   node: Any = None, context: Context | None = None):
+    return self.apply(other, ">", result_type, checked, node, context)
+
+  def less_than_or_equal(self, other: Any, result_type: Any = None,
+                         checked: bool = True, node: Any = None,
+                         context: Context | None = None):
+    return self.apply(other, "<=", result_type, checked, node, context)
+
+  def greater_than_or_equal(self, other: Any, result_type: Any = None,
+                            checked: bool = True, node: Any = None,
+                            context: Context | None = None):
+    return self.apply(other, ">=", result_type, checked, node, context)
+
+  def anded_by(self, other: Any, result_type: Any = None, checked: bool = True,
+               node: Any = None, context: Context | None = None):
+    return self.apply(other, "&&", result_type, checked, node, context)
+
+  def ored_by(self, other: Any, result_type: Any = None, checked: bool = True,
+              node: Any = None, context: Context | None = None):
+    return self.apply(other, "||", result_type, checked, node, context)
+
+  def notted(self, result_type: Any = None, checked: bool = True,
+             node: Any = None, context: Context | None = None):
+    return self.apply(None, "!", result_type, checked, node, context)
 
   def __repr__(self) -> str:
-    return f"{type_map.get(self.type_)}({self.value.value})"
+    return f"{type_map.get(self.type_)}({self.value})"
+
+
+# NOTE: New value of a variable after `incr`, `decr`, `mult` or `div` by an amount,
+# the variable keeps its type
+def update_value(type_: Any, value: int | float, amount: int | float,
+                 operation: str) -> int | float:
+  is_float_type: bool = type_ in DECIMAL_TYPES
+  match operation:
+    case "+":
+      new_value = value + amount
+    case "-":
+      new_value = value - amount
+    case "*":
+      new_value = value * amount
+    case "/":
+      if is_float_type or isinstance(amount, float):
+        new_value = value / amount
+      else:
+        quotient = abs(value) // abs(amount)
+        new_value = quotient if (value < 0) == (amount < 0) else -quotient
+  # NOTE: Like C, a whole number variable updated with a decimal amount is truncated
+  if not is_float_type and isinstance(new_value, float) and math.isfinite(new_value):
+    new_value = int(new_value)
+  return new_value
+
+
+# NOTE: Shared by the interpreter and the constant folder
+# so both evaluate operators the same way
+# An operator is a method of the left side: (a, b, result_type, checked, node, context)
+BINARY_METHODS: dict[TT, str] = {
+    TT.PLUS: "added_to",
+    TT.MINUS: "subbed_by",
+    TT.MUL: "mult_by",
+    TT.DIV: "divided_by",
+    TT.POW: "powered_by",
+    TT.DOUBLE_EQ: "equals",
+    TT.NOT_EQ: "not_equals",
+    TT.LT: "less_than",
+    TT.L_EQ: "less_than_or_equal",
+    TT.GT: "greater_than",
+    TT.G_EQ: "greater_than_or_equal",
+    TT.AND: "anded_by",
+    TT.OR: "ored_by",
+}
+BINARY_OPS: dict[TT, Callable] = {
+    op: getattr(RuntimeNumber, name) for op, name in BINARY_METHODS.items()}
+
+# NOTE: Every whole number from SMALL_MIN to SMALL_MAX that fits a type is made once,
+# None where it doesn't fit
+# 0 and 1 of u8 are true and false
+SMALL_MIN: int = -5
+SMALL_MAX: int = 256
+SMALL_NUMBERS: dict[Any, list[RuntimeNumber | None]] = {
+    type_: [RuntimeNumber(value, type_) if min_ <= value <= max_ else None
+            for value in range(SMALL_MIN, SMALL_MAX + 1)]
+    for type_, (min_, max_) in BOUNDS.items() if type_ in WHOLE_NUM_TYPES
+}
+
+# NOTE: Negation multiplies by an i16 -1
+NEGATIVE_ONE: RuntimeNumber = RuntimeNumber.of(-1, ctypes.c_int16)
+
+
+def unary_plus(a: RuntimeNumber, result_type: Any = None, checked: bool = True,
+               node: Any = None, context: Context | None = None):
+  return a, None
+
+
+def negated(a: RuntimeNumber, result_type: Any = None, checked: bool = True,
+            node: Any = None, context: Context | None = None):
+  return a.mult_by(NEGATIVE_ONE, result_type, checked, node, context)
+
+
+# NOTE: Called as (a, result_type, checked, node, context)
+UNARY_OPS: dict[TT, Callable] = {
+    TT.PLUS: unary_plus,
+    TT.MINUS: negated,
+    TT.NOT: RuntimeNumber.notted,
+}
@@ -0,0 +1,47 @@
+"""
+Branch profile, how often conditions were true in earlier runs,
+kept in a json file between runs
+"""
+import json
+import os
+
+# NOTE: Where the node is in the source, stays the same between runs of the same file
+Key = str
+
+
+def node_key(node) -> Key:
+  return f"{node.pos_start.index}:{node.pos_end.index}"
+
+
+class BranchProfile:
+  def __init__(self) -> None:
+    # NOTE: key -> [times evaluated, times true]
+    self.counts: dict[Key, list[int]] = {}
+
+  def record(self, node, truth: bool) -> None:
+    counts: list[int] = self.counts.setdefault(node_key(node), [0, 0])
+    counts[0] += 1
+    counts[1] += truth
+
+  # NOTE: None when the node never ran, it then stays where it is
+  def true_rate(self, node) -> float | None:
+    counts: list[int] | None = self.counts.get(node_key(node))
+    if counts is None or counts[0] == 0:
+      return None
+    return counts[1] / counts[0]
+
+  def times_true(self, node) -> int:
+    counts: list[int] | None = self.counts.get(node_key(node))
+    return counts[1] if counts is not None else 0
+
+  @classmethod
+  def load(cls, path: str) -> "BranchProfile":
+    profile: BranchProfile = cls()
+    if os.path.exists(path):
+      with open(path, "r") as f:
+        profile.counts = {key: list(counts) for key, counts in json.load(f).items()}
+    return profile
+
+  def save(self, path: str) -> None:
+    with open(path, "w") as f:
+      json.dump(self.counts, f)
@@ -0,0 +1,132 @@
+"""
+Helpers for the `start...end step n` ranges used by for loops
+and by the range builtins like `sum(1...n step 1)`
+A range builtin gives what a loop over the range would leave in an i64
+that starts at 0 (or 1 for product):
+  - sum adds the counter, product multiplies by it, count counts the iterations,
+    min and max keep the smallest and largest counter
+  - a whole number range is computed in closed form,
+    the partial sums are checked at their extremes instead of one by one
+  - a decimal range runs its counter like the loop does and reduces it a batch at a time
+"""
+import ctypes
+import itertools
+import math
+from fractions import Fraction
+from typing import Iterator
+
+from runtime.batch import BATCH_SIZE, accumulate
+from runtime.kernels import to_type
+from runtime.typemap import I64, TYPE_BOUNDS
+
+# NOTE: Names of the range builtins and the operator whose overflow they report,
+# like the update in the loop would
+RANGE_BUILTINS: dict[str, str | None] = {
+  "sum": "+",
+  "product": "*",
+  "count": None,
+  "min": None,
+  "max": None,
+}
+
+I64_MIN, I64_MAX = TYPE_BOUNDS[I64]
+
+
+# NOTE: How many times visit_ForExpr runs the block,
+# None when the loop never ends (a step of 0)
+def trip_count(start: int | float, end: int | float, step: int | float) -> int | None:
+  if step > 0:
+    if start >= end:
+      return 0
+    return int(-(-(end - start) // step))
+  if step < 0:
+    if start <= end:
+      return 0
+    return int(-(-(start - end) // -step))
+  return None if start < end else 0
+
+
+# NOTE: The values the counter of `for i in start...end step step` takes,
+# the same way visit_ForExpr gives them
+# A decimal range adds the step to a float
+# and the counter holds it cut to a whole number
+def counter_values(start: int | float, end: int | float,
+                   step: int | float) -> Iterator[int]:
+  i: int | float = start
+  if step >= 0:
+    while i < end:
+      i += step
+      yield to_type(ctypes.c_longlong, i)
+  else:
+    while i > end:
+      i += step
+      yield to_type(ctypes.c_longlong, i)
+
+
+# NOTE: Value of builtin over the range,
+# None when a step of the equivalent loop doesn't fit an i64
+# trips is the trip_count of the range and isn't None,
+# min and max are only asked for ranges that aren't empty
+def reduce_range(builtin: str, start: int | float, end: int | float,
+                 step: int | float, trips: int) -> int | None:
+  if builtin == "product":
+    return range_product(counter_values(start, end, step))
+  if all(type(value) is int for value in (start, end, step)):
+    return closed_form(builtin, start + step, step, trips)
+  return reduce_batches(builtin, counter_values(start, end, step))
+
+
+# NOTE: The counter goes first, first + step, ...
+# so every builtin but product has a formula
+def closed_form(builtin: str, first: int, step: int, trips: int) -> int | None:
+  if builtin == "count":
+    return trips
+  if builtin in ("min", "max"):
+    last: int = first + step * (trips - 1)
+    value: int = min(first, last) if builtin == "min" else max(first, last)
+    return value if I64_MIN <= value <= I64_MAX else None
+
+  def partial_sum(count: int) -> int:
+    return count * first + step * count * (count - 1) // 2
+
+  # NOTE: The partial sums are a parabola in the number of values added,
+  # so the largest and smallest one are at the ends or next to its vertex,
+  # checking those is the same as checking every step
+  vertex: Fraction = Fraction(1, 2) - Fraction(first, step)
+  for count in {1, trips, math.floor(vertex), math.ceil(vertex)}:
+    if 1 <= count <= trips and not I64_MIN <= partial_sum(count) <= I64_MAX:
+      return None
+  return partial_sum(trips)
+
+
+def reduce_batches(builtin: str, values: Iterator[int]) -> int | None:
+  result: int | None = 0 if builtin in ("sum", "count") else None
+  while True:
+    batch: list[int] = list(itertools.islice(values, BATCH_SIZE))
+    if not batch:
+      break
+    if builtin == "sum":
+      result = accumulate(
+          ctypes.c_longlong, result, batch, ctypes.c_longlong, "+", len(batch))
+      if result is None:
+        return None
+    elif builtin == "count":
+      result += len(batch)
+    else:
+      pick = min if builtin == "min" else max
+      result = pick(batch) if result is None else pick(result, pick(batch))
+  return result if result is not None and I64_MIN <= result <= I64_MAX else None
+
+
+# NOTE: A product stays 0 after a 0, and it can only stay in an i64
+# for a few dozen values that aren't -1, 0 or 1,
+# a range of whole numbers has at most 3 of those so it is done after a few dozen values
+def range_product(values: Iterator[int]) -> int | None:
+  result: int = 1
+  for value in values:
+    result *= value
+    if not I64_MIN <= result <= I64_MAX:
+      return None
+    if result == 0:
+      return 0
+  return result
@@ -1,18 +1,57 @@
+"""
+Registry of the number types,
+everything that needs to know about a type looks it up here
+Every type has a small code, the tables are tuples indexed by it
+Codes are ordered by rank, so promotion picks the larger code:
+  u8 -> u16 -> u32 -> u64 -> i8 -> i16 -> i32 -> i64 -> f32 -> f64
+"""
 import ctypes
 from typing import Any
 
-type_map: dict[Any, str] = {
-  ctypes.c_int64: "i64",
-  ctypes.c_int32: "i32",
-  ctypes.c_int16: "i16",
-  ctypes.c_int8: "i8",
-  
-  ctypes.c_float: "f32",
-  ctypes.c_double: "f64",
+U8, U16, U32, U64, I8, I16, I32, I64, F32, F64 = range(10)
+
+TYPE_NAMES: tuple[str, ...] = (
+  "u8", "u16", "u32", "u64", "i8", "i16", "i32", "i64", "f32", "f64",
+)
+TYPE_CTYPES: tuple[Any, ...] = (
+  ctypes.c_uint8, ctypes.c_uint16, ctypes.c_uint32, ctypes.c_uint64,
+  ctypes.c_int8, ctypes.c_int16, ctypes.c_int32, ctypes.c_int64,
+  ctypes.c_float, ctypes.c_double,
+)
+# NOTE: Floats are signed, the bounds are the largest finite magnitudes
+TYPE_BOUNDS: tuple[tuple[int | float, int | float], ...] = (
+  (0, 255),
+  (0, 65_535),
+  (0, 4_294_967_295),
+  (0, 18_446_744_073_709_551_615),
+  (-128, 127),
+  (-32_768, 32_767),
+  (-2_147_483_648, 2_147_483_647),
+  (-9_223_372_036_854_775_808, 9_223_372_036_854_775_807),
+  (-3.4028234663852886e+38, 3.4028234663852886e+38),
+  (-1.7976931348623157e+308, 1.7976931348623157e+308),
+)
+TYPE_IS_FLOAT: tuple[bool, ...] = (False,) * 8 + (True,) * 2
+# NOTE: struct format of every type,
+# a value packed with it takes as many bytes as the ctypes type
+TYPE_FORMATS: tuple[str, ...] = ("B", "H", "I", "Q", "b", "h", "i", "q", "f", "d")
 
-  ctypes.c_uint8: "u8",
-  ctypes.c_uint16: "u16",
-  ctypes.c_uint32: "u32",
-  ctypes.c_uint64: "u64",
+# NOTE: Type with the larger rank, PROMOTED[code][other code]
+PROMOTED: tuple[tuple[int, ...], ...] = tuple(
+  tuple(max(code, other) for other in range(10)) for code in range(10))
+
+# NOTE: ctypes class -> code, c_longlong and c_ulonglong are the same class
+# as c_int64 and c_uint64 on some platforms only
+TYPE_CODES: dict[Any, int] = {
+  ctypes.c_longlong: I64,
+  ctypes.c_ulonglong: U64,
+  **{ctype: code for code, ctype in enumerate(TYPE_CTYPES)},
+}
+NAME_CODES: dict[str, int] = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+type_map: dict[Any, str] = {
+  ctype: TYPE_NAMES[code] for ctype, code in TYPE_CODES.items()
+}
+inverse_type_map: dict[str, Any] = {
+  name: TYPE_CTYPES[code] for name, code in NAME_CODES.items()
 }
-inverse_type_map: dict[str, Any] = {v: k for k, v in type_map.items()}
\ No newline at end of file
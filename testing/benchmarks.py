@@ -0,0 +1,517 @@
+# NOTE: Run benchmarks using uv run py -m testing.benchmarks [name ...]
+import contextlib
+import ctypes
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+import backend.SHELL as shell
+from backend.INTERPRETER import Interpreter
+from middle_end.ERRORS import RTResult
+from runtime.buffer import filled_array
+from runtime.kernels import BOUNDS, to_type
+from runtime.number import RuntimeNumber
+from runtime.profile import BranchProfile
+from runtime.typemap import type_map
+
+shell.dbg_parse = False  # NOTE: Don't write the ast file on every run
+
+
+# NOTE: Every run starts with only the builtins defined, like running a fresh file
+def reset_globals() -> None:
+  shell.global_symbol_table = shell.new_symbol_table()
+
+
+# NOTE: Best time out of a few runs, the optimizer runs inside run() so it is included
+def time_run(code: str, opt_level: int = 2, repeat: int = 3) -> float:
+  shell.opt_level = opt_level
+  best: float = float("inf")
+  for _ in range(repeat):
+    reset_globals()
+    start: float = time.perf_counter()
+    result = shell.run("<bench>", code)
+    best = min(best, time.perf_counter() - start)
+    if getattr(result, "error", None):
+      raise RuntimeError(repr(result.error))
+  shell.opt_level = 2
+  return best
+
+
+def compare(name: str, code: str) -> None:
+  unoptimized: float = time_run(code, opt_level=0)
+  optimized: float = time_run(code, opt_level=2)
+  print(f"{name:<28} -O0 {unoptimized * 1000:9.2f}ms   "
+        f"-O2 {optimized * 1000:9.2f}ms   x{unoptimized / optimized:.2f}")
+
+
+# NOTE: Generated config style code, lots of cases that are constant once folded
+def branch_heavy_program(cases: int = 40, iterations: int = 300) -> str:
+  lines: list[str] = [
+      "i64 x = 0;", "u8 const debug = 0;", f"for i in 0...{iterations} step 1 {{"]
+  for case in range(cases):
+    lines.append(f"  if debug == 1 {{ incr x by 1; }} "
+                 f"elif {case} == {case + 1} {{ incr x by 2; }}"
+                 f" also cap {{ incr x by 3; }} elif nocap {{ incr x by 1; }}"
+                 f" idk {{ incr x by 5; }};")
+    lines.append(f"  vibecheck false {{ incr x by 7; }};")
+    lines.append(f"  while {case} > {case + 1} {{ incr x by 9; }};")
+  lines.append("};")
+  lines.append("x;")
+  return "\n".join(lines)
+
+
+def bench_branches() -> None:
+  compare("branches 10 cases", branch_heavy_program(cases=10))
+  compare("branches 40 cases", branch_heavy_program(cases=40))
+
+
+# NOTE: The loop condition and the body recompute expressions
+# of variables the loop never writes
+def invariant_heavy_program(iterations: int = 2000) -> str:
+  return "\n".join([
+    "i64 n = 40; i64 m = 50; i64 k = 0; i64 s = 0;",
+    f"while k < n * m - {40 * 50 - iterations} {{",
+    "  k++;",
+    "  i64 t = (n * m + n) * (m - n) + (n * n - m);",
+    "  for j in 0...3 step 1 { incr s by 1; i64 u = (n + m) * (n - m) * j; };",
+    "};",
+    "s;",
+  ])
+
+
+def bench_invariants() -> None:
+  compare("loop invariants 2000 iters", invariant_heavy_program())
+
+
+def affine_program(iterations: int = 20000) -> str:
+  return (f"i64 x = 0; i32 y = 0; for i in 0...{iterations} step 1 "
+          f"{{ incr x by 3; decr y by 1; y++; }}; x; y;")
+
+
+def bench_affine() -> None:
+  compare("affine loop 20000 iters", affine_program())
+
+
+# NOTE: Sums of expressions of the loop variable, -O2 runs them in batches
+def reduction_program(iterations: int = 20000) -> str:
+  return (f"i64 total = 0; f64 half = 0.0; i64 k = 3; "
+          f"for i in 0...{iterations} step 1 "
+          f"{{ incr total by (i * i + k); incr half by (i * 0.5); }}; total; half;")
+
+
+def bench_reductions() -> None:
+  compare("reduction 20000 iters", reduction_program())
+
+
+# NOTE: Straight line code that repeats the same expressions between writes
+def repeated_expr_program(iterations: int = 1500) -> str:
+  return "\n".join([
+    "i64 a = 7; i64 b = 3; i64 s = 0;",
+    f"for i in 0...{iterations} step 1 {{",
+    "  i64 p = (a * i + b) * (a - b);",
+    "  i64 q = (a * i + b) * (a - b) + (a * i + b);",
+    "  incr s by ((a * i + b) * (a - b) - q);",
+    "  b++;",
+    "  i64 r = (a * i + b) * (a - b);",
+    "};",
+    "s;",
+  ])
+
+
+def bench_cse() -> None:
+  compare("repeated exprs 1500 iters", repeated_expr_program())
+
+
+# NOTE: A state machine that walks through every state,
+# so each case of the chain gets taken
+def state_machine_program(states: int = 200, iterations: int = 2000) -> str:
+  lines: list[str] = [
+      "i64 state = 0; i64 x = 0;", f"for i in 0...{iterations} step 1 {{"]
+  cases: list[str] = [
+      f"state == {state} {{ incr x by {state}; i64 state = {state + 1}; }}"
+      for state in range(states)]
+  lines.append("  if " + " elif ".join(cases) + " idk { i64 state = 0; };")
+  lines.append("};")
+  lines.append("x;")
+  return "\n".join(lines)
+
+
+def bench_jump_tables() -> None:
+  compare("state machine 20 states", state_machine_program(states=20))
+  compare("state machine 200 states", state_machine_program(states=200))
+
+
+# NOTE: The cheap tests that usually decide come last,
+# so every iteration runs the whole chain without a profile
+def skewed_conditions_program(iterations: int = 3000) -> str:
+  return "\n".join([
+    "i64 s = 0; i64 k = 0;",
+    f"for i in 0...{iterations} step 1 {{",
+    "  i64 k = i - (i / 4) * 4;",
+    "  if (i > 5) && (i < 100000) && (i != 17) && (k == 3) { incr s by 1; };",
+    "  if k == 7 { incr s by 2; } elif k == 5 { incr s by 3; } "
+    "elif k == 1 { incr s by 4; };",
+    "  if (k == 9) || (i < 0) || (k != 3) { incr s by 1; };",
+    "};",
+    "s;",
+  ])
+
+
+def bench_profile() -> None:
+  code: str = skewed_conditions_program()
+  without: float = time_run(code, opt_level=2)
+  shell.branch_profile = BranchProfile()
+  time_run(code, opt_level=2, repeat=1)
+  with_profile: float = time_run(code, opt_level=2)
+  shell.branch_profile = None
+  print(f"{'skewed conditions':<28} -O2 {without * 1000:9.2f}ms   "
+        f"-O2 profiled {with_profile * 1000:9.2f}ms   x{without / with_profile:.2f}")
+
+
+# NOTE: The work `+` does on the values with each representation,
+# the old one made a new ctypes instance per result
+def boxed_adds(type_: Any, count: int) -> None:
+  min_, max_ = BOUNDS[type_]
+  total, step = type_(0), type_(1)
+  for _ in range(count):
+    value = total.value + step.value
+    if not min_ <= value <= max_:
+      raise OverflowError
+    total = type_(value)
+
+
+def unboxed_adds(type_: Any, count: int) -> None:
+  min_, max_ = BOUNDS[type_]
+  total, step = to_type(type_, 0), to_type(type_, 1)
+  for _ in range(count):
+    value = total + step
+    if not min_ <= value <= max_:
+      raise OverflowError
+    total = to_type(type_, value)
+
+
+def runtime_adds(type_: Any, count: int) -> None:
+  total: RuntimeNumber = RuntimeNumber(to_type(type_, 0), type_)
+  step: RuntimeNumber = RuntimeNumber(to_type(type_, 1), type_)
+  for _ in range(count):
+    total, _ = total.added_to(step, type_)
+
+
+def bench_values(count: int = 200_000) -> None:
+  for type_ in (ctypes.c_int64, ctypes.c_float):
+    representations: tuple = (
+        ("ctypes", boxed_adds),
+        ("plain", unboxed_adds),
+        ("RuntimeNumber", runtime_adds),
+    )
+    for name, adds in representations:
+      start: float = time.perf_counter()
+      adds(type_, count)
+      elapsed: float = time.perf_counter() - start
+      label: str = f"{type_map[type_]} adds, {name}"
+      print(f"{label:<28} {count / elapsed / 1e6:6.2f}M ops/s")
+
+
+# NOTE: Time per operation for every pair of types,
+# rows are the left type and columns the right type
+def bench_kernels(count: int = 20_000) -> None:
+  types: list[Any] = list(type_map)
+  for operation in ("+", "<", "&&"):
+    print(f"`{operation}` ns/op " + "".join(f"{type_map[right]:>7}" for right in types))
+    for left_type in types:
+      row: str = ""
+      for right_type in types:
+        left: RuntimeNumber = RuntimeNumber(to_type(left_type, 3), left_type)
+        right: RuntimeNumber = RuntimeNumber(to_type(right_type, 2), right_type)
+        start: float = time.perf_counter()
+        for _ in range(count):
+          left.apply(right, operation)
+        row += f"{(time.perf_counter() - start) / count * 1e9:7.0f}"
+      print(f"{type_map[left_type]:>12} " + row)
+
+
+# NOTE: Reads of the same few variables,
+# the values stay small so results come from the small number cache
+def read_heavy_program(iterations: int = 2000) -> str:
+  return "\n".join([
+    "i64 a = 3; i64 b = 4; i64 c = 0; u8 flag = 1;",
+    f"for i in 0...{iterations} step 1 {{",
+    "  i64 t = a * b - a - b + flag;",
+    "  if flag && t > a { incr c by 1; };",
+    "  if c > 200 { decr c by (200); };",
+    "};",
+    "c;",
+  ])
+
+
+# NOTE: Numbers made while a program runs, against the number of variable reads in it
+def count_allocations(code: str) -> tuple[int, int]:
+  counts: list[int] = [0, 0]
+  init: Callable = RuntimeNumber.__init__
+  visit_var_access: Callable = Interpreter.visit_VarAccess
+
+  def counting_init(self, value, type_) -> None:
+    counts[0] += 1
+    init(self, value, type_)
+
+  def counting_visit(self, node, context):
+    counts[1] += 1
+    return visit_var_access(self, node, context)
+
+  RuntimeNumber.__init__ = counting_init
+  Interpreter.visit_VarAccess = counting_visit
+  try:
+    time_run(code, opt_level=0, repeat=1)
+  finally:
+    RuntimeNumber.__init__ = init
+    Interpreter.visit_VarAccess = visit_var_access
+  return counts[0], counts[1]
+
+
+def bench_reads() -> None:
+  code: str = read_heavy_program()
+  compare("variable reads", code)
+  made, reads = count_allocations(code)
+  print(f"{'variable reads':<28} {made} numbers made for {reads} reads at -O0")
+
+
+# NOTE: Objects of a class made while a program runs,
+# like RTResult for every visited node
+def count_made(code: str, cls: type, opt_level: int = 0) -> int:
+  made: list[int] = [0]
+  init: Callable = cls.__init__
+
+  def counting_init(self, *args, **kwargs) -> None:
+    made[0] += 1
+    init(self, *args, **kwargs)
+
+  cls.__init__ = counting_init
+  try:
+    time_run(code, opt_level=opt_level, repeat=1)
+  finally:
+    cls.__init__ = init
+  return made[0]
+
+
+def bench_loops() -> None:
+  programs: dict[str, str] = {
+    "loop invariants 2000 iters": invariant_heavy_program(),
+    "repeated exprs 1500 iters": repeated_expr_program(),
+    "state machine 200 states": state_machine_program(states=200),
+  }
+  for name, code in programs.items():
+    compare(name, code)
+    print(f"{name:<28} {count_made(code, RTResult, 0)} RTResults made at -O0, "
+          f"{count_made(code, RTResult, 2)} at -O2")
+
+
+# NOTE: At -O2 the affine pass runs an empty loop in O(1),
+# so the empty loop is timed at -O0
+def counted_loop_programs(iterations: int = 200_000) -> dict[str, tuple[str, int]]:
+  return {
+    "empty body -O0": (f"for i in 0...{iterations} step 1 {{ }};", 0),
+    "one statement -O2": (f"i64 s = 0; for i in 0...{iterations} step 1 "
+                          f"{{ incr s by (i); }};", 2),
+  }
+
+
+def bench_counted_loops(iterations: int = 200_000) -> None:
+  for name, (code, opt_level) in counted_loop_programs(iterations).items():
+    seconds: float = time_run(code, opt_level=opt_level)
+    print(f"{name:<28} {seconds * 1e9 / iterations:8.1f}ns per iteration")
+
+
+# NOTE: Enough work in every iteration
+# that the chunks outweigh starting the worker processes
+def parallel_program(iterations: int = 40000) -> str:
+  return (f"i64 total = 0; "
+          f"par for i in 0...{iterations} step 1 reduce(total: +) {{ "
+          f"i64 x = i * 7 + 3; i64 y = x * x - i; "
+          f"incr total by (y / 5 + x * 2 - y / 3); }}; total;")
+
+
+def bench_parallel() -> None:
+  cores: int = os.cpu_count() or 1
+  counts: list[int] = sorted(
+      {1, cores} | {2**power for power in range(8) if 2**power <= cores})
+  code: str = parallel_program()
+  single: float = 0.0
+  for count in counts:
+    shell.workers = count
+    seconds: float = time_run(code)
+    single = single or seconds
+    print(f"par for with {count:>2} workers     {seconds * 1000:9.2f}ms   "
+          f"x{single / seconds:.2f}")
+  shell.workers = cores
+
+
+# NOTE: Top-level loops that each only touch their own variables,
+# then one statement that needs all of them
+# Every loop has its own counter,
+# loops that share one depend on each other since the last one leaves its value
+def independent_loops_program(loops: int = 4, iterations: int = 20000) -> str:
+  code: str = ""
+  for loop in range(loops):
+    code += (f"i64 s{loop} = 0; for i{loop} in 0...{iterations} step 1 {{ "
+             f"if i{loop} > {loop} {{ "
+             f"incr s{loop} by (i{loop} * {loop + 2} - i{loop} / 3); }}; }}; ")
+  total: str = " + ".join(f"s{loop}" for loop in range(loops))
+  return code + f"i64 total = {total}; total;"
+
+
+def bench_schedule() -> None:
+  cores: int = os.cpu_count() or 1
+  counts: list[int] = sorted(
+      {1, cores} | {2**power for power in range(8) if 2**power <= cores})
+  code: str = independent_loops_program()
+  in_order: float = time_run(code)
+  print(f"in order                     {in_order * 1000:9.2f}ms")
+  shell.schedule = True
+  for count in counts:
+    shell.workers = count
+    # NOTE: The shell prints a report after every run, the one of the last run is shown
+    output: io.StringIO = io.StringIO()
+    with contextlib.redirect_stdout(output):
+      seconds: float = time_run(code)
+    print(f"scheduled with {count:>2} workers  {seconds * 1000:9.2f}ms   "
+          f"x{in_order / seconds:.2f}")
+    print(f"  {output.getvalue().splitlines()[-1]}")
+  shell.schedule = False
+  shell.workers = cores
+
+
+# NOTE: Many small programs in one process,
+# each in its own fork of the builtins so none sees another's variables
+def bench_isolation(programs: int = 2000) -> None:
+  code: str = "i64 a = 3; i64 b = a * 4; if b > a { incr a by 1; }; a;"
+  start: float = time.perf_counter()
+  for _ in range(programs):
+    shell.new_symbol_table()
+  forks: float = time.perf_counter() - start
+  print(f"{'fork the builtins':<28} {forks / programs * 1e6:8.2f}us per fork")
+  tables: tuple = (
+      ("shared table", lambda: shell.global_symbol_table),
+      ("fork per program", shell.new_symbol_table),
+  )
+  for name, make_table in tables:
+    reset_globals()
+    start = time.perf_counter()
+    for _ in range(programs):
+      result = shell.run("<bench>", code, make_table())
+      if getattr(result, "error", None):
+        raise RuntimeError(repr(result.error))
+    elapsed: float = time.perf_counter() - start
+    print(f"{name:<28} {programs / elapsed:8.0f} programs/s")
+
+
+# NOTE: Bytes of one array against one RuntimeNumber per element,
+# then how fast a loop writes the elements
+def bench_arrays(length: int = 1_000_000, iterations: int = 20000) -> None:
+  for type_ in (ctypes.c_uint8, ctypes.c_double):
+    packed: int = sys.getsizeof(filled_array(type_, 0, length).data)
+    boxed: list[RuntimeNumber] = [
+        RuntimeNumber(to_type(type_, index), type_) for index in range(length)]
+    boxes: int = sys.getsizeof(boxed) + sum(
+        sys.getsizeof(number) + sys.getsizeof(number.value) for number in boxed)
+    label: str = f"{length} {type_map[type_]} elements"
+    print(f"{label:<28} array {packed / 1e6:7.2f}MB   "
+          f"RuntimeNumbers {boxes / 1e6:7.2f}MB   x{boxes / packed:.1f}")
+  elapsed: float = time_run(f"u16[{iterations}] buf = 0; "
+                            f"for i in 0...{iterations - 1} step 1 {{ buf[i] = i; }};")
+  print(f"{'u16 element writes':<28} {iterations / elapsed / 1e3:8.0f}K writes/s")
+
+
+# NOTE: Mapping takes the same time for every file size,
+# only the elements a program reads come from the file
+def bench_mapped(sizes: tuple[int, ...] = (1, 64, 512)) -> None:
+  with tempfile.TemporaryDirectory() as directory:
+    for megabytes in sizes:
+      path: str = os.path.join(directory, f"{megabytes}.bin")
+      with open(path, "wb") as f:
+        f.truncate(megabytes * 1_000_000)
+      elapsed: float = time_run(
+          f"i32[] data = mmap(`{path}`); i64 n = len(data); data[n - 1];")
+      print(f"{f'map {megabytes}MB':<28} {elapsed * 1000:9.2f}ms")
+
+
+# NOTE: n is a variable
+# so constant folding doesn't compute the builtins before timing them
+def bench_ranges(iterations: int = 200_000) -> None:
+  programs: dict[str, str] = {
+    "sum loop -O0": (f"i64 n = {iterations}; i64 s = 0; "
+                     f"for i in 0...n step 1 {{ incr s by (i); }};"),
+    "sum(0...n step 1)": f"i64 n = {iterations}; i64 s = sum(0...n step 1);",
+    "min(0...n step k), f64 k": (f"i64 n = {iterations}; f64 k = 1; "
+                                 f"i64 s = min(0...n step k);"),
+  }
+  for name, code in programs.items():
+    elapsed: float = time_run(code, opt_level=0)
+    print(f"{name:<28} {elapsed * 1000:9.2f}ms for {iterations} values")
+
+
+# NOTE: Counts the operators the interpreter ran with and without their range check
+def count_checks(code: str) -> tuple[int, int]:
+  counts: list[int] = [0, 0]
+  visits: dict[str, Callable] = {name: getattr(Interpreter, name)
+                                 for name in ("visit_BinOp", "visit_UnaryOp")}
+
+  def counting(visit: Callable) -> Callable:
+    def counting_visit(self, node, context):
+      counts[0 if node.checked else 1] += 1
+      return visit(self, node, context)
+    return counting_visit
+
+  for name, visit in visits.items():
+    setattr(Interpreter, name, counting(visit))
+  try:
+    time_run(code, opt_level=2, repeat=1)
+  finally:
+    for name, visit in visits.items():
+      setattr(Interpreter, name, visit)
+  return counts[0], counts[1]
+
+
+def bench_checks() -> None:
+  programs: dict[str, str] = {
+    "branches": branch_heavy_program(cases=10),
+    "invariants": invariant_heavy_program(),
+    "affine": affine_program(),
+    "repeated exprs": repeated_expr_program(),
+  }
+  for name, code in programs.items():
+    checked, unchecked = count_checks(code)
+    total: int = checked + unchecked
+    share: float = unchecked / max(total, 1)
+    print(f"{name:<28} {unchecked} of {total} operator range checks eliminated "
+          f"({share:.0%})")
+
+
+BENCHMARKS: dict[str, Callable[[], None]] = {
+  "branches": bench_branches,
+  "invariants": bench_invariants,
+  "affine": bench_affine,
+  "cse": bench_cse,
+  "reduction": bench_reductions,
+  "jumptable": bench_jump_tables,
+  "profile": bench_profile,
+  "values": bench_values,
+  "kernels": bench_kernels,
+  "reads": bench_reads,
+  "loops": bench_loops,
+  "counted": bench_counted_loops,
+  "isolation": bench_isolation,
+  "parallel": bench_parallel,
+  "schedule": bench_schedule,
+  "arrays": bench_arrays,
+  "mapped": bench_mapped,
+  "ranges": bench_ranges,
+  "checks": bench_checks,
+}
+
+if __name__ == "__main__":
+  names: list[str] = sys.argv[1:] or list(BENCHMARKS)
+  for name in names:
+    BENCHMARKS[name]()
@@ -0,0 +1,166 @@
+# NOTE: Run using uv run py -m testing.differential [programs] [seed]
+"""
+Runs random programs at -O0, -O1 and -O2 and compares what they give
+  - the values of the top-level statements, or the error and where it is
+  - the value of every variable after the run
+Every pass has to keep the runtime's rules, so the three levels have to agree
+Programs use small values next to the bounds of their types,
+so overflow, division by zero and out of bounds indexes come up often
+"""
+import random
+import sys
+from typing import Any
+
+import backend.SHELL as shell
+from backend.INTERPRETER import SymbolTable
+
+shell.dbg_parse = False  # NOTE: Don't write the ast file on every run
+
+OPT_LEVELS: tuple[int, ...] = (0, 1, 2)
+WHOLE_TYPES: tuple[str, ...] = ("u8", "u16", "i8", "i16", "i32", "i64")
+DECIMAL_TYPES: tuple[str, ...] = ("f32", "f64")
+OPERATORS: tuple[str, ...] = (
+    "+", "-", "*", "/", "==", "!=", "<", ">", "<=", ">=", "&&", "||")
+# NOTE: Values at the edges of the types, the rest are small
+EDGE_VALUES: tuple[int, ...] = (127, 128, 255, 256, 32767, 65535, 100000, 2147483647)
+WHOLE_VARS: tuple[str, ...] = ("a", "b", "c", "d")
+DECIMAL_VARS: tuple[str, ...] = ("f", "g")
+
+
+"""
+Makes random programs that parse and type check,
+the same seed always gives the same programs
+"""
+class ProgramGenerator:
+  def __init__(self, seed: int) -> None:
+    self.random = random.Random(seed)
+
+  def literal(self, decimal: bool = False) -> str:
+    roll: float = self.random.random()
+    if decimal and roll < 0.5:
+      return f"{self.random.randint(0, 9)}.{self.random.randint(1, 9)}"
+    if roll < 0.1:
+      return str(self.random.choice(EDGE_VALUES))
+    return str(self.random.randint(0, 20))
+
+  def expr(self, depth: int = 0, decimal: bool = False) -> str:
+    if depth > 2 or self.random.random() < 0.3:
+      names: tuple[str, ...] = WHOLE_VARS + (DECIMAL_VARS if decimal else ())
+      return self.random.choice(names + (self.literal(decimal),))
+    if self.random.random() < 0.1:
+      return f"-({self.expr(depth + 1, decimal)})"
+    operator: str = self.random.choice(OPERATORS)
+    left: str = self.expr(depth + 1, decimal)
+    return f"({left} {operator} {self.expr(depth + 1, decimal)})"
+
+  # NOTE: buf has 5 elements, so 5 is out of bounds
+  def index(self, in_loop: bool) -> str:
+    if in_loop and self.random.random() < 0.5:
+      return "i"
+    return str(self.random.randint(0, 5))
+
+  def range_(self) -> str:
+    return f"0...{self.random.randint(0, 4)} step 1"
+
+  def stmt(self, depth: int = 0, in_loop: bool = False) -> str:
+    roll: float = self.random.random()
+    var: str = self.random.choice(WHOLE_VARS)
+    if roll < 0.25:
+      return f"{self.random.choice(WHOLE_TYPES)} {var} = {self.expr()};"
+    if roll < 0.35:
+      type_: str = self.random.choice(DECIMAL_TYPES)
+      return f"{type_} {self.random.choice(DECIMAL_VARS)} = {self.expr(0, True)};"
+    if roll < 0.42:
+      return f"{var}++;"
+    if roll < 0.5:
+      return f"incr {var} by ({self.expr()});"
+    if roll < 0.55:
+      return f"decr {var} by ({self.expr()});"
+    if roll < 0.6:
+      return f"buf[{self.index(in_loop)}] = {self.expr()};"
+    if roll < 0.64:
+      builtin: str = self.random.choice(("sum", "product", "count", "min", "max"))
+      return f"i64 {var} = {builtin}({self.range_()});"
+    if roll < 0.74 and depth < 2:
+      first, second = self.stmt(depth + 1, in_loop), self.stmt(depth + 1, in_loop)
+      return (f"if {self.expr()} {{ {first} {second} }} "
+              f"idk {{ {self.stmt(depth + 1, in_loop)} }};")
+    if roll < 0.84 and depth < 2:
+      first, second = self.stmt(depth + 1, True), self.stmt(depth + 1, True)
+      return f"for i in {self.range_()} {{ {first} {second} }};"
+    if roll < 0.88:
+      return f"buf[{self.index(in_loop)}];"
+    return f"{self.expr(0, self.random.random() < 0.5)};"
+
+  def program(self, statements: int = 6) -> str:
+    lines: list[str] = [
+        f"{self.random.choice(WHOLE_TYPES)} {var} = {self.literal()};"
+        for var in WHOLE_VARS]
+    lines += [f"{self.random.choice(DECIMAL_TYPES)} {var} = {self.literal(True)};"
+              for var in DECIMAL_VARS]
+    lines.append(f"{self.random.choice(WHOLE_TYPES)}[5] buf = {self.literal()};")
+    lines += [self.stmt() for _ in range(statements)]
+    return " ".join(lines)
+
+
+def flatten(value: Any, out: list[str]) -> list[str]:
+  if isinstance(value, list):
+    for item in value:
+      flatten(item, out)
+  elif value is not None:
+    out.append(repr(value))
+  return out
+
+
+# NOTE: What a program gave at one level, the output and the variables it left
+def run_at(code: str, opt_level: int) -> tuple[str, dict[str, str]]:
+  shell.opt_level = opt_level
+  table: SymbolTable = shell.new_symbol_table()
+  result = shell.run("<differential>", code, table)
+  # NOTE: Lexer errors are returned as they are, the other stages return a result
+  error = getattr(result, "error", result)
+  if error:
+    start = error.pos_start
+    output: str = (f"{error.error_name}: {error.details} "
+                   f"at line {start.line_num}, col {start.col_num + 1}")
+  else:
+    output = " ".join(flatten(result.value, []))
+  # NOTE: The resolver gives a slot to every name it sees,
+  # a variable whose declaration never ran keeps None in it
+  variables: dict[str, str] = {
+      name: repr(table.get(name)) for name in sorted(table.slots)
+      if name not in shell.BUILTIN_CONSTANTS and table.get(name) is not None}
+  return output, variables
+
+
+# NOTE: Gives the outcome of every level when they don't all agree, else None
+def check(code: str) -> list[tuple[str, dict[str, str]]] | None:
+  outcomes: list[tuple[str, dict[str, str]]] = [
+      run_at(code, opt_level) for opt_level in OPT_LEVELS]
+  if all(outcome == outcomes[0] for outcome in outcomes[1:]):
+    return None
+  return outcomes
+
+
+def run_differential(programs: int = 500, seed: int = 0) -> int:
+  generator: ProgramGenerator = ProgramGenerator(seed)
+  differ: int = 0
+  for _ in range(programs):
+    code: str = generator.program()
+    outcomes: list[tuple[str, dict[str, str]]] | None = check(code)
+    if outcomes is None:
+      continue
+    differ += 1
+    print(code)
+    for opt_level, (output, variables) in zip(OPT_LEVELS, outcomes):
+      print(f"  -O{opt_level} {output} {variables}")
+  shell.opt_level = 2
+  print(f"{programs} programs, {differ} differ between "
+        f"{', '.join(f'-O{opt_level}' for opt_level in OPT_LEVELS)}")
+  return differ
+
+
+if __name__ == "__main__":
+  programs: int = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+  seed: int = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+  sys.exit(1 if run_differential(programs, seed) else 0)
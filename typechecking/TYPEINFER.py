@@ -0,0 +1,268 @@
+import ctypes
+from typing import Any
+
+from frontend.TOKENS import TT
+from middle_end.AST import (
+  ArrayAssign, ArrayLength,
+  ArrayLiteral, BinOp,
+  ForExpr, IfExpr,
+  IndexAccess, IndexAssign,
+  MappedFile, Number,
+  RangeBuiltin, UnaryOp,
+  VarAccess, VarAssign,
+  WhileStmt,
+)
+from middle_end.ERRORS import TypeError_
+from middle_end.TRANSFORMER import (
+  NodeTransformer, OptReport,
+  PassResult, count_nodes,
+  iter_children,
+)
+from runtime.buffer import ArrayType, narrowest_type
+from runtime.kernels import DECIMAL_TYPES
+from runtime.typemap import inverse_type_map
+from typechecking.TYPECHECKER import TypeChecker
+
+tpchecker: TypeChecker = TypeChecker()
+
+# NOTE: Variable name -> type of its value,
+# None when it depends on which path the program took
+# An array variable has an ArrayType of its element type
+Env = dict[str, Any]
+
+
+def join_envs(first: Env, second: Env) -> Env:
+  joined: Env = dict(first)
+  for name, type_ in second.items():
+    if name not in joined:
+      joined[name] = type_
+    elif joined[name] != type_:
+      joined[name] = None
+  return joined
+
+
+def type_of(node) -> Any:
+  if isinstance(node, Number):
+    return node.type_
+  return getattr(node, "result_type", None)
+
+
+"""
+Type inference, follows the same promotion the runtime does (u8 -> ... -> f64):
+  - Every BinOp, UnaryOp, VarAccess, Increment and Decrement gets a result_type,
+    range builtins give an i64
+  - A variable has the type of the value it was last given,
+    after an if or a loop it is only known if every path agrees
+  - A decimal value given to a whole number type is a TypeError,
+    reported before the program runs
+  - Reading an array like a number, indexing a number and decimal indices are TypeErrors
+The interpreter passes result_type to the operators
+so they don't promote on every operation
+"""
+class TypeInferencer(NodeTransformer):
+  def __init__(self, var_types: Env | None = None) -> None:
+    super().__init__()
+    self.env: Env = dict(var_types or {})
+
+  def optimize(self, ast: list, report: OptReport | None = None) -> PassResult:
+    nodes_before: int = count_nodes(ast)
+    res = self.run(ast)
+    if report is not None and not res.error:
+      typed, untyped = count_typed(res.node)
+      report.add("typeinfer", nodes_before, count_nodes(res.node),
+                 typed_ops=typed, untyped_ops=untyped)
+    return res
+
+  def visit_Number(self, node: Number) -> Any:
+    if isinstance(node.token.value, float):
+      error = tpchecker.check_type(node, node.type_, ctypes.c_double)
+      if error:
+        return self.fail(error, node)
+    return node
+
+  def visit_VarAccess(self, node: VarAccess) -> Any:
+    node.result_type = self.env.get(node.var_name_token.value)
+    if isinstance(node.result_type, ArrayType):
+      name: str = node.var_name_token.value
+      node.result_type = None
+      return self.fail(TypeError_(node.pos_start, node.pos_end,
+                                  f"`{name}` is an array, use `{name}[index]`"), node)
+    return node
+
+  # NOTE: The element type of the array, None when it isn't known
+  def element_type(self, node: IndexAccess | ArrayLength) -> Any:
+    type_: Any = self.env.get(node.var_name_token.value)
+    if type_ is not None and not isinstance(type_, ArrayType):
+      self.fail(TypeError_(node.pos_start, node.pos_end,
+                           f"`{node.var_name_token.value}` is not an array"), node)
+      return None
+    return type_.type_ if type_ is not None else None
+
+  def visit_IndexAccess(self, node: IndexAccess) -> Any:
+    node.index = self.visit(node.index)
+    if type_of(node.index) in DECIMAL_TYPES:
+      return self.fail(TypeError_(
+          node.index.pos_start, node.index.pos_end, "An index is a whole number"), node)
+    node.result_type = self.element_type(node)
+    return node
+
+  def visit_ArrayLength(self, node: ArrayLength) -> Any:
+    self.element_type(node)
+    node.result_type = ctypes.c_longlong
+    return node
+
+  def visit_RangeBuiltin(self, node: RangeBuiltin) -> Any:
+    node = self.generic_visit(node)
+    node.result_type = ctypes.c_longlong
+    return node
+
+  def visit_IndexAssign(self, node: IndexAssign) -> Any:
+    node.target = self.visit(node.target)
+    node.value_node = self.visit(node.value_node)
+    value_type: Any = type_of(node.value_node)
+    if node.target.result_type is not None and value_type is not None:
+      error = tpchecker.check_type(node.value_node, node.target.result_type, value_type)
+      if error:
+        return self.fail(error, node)
+    return node
+
+  def visit_ArrayAssign(self, node: ArrayAssign) -> Any:
+    node.length = self.visit(node.length)
+    if node.length is not None and type_of(node.length) in DECIMAL_TYPES:
+      return self.fail(TypeError_(
+          node.length.pos_start, node.length.pos_end,
+          "The length of an array is a whole number"), node)
+    node.value_node = self.visit(node.value_node)
+    literal: bool = isinstance(node.value_node, ArrayLiteral)
+    values: list = node.value_node.elements if literal else [node.value_node]
+    type_: Any = node.type_
+    if type_ is None:
+      # NOTE: The values pick the type when the declaration runs,
+      # it is only known here when they are all literals
+      if all(isinstance(value, Number) for value in values):
+        type_ = narrowest_type([value.token.value for value in values])
+    else:
+      for value in values:
+        value_type: Any = type_of(value)
+        error = None
+        if value_type is not None:
+          error = tpchecker.check_type(value, type_, value_type)
+        if error:
+          return self.fail(error, node)
+    self.env[node.var_name_token.value] = None if type_ is None else ArrayType(type_)
+    return node
+
+  def visit_MappedFile(self, node: MappedFile) -> Any:
+    node.offset = self.visit(node.offset)
+    if node.offset is not None and type_of(node.offset) in DECIMAL_TYPES:
+      return self.fail(TypeError_(
+          node.offset.pos_start, node.offset.pos_end,
+          "The offset of a mapped file is a whole number of bytes"), node)
+    return node
+
+  def visit_VarAssign(self, node: VarAssign) -> Any:
+    node.value_node = self.visit(node.value_node)
+    value_type: Any = type_of(node.value_node)
+    # NOTE: The parser only turns the declared type into a ctype
+    # when the value is a literal
+    declared: Any = node.type_
+    if isinstance(node.type_, str):
+      declared = inverse_type_map.get(node.type_)
+    if declared is not None and value_type is not None:
+      error = tpchecker.check_type(node.value_node, declared, value_type)
+      if error:
+        return self.fail(error, node)
+    self.env[node.var_name_token.value] = value_type
+    return node
+
+  def visit_BinOp(self, node: BinOp) -> Any:
+    node.left_node = self.visit(node.left_node)
+    node.right_node = self.visit(node.right_node)
+    left: Any = type_of(node.left_node)
+    right: Any = type_of(node.right_node)
+    node.result_type = None
+    if left is not None and right is not None:
+      node.result_type = tpchecker.promote_type(left, right)
+    return node
+
+  def visit_UnaryOp(self, node: UnaryOp) -> Any:
+    node.node = self.visit(node.node)
+    operand: Any = type_of(node.node)
+    if operand is not None and node.op_tok.type == TT.MINUS:
+      # NOTE: Negation multiplies by an i16 -1
+      operand = tpchecker.promote_type(operand, ctypes.c_int16)
+    node.result_type = operand
+    return node
+
+  # NOTE: Updates keep the type of the variable, or of the element they update
+  def visit_update(self, node) -> Any:
+    if isinstance(node.value, IndexAccess):
+      node.value = self.visit(node.value)
+      type_: Any = node.value.result_type
+    else:
+      type_ = self.env.get(node.value.var_name_token.value)
+      if isinstance(type_, ArrayType):
+        name: str = node.value.var_name_token.value
+        return self.fail(TypeError_(node.pos_start, node.pos_end,
+                                    f"`{name}` is an array, use `{name}[index]`"), node)
+    if hasattr(node, "amount"):
+      node.amount = self.visit(node.amount)
+    if hasattr(node, "result_type"):
+      node.result_type = type_
+    return node
+
+  visit_Increment = visit_update
+  visit_Decrement = visit_update
+  visit_IncrementBy = visit_update
+  visit_DecrementBy = visit_update
+  visit_MultiplyBy = visit_update
+  visit_DivideBy = visit_update
+
+  def visit_IfExpr(self, node: IfExpr) -> Any:
+    outcomes: list[Env] = []
+    for condition, body in node.cases:
+      self.visit(condition)
+      entry: Env = dict(self.env)
+      self.visit_block(body)
+      outcomes.append(self.env)
+      self.env = entry
+    if node.else_case is not None:
+      self.visit_block(node.else_case)
+    outcomes.append(self.env)
+    self.env = outcomes[0]
+    for outcome in outcomes[1:]:
+      self.env = join_envs(self.env, outcome)
+    return node
+
+  # NOTE: The body can run any number of times,
+  # so it is visited until the types going into it stop changing
+  def visit_loop(self, node, loop_var: str | None) -> None:
+    while not self.error:
+      entry: Env = dict(self.env)
+      if isinstance(node, WhileStmt):
+        self.visit(node.condition)
+      if loop_var is not None:
+        self.env[loop_var] = ctypes.c_longlong
+      self.visit_block(node.block)
+      self.env = join_envs(entry, self.env)
+      if self.env == entry:
+        return
+
+  def visit_WhileStmt(self, node: WhileStmt) -> Any:
+    self.visit_loop(node, None)
+    return node
+
+  def visit_ForExpr(self, node: ForExpr) -> Any:
+    node.range = self.visit(node.range)
+    self.visit_loop(node, node.var_name.value)
+    return node
+
+
+def count_typed(node, counts: list[int] | None = None) -> tuple[int, int]:
+  if counts is None:
+    counts = [0, 0]
+  if isinstance(node, (BinOp, UnaryOp)):
+    counts[0 if node.result_type is not None else 1] += 1
+  for child in iter_children(node):
+    count_typed(child, counts)
+  return counts[0], counts[1]